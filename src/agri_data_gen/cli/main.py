@@ -1,26 +1,58 @@
+import sys
 import typer
 from pathlib import Path
-from agri_data_gen.core.data_access.taxonomy_manager import TaxonomyManager
-from agri_data_gen.core.generators.generator import GenerationEngine
-from agri_data_gen.core.knowledge.bundle_builder import BundleBuilder
-from agri_data_gen.gemini_batch_processing.create_job import TextBatchJob
+
+# Heavy modules (pymongo, google.genai, pandas, numpy, tqdm) are imported
+# inside the commands that need them, so `--help` and status checks start fast.
 
 app = typer.Typer()
 
 
+@app.callback()
+def profiling_options(
+    ctx: typer.Context,
+    profile: str = None,
+    profile_interval: float = 30.0,
+    profile_dir: str = "profiles",
+    profile_top: int = 10
+):
+    """
+    Options shared by every command.
+    --profile cpu|mem|both captures cProfile / tracemalloc data per pipeline
+    stage (taxonomy load, adapter load, bundle build, prompt render, request,
+    write), writes it to --profile-dir and prints the top --profile-top rows.
+    Memory snapshots are taken at most every --profile-interval seconds per stage.
+
+    e.g. eval-data-gen --profile both generate --limit 20
+    """
+    if not profile:
+        return
+
+    from agri_data_gen.core.profiling.stage_profiler import enable_profiling, finish_profiling
+
+    enable_profiling(profile, out_dir=profile_dir, interval=profile_interval, top_n=profile_top)
+    ctx.call_on_close(finish_profiling)
+
+
 
 @app.command()
-def load_taxonomies(taxonomy_dir: str = "sample_data/taxonomies"):
+def load_taxonomies(taxonomy_dir: str = "sample_data/taxonomies", force: bool = False):
     """
-    Loads taxonomy schemas into MongoDB and prints a summary.
+    Loads taxonomy schemas into the taxonomy store and prints a summary.
+    Unchanged files are skipped unless --force is given.
     """
 
+    from agri_data_gen.core.data_access.taxonomy_manager import TaxonomyManager
+
+    from agri_data_gen.core.profiling.stage_profiler import profile_stage
+
     print("Loading taxonomies...")
     manager = TaxonomyManager()
-    manager.load_from_files_and_store(taxonomy_dir)
+    with profile_stage("taxonomy_load"):
+        manager.load_from_files_and_store(taxonomy_dir, force=force)
 
     taxonomies = manager.get_active_taxonomies()
-    print(f"\nLoaded {len(taxonomies)} active taxonomies:\n")
+    print(f"\nLoaded {len(taxonomies)} active taxonomies (version {manager.get_version()}):\n")
 
     for t in taxonomies:
         print(f"Group: {t['group']}")
@@ -34,6 +66,8 @@ def reset_taxonomies():
     Completely clears the taxonomy collection in MongoDB.
     Use before reloading taxonomies after schema changes.
     """
+    from agri_data_gen.core.data_access.taxonomy_manager import TaxonomyManager
+
     manager = TaxonomyManager()
     deleted = manager.reset_taxonomy_collection()
     print(f"Deleted {deleted} taxonomy entries.")
@@ -49,6 +83,8 @@ def batch_run(bundle_file: str = "data/bundles/bundles.jsonl"):
         print(f"Error: Input file not found: {bundle_file}")
         sys.exit(1)
 
+    from agri_data_gen.gemini_batch_processing.create_job import TextBatchJob
+
     print(f"Submitting Batch Job for: {bundle_file}")
     
     processor = TextBatchJob()
@@ -66,6 +102,8 @@ def check_batch(job_name: str):
     """
     Step 2: Checks status and downloads if ready.
     """
+    from agri_data_gen.gemini_batch_processing.create_job import TextBatchJob
+
     print(f"Checking status for: {job_name}")
     processor = TextBatchJob()
     # You'll need to update TextBatchJob to accept an existing job_name
@@ -77,18 +115,340 @@ def check_batch(job_name: str):
 
 
 
+@app.command()
+def generate(
+    bundle_file: str = "data/bundles/bundles.jsonl",
+    output_file: str = "data/generated/data.jsonl",
+    limit: int = None,
+    shard: int = 0,
+    num_shards: int = 1,
+    rpm_limit: int = 10,
+    max_workers: int = 1,
+    key_pool: bool = False,
+    pack_size: int = 1,
+    quality_gate: bool = False,
+    quality_retries: int = 1,
+    quality_workers: int = None,
+    dedup: bool = False,
+    dedup_threshold: float = 0.8,
+    dedup_skip_after: int = 0,
+    stream: bool = False,
+    stream_retries: int = 1
+):
+    """
+    Runs online generation over a bundle file (or one shard of it).
+    Each shard writes to its own output file, e.g. data_shard0.jsonl.
+    With --key-pool, requests are spread over every GOOGLE_API_KEY* key.
+    With --pack-size k, k bundles share one request and one instruction block.
+    With --quality-gate, records are checked in a process pool as they are
+    written and split into <output>_accepted / <output>_needs_retry files;
+    rejected rows are generated again up to --quality-retries times.
+    With --dedup, advisories go into a MinHash/LSH index (<output>_dedup.npz,
+    kept across runs) and near-duplicate clusters are reported; with
+    --dedup-skip-after k, bundles sharing the axis values of a k-member
+    cluster are not sent at all. Both dedup flags also apply to a reloaded index.
+    With --stream, responses are read as they are generated and cut off as
+    soon as they are clearly off-spec (not JSON, not Hindi, runaway length);
+    those rows are re-queued up to --stream-retries times.
+    """
+    from agri_data_gen.core.generators.generator import GenerationEngine
+
+    out_path = Path(output_file)
+    if num_shards > 1:
+        out_path = out_path.with_name(f"{out_path.stem}_shard{shard}{out_path.suffix}")
+
+    gate = None
+    if quality_gate:
+        from agri_data_gen.core.generators.quality_gate import QualityGate
+
+        gate = QualityGate(
+            accepted_file=str(out_path.with_name(f"{out_path.stem}_accepted{out_path.suffix}")),
+            retry_file=str(out_path.with_name(f"{out_path.stem}_needs_retry{out_path.suffix}")),
+            workers=quality_workers
+        )
+
+    index = None
+    index_path = out_path.with_name(f"{out_path.stem}_dedup.npz")
+    if dedup:
+        from agri_data_gen.core.generators.dedup import DedupIndex
+
+        if index_path.exists():
+            index = DedupIndex.load(str(index_path), threshold=dedup_threshold, skip_after=dedup_skip_after)
+            print(f"Loaded {len(index.keys)} advisories from {index_path} "
+                  f"(threshold {index.threshold}, skip after {index.skip_after}).")
+        else:
+            index = DedupIndex(threshold=dedup_threshold, skip_after=dedup_skip_after)
+
+    engine = GenerationEngine(
+        bundle_file=bundle_file,
+        out_file=str(out_path),
+        rpm_limit=rpm_limit,
+        max_workers=max_workers,
+        key_pool=key_pool,
+        pack_size=pack_size,
+        quality_gate=gate,
+        dedup=index,
+        stream=stream
+    )
+    try:
+        engine.generate_all(limit=limit, shard=shard, num_shards=num_shards,
+                            quality_retries=quality_retries, stream_retries=stream_retries)
+    finally:
+        if gate is not None:
+            gate.close()
+            gate.summary()
+        if index is not None:
+            index.save(str(index_path))
+
+
+@app.command()
+def quality_gate(
+    input_file: str = "data/generated/data.jsonl",
+    accepted_file: str = None,
+    retry_file: str = None,
+    workers: int = None,
+    min_chars: int = 200,
+    max_chars: int = 12000,
+    min_devanagari: float = 0.6
+):
+    """
+    Checks an existing output file (online or parsed batch results):
+    JSON answer, Devanagari share, length bounds and finish reason.
+    Records are split into <input>_accepted and <input>_needs_retry files.
+    """
+    if not Path(input_file).exists():
+        print(f"Error: Input file not found: {input_file}")
+        sys.exit(1)
+
+    from agri_data_gen.core.generators.quality_gate import QualityGate
+
+    in_path = Path(input_file)
+    gate = QualityGate(
+        accepted_file=accepted_file or str(in_path.with_name(f"{in_path.stem}_accepted{in_path.suffix}")),
+        retry_file=retry_file or str(in_path.with_name(f"{in_path.stem}_needs_retry{in_path.suffix}")),
+        workers=workers,
+        min_chars=min_chars,
+        max_chars=max_chars,
+        min_devanagari=min_devanagari
+    )
+    gate.run_file(input_file)
+
+
+@app.command()
+def dedup_report(
+    input_file: str = "data/generated/data.jsonl",
+    threshold: float = 0.8,
+    clusters_file: str = None
+):
+    """
+    Finds near-duplicate advisories in an output file (online or parsed
+    batch results) with MinHash/LSH and writes one JSONL line per cluster
+    (default: <input>_clusters.jsonl).
+    """
+    if not Path(input_file).exists():
+        print(f"Error: Input file not found: {input_file}")
+        sys.exit(1)
+
+    from agri_data_gen.core.generators.dedup import DedupIndex, record_text
+    from agri_data_gen.core.storage import frame_store
+
+    index = DedupIndex(threshold=threshold)
+    for record in frame_store.iter_records(input_file, skip_invalid=True):
+        index.add(record.get("id"), record_text(record.get("output")))
+    index.report()
+
+    in_path = Path(input_file)
+    out_path = clusters_file or str(in_path.with_name(f"{in_path.stem}_clusters.jsonl"))
+    with frame_store.open_jsonl_writer(out_path) as writer:
+        for members in index.clusters():
+            writer.write({"size": len(members), "ids": members})
+    print(f"Clusters written to {out_path}")
+
+
+@app.command()
+def plan(
+    bundle_file: str = "data/bundles/bundles.jsonl",
+    rpm_limit: int = 10,
+    max_workers: int = 1,
+    key_pool: bool = False,
+    pack_size: int = 1,
+    limit: int = None,
+    sample: int = None,
+    output_tokens: int = 800,
+    top: int = 5,
+    plan_file: str = None
+):
+    """
+    Dry run: estimates tokens, cost and wall-clock time of generating a
+    bundle file (JSONL, .zst or compact .npz), online and via the Batch API,
+    with the most expensive values of each axis. Runs offline; nothing is sent.
+    --sample n counts n evenly spaced JSONL bundles and scales up.
+    --output-tokens is the answer length per bundle; thinking is costed
+    at each path's thinking budget per request.
+    --plan-file writes the full plan as JSON.
+    """
+    if not Path(bundle_file).exists():
+        print(f"Error: Input file not found: {bundle_file}")
+        sys.exit(1)
+
+    from agri_data_gen.core.generators.run_planner import RunPlanner
+
+    keys = 1
+    if key_pool:
+        from agri_data_gen.core.providers.credential_pool import CredentialPool
+        keys = len(CredentialPool.from_env())
+
+    planner = RunPlanner(
+        bundle_file=bundle_file,
+        rpm_limit=rpm_limit,
+        max_workers=max_workers,
+        keys=keys,
+        pack_size=pack_size,
+        limit=limit,
+        sample=sample,
+        output_tokens=output_tokens
+    )
+    result = planner.plan(top=top)
+    if plan_file:
+        from agri_data_gen.core.storage import json_codec
+
+        Path(plan_file).write_text(json_codec.dumps(result, indent=True), encoding="utf-8")
+        print(f"Plan written to {plan_file}")
+
+
+@app.command()
+def queue_worker(
+    bundle_file: str = "data/bundles/bundles.jsonl",
+    output_dir: str = "data/generated/parts",
+    queue: str = None,
+    backend: str = None,
+    range_size: int = 500,
+    lease_seconds: int = 600,
+    rpm_limit: int = 10,
+    max_workers: int = 1,
+    key_pool: bool = False,
+    pack_size: int = 1
+):
+    """
+    Joins a shared work queue over the bundle file and generates leased
+    record ranges until none are left. Run it on as many hosts as needed;
+    use --backend mongo (or WORK_QUEUE_BACKEND=mongo) across machines.
+    Each range lands in its own part file in --output-dir.
+    """
+    from agri_data_gen.core.generators.generator import GenerationEngine
+    from agri_data_gen.core.generators.work_queue import QueueWorker, get_lease_store
+
+    engine = GenerationEngine(
+        bundle_file=bundle_file,
+        out_file=str(Path(output_dir) / "data.jsonl"),
+        rpm_limit=rpm_limit,
+        max_workers=max_workers,
+        key_pool=key_pool,
+        pack_size=pack_size
+    )
+    worker = QueueWorker(
+        engine,
+        get_lease_store(backend),
+        queue=queue or Path(bundle_file).name.split(".")[0],
+        out_dir=output_dir,
+        lease_seconds=lease_seconds
+    )
+    worker.seed(range_size=range_size)
+    worker.run()
+
+
+@app.command()
+def hybrid_run(
+    bundle_file: str = "data/bundles/bundles.jsonl",
+    output_file: str = "data/generated/data.jsonl",
+    deadline_hours: float = 48.0,
+    budget_usd: float = None,
+    num_batch_shards: int = 4,
+    batch_hours: float = 24.0,
+    poll_interval: int = 300,
+    rpm_limit: int = 10,
+    max_workers: int = 1,
+    key_pool: bool = False,
+    pack_size: int = 1
+):
+    """
+    Generates a bundle set by a deadline, as cheaply as possible:
+    sharded batch jobs first, online top-up for failures and for batches
+    projected to miss the deadline (--batch-hours is the expected turnaround).
+    """
+    if not Path(bundle_file).exists():
+        print(f"Error: Input file not found: {bundle_file}")
+        sys.exit(1)
+
+    from agri_data_gen.core.generators.hybrid_scheduler import HybridScheduler
+
+    scheduler = HybridScheduler(
+        bundle_file=bundle_file,
+        out_file=output_file,
+        deadline_hours=deadline_hours,
+        budget_usd=budget_usd,
+        num_batch_shards=num_batch_shards,
+        batch_hours=batch_hours,
+        poll_interval=poll_interval,
+        rpm_limit=rpm_limit,
+        max_workers=max_workers,
+        key_pool=key_pool,
+        pack_size=pack_size
+    )
+    scheduler.run()
+
+
+@app.command()
+def build_climatology(
+    weather_csv: str = "data/raw/weather.csv",
+    out_dir: str = "data/climatology"
+):
+    """
+    Precomputes monthly climatology tables (by location and region) from
+    weather.csv, so adapters can attach climate context with a lookup.
+    The weather adapter picks them up from data/climatology (the registry's
+    climatology_dir setting), so built bundles carry climate values.
+    """
+    from agri_data_gen.core.data_access.climatology import build_climatology as build, require_parquet
+
+    try:
+        require_parquet()
+    except ImportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    build(weather_csv, out_dir)
+
+
 @app.command()
 def pipeline_run(
     bundle_dir: str = "data/bundles", 
     output_dir: str = "data/generated",
     bundle_filename: str = "bundles.jsonl",
     output_filename: str = "data.jsonl",
-    limit: int = None
+    limit: int = None,
+    compact: bool = False,
+    order: str = "lexicographic",
+    feasibility: bool = False,
+    min_feasibility: float = None
 ):
     """
     Run the full end-to-end pipeline:
     taxonomies → bundles → generation
+
+    With --compact, bundles are stored as an interned .npz bundle space.
+    With --order coverage, every prefix of the bundle file covers all axis
+    values evenly, so partial (--limit or quota-bound) runs stay representative.
+    With --feasibility, bundles carry a crop/weather suitability score and
+    violated constraints; --min-feasibility drops bundles scoring below it
+    (JSONL bundles only: a compact space stores no per-bundle fields).
     """
+    if compact and (feasibility or min_feasibility is not None):
+        raise typer.BadParameter(
+            "--feasibility / --min-feasibility need JSONL bundles; drop --compact to score or filter bundles."
+        )
+
+    from agri_data_gen.core.knowledge.bundle_builder import BundleBuilder
 
     print("Starting end-to-end pipeline...")
 
@@ -96,7 +456,19 @@ def pipeline_run(
     print("Building bundles...")
     bundle_builder = BundleBuilder(out_dir=bundle_dir)
     bundle_builder.load_all()
-    generated_bundles_path = bundle_builder.build_all(filename= bundle_filename)
+    if compact:
+        generated_bundles_path = bundle_builder.build_compact(filename=Path(bundle_filename).with_suffix(".npz").name, order=order)
+    else:
+        generated_bundles_path = bundle_builder.build_all(
+            filename= bundle_filename,
+            order=order,
+            feasibility=feasibility or min_feasibility is not None,
+            min_score=min_feasibility
+        )
+
+    # Only the datasets this run touched were loaded
+    print("Dataset adapter load times:")
+    bundle_builder.registry.report()
 
     # Generate data from bundles
     print("Generating reasoning data...")
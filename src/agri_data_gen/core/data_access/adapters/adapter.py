@@ -1,17 +1,59 @@
 import logging
-from typing import Dict, Any, List, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Union
 
 # Setup logger for production visibility
 logger = logging.getLogger(__name__)
 
+# Entry ids listed per problem in SchemaReport.summary()
+REPORT_EXAMPLES = 5
+
+
+class SchemaReport:
+    """Aggregated result of validating every entry of one taxonomy group."""
+
+    def __init__(self, group_name: str, attributes: List[str]):
+        self.group_name = group_name
+        self.attributes = attributes
+        self.total = 0
+        # attribute -> ids of the entries that lack it
+        self.missing: Dict[str, List[str]] = {}
+        self.unlabelled: List[str] = []  # label derived from the id
+        self.duplicates: List[str] = []
+        self.invalid: List[int] = []  # positions of entries without an id
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.duplicates or self.invalid)
+
+    def summary(self) -> str:
+        def examples(ids: list) -> str:
+            more = f" (+{len(ids) - REPORT_EXAMPLES} more)" if len(ids) > REPORT_EXAMPLES else ""
+            return ", ".join(str(i) for i in ids[:REPORT_EXAMPLES]) + more
+
+        lines = [f"[{self.group_name}] {self.total} entries checked against {self.attributes}"]
+        for attr, ids in self.missing.items():
+            lines.append(f"  missing '{attr}' in {len(ids)}: {examples(ids)}")
+        if self.unlabelled:
+            lines.append(f"  label derived from id in {len(self.unlabelled)}: {examples(self.unlabelled)}")
+        if self.duplicates:
+            lines.append(f"  duplicate ids ({len(self.duplicates)}): {examples(self.duplicates)}")
+        if self.invalid:
+            lines.append(f"  entries without an id at positions: {examples(self.invalid)}")
+        return "\n".join(lines)
+
+
 class GenericAdapter:
     """
     A robust, schema-aware adapter that standardizes taxonomy entries.
-    
+
     Role:
     1. Validates that entries match the required attribute schema.
     2. Packages data cleanly for the downstream Prompt Builder.
     3. Handles missing or malformed data gracefully without crashing the pipeline.
+
+    compile() validates a whole taxonomy in one pass and stores read-only,
+    normalized entries; sample() is then a dict lookup.
     """
 
     def __init__(self, group_name: str, attributes: List[str] = None):
@@ -23,57 +65,93 @@ class GenericAdapter:
         self.group_name = group_name
         # Ensure attributes is never None to prevent iteration errors
         self.attributes = attributes or []
-        
-        # Internal cache or state if needed later (e.g. for validation stats)
-        self._processed_count = 0
+        self.schema_attributes = tuple(self.attributes)
+
+        # entry id -> immutable sample() result, filled by compile()
+        self.entries: Dict[str, Mapping[str, Any]] = {}
+        self.report: Optional[SchemaReport] = None
+        # Taxonomy version the entries were compiled from (None: unknown)
+        self.version = None
 
     def load(self):
         """
-        Lifecycle hook. 
-        In a GenericAdapter, we don't load external CSVs/DBs, 
+        Lifecycle hook.
+        In a GenericAdapter, we don't load external CSVs/DBs,
         but we log readiness to aid debugging.
         """
         logger.info(f"[{self.group_name}] Adapter ready. Schema expects: {self.attributes}")
 
-    def sample(self, entry_data: Dict[str, Any]) -> Dict[str, Any]:
+    def compile(self, entries: List[Dict[str, Any]], version: int = None) -> SchemaReport:
+        """
+        Validates and normalizes all entries of the group at once.
+        With a `version` (the taxonomy store's counter), compiling the same
+        version again is free, so adapters shared through the registry do the
+        work once per process.
+        Problems are aggregated into the returned report and logged once.
+        """
+        if version is not None and version == self.version and self.report is not None:
+            return self.report
+
+        report = SchemaReport(self.group_name, self.attributes)
+        compiled = {}
+
+        for position, entry_data in enumerate(entries):
+            report.total += 1
+            entry_id = entry_data.get("id") if isinstance(entry_data, Mapping) else None
+            if entry_id is None:
+                report.invalid.append(position)
+                continue
+            if entry_id in compiled:
+                report.duplicates.append(entry_id)
+
+            # 1. Validation (Soft): Check if crucial attributes are missing
+            for attr in self.attributes:
+                if attr not in entry_data:
+                    report.missing.setdefault(attr, []).append(entry_id)
+
+            # 2. Cleanup: Ensure 'label' exists (critical for LLM human-readability).
+            # Works on a copy, so the caller's taxonomy dicts are left untouched.
+            data = dict(entry_data)
+            if "label" not in data:
+                data["label"] = str(entry_id).replace("_", " ").title()
+                report.unlabelled.append(entry_id)
+
+            # 3. Structure for the Prompt Builder
+            compiled[entry_id] = MappingProxyType({
+                # The actual data (e.g., id="reg_gujarat", soil="Black")
+                "data": MappingProxyType(data),
+
+                # The schema (e.g., ["soil_type", "rainfall"])
+                "schema_attributes": self.schema_attributes,
+
+                # Metadata for tracing
+                "adapter_type": "generic",
+                "group": self.group_name
+            })
+
+        if not report.ok:
+            # One aggregated warning per group instead of one per entry
+            logger.warning(report.summary())
+
+        self.entries = compiled
+        self.report = report
+        self.version = version
+        return report
+
+    def sample(self, entry_data: Union[Dict[str, Any], str]) -> Mapping[str, Any]:
         """
-        Takes a raw entry from YAML and standardizes it.
-        
+        Returns the compiled, read-only form of an entry.
+
         Args:
-            entry_data: The dictionary from the 'entries' list in YAML.
-            
+            entry_data: The dictionary from the 'entries' list in YAML, or its id.
+
         Returns:
-            A clean dictionary containing:
-            - 'entry': The raw data values
-            - 'meta': Schema info (useful for the LLM prompt construction)
+            A mapping containing:
+            - 'data': The normalized entry values
+            - 'schema_attributes': Schema info (useful for the LLM prompt construction)
         """
-        self._processed_count += 1
-        
-        # 1. Validation (Soft): Check if crucial attributes are missing
-        # We don't crash, but we warn. This helps you spot bad YAML data.
-        missing_keys = [attr for attr in self.attributes if attr not in entry_data]
-        if missing_keys:
-            logger.warning(
-                f"[{self.group_name}] Entry '{entry_data.get('id', 'unknown')}' "
-                f"is missing expected attributes: {missing_keys}"
-            )
-
-        # 2. Cleanup: Ensure 'label' exists (critical for LLM human-readability)
-        if "label" not in entry_data:
-            entry_data["label"] = entry_data.get("id", "Unknown").replace("_", " ").title()
-
-        # 3. Structure for the Prompt Builder
-        # We wrap it so the PromptBuilder knows specifically *what* to ask the LLM to fill.
-        return {
-            # The actual data (e.g., id="reg_gujarat", soil="Black")
-            "data": entry_data,
-            
-            # The schema (e.g., ["soil_type", "rainfall"])
-            # The PromptBuilder will use this list to instruct the LLM: 
-            # "For this region, ensure you consider these specific attributes..."
-            "schema_attributes": self.attributes,
-            
-            # Metadata for tracing
-            "adapter_type": "generic",
-            "group": self.group_name
-        }
\ No newline at end of file
+        entry_id = entry_data.get("id") if isinstance(entry_data, Mapping) else entry_data
+        try:
+            return self.entries[entry_id]
+        except KeyError:
+            raise KeyError(f"[{self.group_name}] Entry '{entry_id}' was not compiled. Call compile() first.") from None
@@ -1,32 +1,163 @@
-from typing import Dict
-from agri_data_gen.core.data_access.adapters.crop_adapter import CropAdapter
-from agri_data_gen.core.data_access.adapters.weather_adapter import WeatherAdapter
+import os
+import time
+import importlib
+import threading
+from typing import Dict, Any, List, Tuple
+
+from agri_data_gen.core.data_access.adapters.adapter import GenericAdapter
+from agri_data_gen.core.profiling.stage_profiler import profile_stage
+
+# Third-party packages register dataset adapters under this entry-point group, e.g.
+#   [project.entry-points."agri_data_gen.adapters"]
+#   soil = "my_pkg.soil:SoilAdapter"
+ENTRY_POINT_GROUP = "agri_data_gen.adapters"
+
+# name -> (factory, constructor kwargs). Factories are "module:attr" strings
+# so that nothing (pandas included) is imported until an adapter is needed.
+BUILTIN_ADAPTERS = {
+    "crop": ("agri_data_gen.core.data_access.adapters.crop_adapter:CropAdapter",
+             {"csv_path": "data/raw/Crop_recommendation.csv"}),
+    "weather": ("agri_data_gen.core.data_access.adapters.weather_adapter:WeatherAdapter",
+                {"csv_path": "data/raw/weather.csv", "climatology_dir": "data/climatology"}),
+}
+
+
+def _resolve(factory):
+    """"module:attr" strings and entry points -> the callable they name."""
+    if isinstance(factory, str):
+        module, _, attr = factory.partition(":")
+        return getattr(importlib.import_module(module), attr)
+    if hasattr(factory, "load") and hasattr(factory, "group"):
+        return factory.load()
+    return factory
+
+
+def _entry_points() -> list:
+    from importlib import metadata
+
+    eps = metadata.entry_points()
+    if hasattr(eps, "select"):
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    # Python 3.9: a dict of group -> entry points
+    return list(eps.get(ENTRY_POINT_GROUP, []))
 
 
 class AdapterRegistry:
     """
     Central registry. Allows BundleBuilder to dynamically
     pull sampler objects for each taxonomy group.
-    """
 
-    def __init__(self):
-        self.adapters: Dict[str, object] = {}
+    Dataset adapters are discovered from the built-ins, the
+    "agri_data_gen.adapters" entry-point group and an optional YAML config
+    (later sources override earlier ones), but each is only constructed and
+    loaded on its first get_adapter(), then shared by every caller.
+    """
 
-    def load_all(self):
+    def __init__(self, config_path: str = None, discover: bool = True):
         """
-        Initialize adapters for groups we support.
-        Add soil_adapter, symptom_adapter etc. later.
+        Args:
+            config_path: YAML file of adapters, defaults to the ADAPTERS_CONFIG
+                env var. Format:
+                    adapters:
+                      weather:
+                        class: agri_data_gen.core.data_access.adapters.weather_adapter:WeatherAdapter
+                        csv_path: data/raw/weather.csv
+                        climatology_dir: data/climatology  # null: no climate values
+            discover: Also look up installed entry points.
         """
-        self.adapters = {
-            "crop": CropAdapter("data/raw/Crop_recommendation.csv"),
-            "weather": WeatherAdapter("data/raw/weather.csv")
-        }
+        self.factories: Dict[str, Tuple[Any, Dict[str, Any]]] = dict(BUILTIN_ADAPTERS)
+        self.adapters: Dict[str, object] = {}
+        self.schema_adapters: Dict[tuple, GenericAdapter] = {}
+        self.timings: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+        if discover:
+            for ep in _entry_points():
+                self.factories[ep.name] = (ep, {})
+
+        config_path = config_path or os.getenv("ADAPTERS_CONFIG")
+        if config_path:
+            self._read_config(config_path)
 
-        # Load all datasets now (important)
-        for adapter in self.adapters.values():
-            adapter.load()
+    def _read_config(self, config_path: str):
+        import yaml
+
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+        for name, spec in (config.get("adapters") or {}).items():
+            spec = dict(spec or {})
+            factory = spec.pop("class", None)
+            if factory is None:
+                if name not in self.factories:
+                    raise ValueError(f"Adapter '{name}' in {config_path} has no 'class'")
+                # Only overriding kwargs (e.g. csv_path) of a known adapter
+                factory, kwargs = self.factories[name]
+                spec = {**kwargs, **spec}
+            self.factories[name] = (factory, spec)
+
+    def register(self, name: str, factory, **kwargs):
+        """Registers (or replaces) an adapter factory. Already loaded instances are kept."""
+        with self.lock:
+            self.factories[name] = (factory, kwargs)
+
+    def available(self) -> List[str]:
+        return list(self.factories)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.adapters
+
+    def load_all(self):
+        """Eagerly loads every registered adapter (e.g. before forking workers)."""
+        for name in self.factories:
+            self.get_adapter(name)
 
     def get_adapter(self, group: str):
-        if group not in self.adapters:
-            raise KeyError(f"No adapter registered for group '{group}'")
-        return self.adapters[group]
+        """The shared, loaded adapter for `group`, constructed on first use."""
+        with self.lock:
+            if group in self.adapters:
+                return self.adapters[group]
+            if group not in self.factories:
+                raise KeyError(f"No adapter registered for group '{group}'")
+
+            factory, kwargs = self.factories[group]
+            start = time.perf_counter()
+            with profile_stage("adapter_load"):
+                adapter = _resolve(factory)(**kwargs)
+                adapter.load()
+            self.timings[group] = time.perf_counter() - start
+
+            self.adapters[group] = adapter
+            print(f"Loaded '{group}' adapter in {self.timings[group]:.2f}s")
+            return adapter
+
+    def get_schema_adapter(self, group: str, attributes: List[str] = None) -> GenericAdapter:
+        """Shared GenericAdapter standardizing the taxonomy entries of `group`."""
+        key = (group, tuple(attributes or []))
+        with self.lock:
+            if key not in self.schema_adapters:
+                adapter = GenericAdapter(group, attributes=list(key[1]))
+                adapter.load()  # Validates readiness
+                self.schema_adapters[key] = adapter
+            return self.schema_adapters[key]
+
+    def report(self) -> Dict[str, float]:
+        """Prints and returns load time (s) of every adapter loaded so far."""
+        if not self.timings:
+            print("No dataset adapters were loaded.")
+        for name, seconds in self.timings.items():
+            print(f"  {name:<12}{seconds:>8.2f}s")
+        return dict(self.timings)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AdapterRegistry:
+    """Returns the process-wide registry, so loaded adapters are shared."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AdapterRegistry()
+        return _registry
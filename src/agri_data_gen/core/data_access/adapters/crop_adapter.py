@@ -1,7 +1,12 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from .base_adapter import BaseAdapter
+from ..shared_datasets import SharedArrays
+
+# Numeric columns kept as arrays (and shared with worker processes)
+NUMERIC_COLUMNS = ("N", "P", "K", "temperature", "humidity", "ph", "rainfall")
 
 
 class CropAdapter(BaseAdapter):
@@ -14,7 +19,10 @@ class CropAdapter(BaseAdapter):
     def __init__(self, csv_path: str = "data/raw/Crop_recommendation.csv"):
         self.csv_path = Path(csv_path)
         self.df = None
-        self.crop_groups = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        # crop name -> row positions, all slices of one array sorted by label
+        self.crop_rows: Dict[str, np.ndarray] = {}
+        self.shared: Optional[SharedArrays] = None
 
     def load(self):
         if not self.csv_path.exists():
@@ -26,38 +34,87 @@ class CropAdapter(BaseAdapter):
         if not required_cols.issubset(self.df.columns):
             raise ValueError(f"Crop dataset missing required columns: {required_cols}")
 
+        self.columns = {
+            column: self.df[column].to_numpy(dtype=float)
+            for column in NUMERIC_COLUMNS if column in self.df.columns
+        }
+
         # Group rows by crop name
-        self.crop_groups = {
-            crop: subdf.reset_index(drop=True)
-            for crop, subdf in self.df.groupby("label")
+        codes, crops = pd.factorize(self.df["label"], sort=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(crops) + 1))
+        self.crop_rows = {
+            crop: order[bounds[code]:bounds[code + 1]]
+            for code, crop in enumerate(crops)
+        }
+
+    def export_shared(self) -> SharedArrays:
+        """
+        Publishes the numeric columns and per-crop row groups into one
+        shared-memory block; workers rebuild the adapter with from_shared().
+        """
+        if not self.crop_rows:
+            raise RuntimeError("Call load() before export_shared()")
+
+        arrays = {f"col_{column}": values for column, values in self.columns.items()}
+        crops, chunks, groups, start = [], [], [], 0
+        for crop, positions in self.crop_rows.items():
+            crops.append(crop)
+            groups.append((start, start + len(positions)))
+            chunks.append(positions)
+            start += len(positions)
+        arrays["crop_positions"] = np.concatenate(chunks).astype(np.int64)
+
+        self.shared = SharedArrays.publish(arrays, meta={
+            "csv_path": str(self.csv_path),
+            "columns": list(self.columns),
+            "crops": crops,
+            "groups": groups,
+        })
+        return self.shared
+
+    @classmethod
+    def from_shared(cls, handle: Dict[str, Any]) -> "CropAdapter":
+        """Worker-side adapter over arrays published by export_shared(). No CSV is read."""
+        shared = SharedArrays.attach(handle)
+        meta = shared.meta
+
+        adapter = cls(meta["csv_path"])
+        adapter.shared = shared
+        adapter.columns = {column: shared[f"col_{column}"] for column in meta["columns"]}
+        positions = shared["crop_positions"]
+        adapter.crop_rows = {
+            crop: positions[start:stop]
+            for crop, (start, stop) in zip(meta["crops"], meta["groups"])
         }
+        return adapter
 
     def get_all_ids(self) -> List[str]:
         """Returns IDs derived from dataset crop names."""
         return [
             f"crop_{name.lower().replace(' ', '_')}"
-            for name in self.crop_groups.keys()
+            for name in self.crop_rows.keys()
         ]
 
     def sample(self, entry_id: str) -> Dict[str, Any]:
         """Return structured crop metadata or fallback if missing."""
-        if self.df is None:
+        if not self.crop_rows:
             raise RuntimeError("Call load() before sample().")
 
         crop_name = entry_id.replace("crop_", "").replace("_", " ")
 
         # Case 1: crop exists in dataset → return real values
-        if crop_name in self.crop_groups:
-            sub = self.crop_groups[crop_name]
+        if crop_name in self.crop_rows:
+            rows = self.crop_rows[crop_name]
 
-            temp_min = float(sub["temperature"].min())
-            temp_max = float(sub["temperature"].max())
+            temp_min = float(self.columns["temperature"][rows].min())
+            temp_max = float(self.columns["temperature"][rows].max())
 
-            rain_min = float(sub["rainfall"].min())
-            rain_max = float(sub["rainfall"].max())
+            rain_min = float(self.columns["rainfall"][rows].min())
+            rain_max = float(self.columns["rainfall"][rows].max())
 
-            ph_min = float(sub["ph"].min())
-            ph_max = float(sub["ph"].max())
+            ph_min = float(self.columns["ph"][rows].min())
+            ph_max = float(self.columns["ph"][rows].max())
 
             # return {
             #     "crop_name": crop_name,
@@ -1,8 +1,76 @@
+import re
+import random
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 from .base_adapter import BaseAdapter
+from ..shared_datasets import SharedArrays
+
+
+# Index key for the all-India fallback
+ALL_INDIA = "all_india"
+
+# Taxonomy region ids (after normalize_region) whose names differ from the dataset's
+REGION_ALIASES = {
+    "up": "uttar_pradesh",
+    "mp": "madhya_pradesh",
+    "hp": "himachal_pradesh",
+    "ap": "andhra_pradesh",
+    "tn": "tamil_nadu",
+    "wb": "west_bengal",
+    "jk": "jammu_and_kashmir",
+    "odisha": "orissa",
+    "telangana": "andhra_pradesh",  # not split out in weather.csv
+    "ladakh": "jammu_and_kashmir",
+}
+
+# Bordering states, nearest agro-climate first. Used when a (region, bucket) cell is empty.
+REGION_NEIGHBOURS = {
+    "gujarat": ["rajasthan", "maharashtra", "madhya_pradesh"],
+    "punjab": ["haryana", "himachal_pradesh", "rajasthan", "jammu_and_kashmir"],
+    "haryana": ["punjab", "delhi", "uttar_pradesh", "rajasthan", "himachal_pradesh"],
+    "uttar_pradesh": ["bihar", "madhya_pradesh", "haryana", "uttarakhand", "rajasthan"],
+    "madhya_pradesh": ["chhattisgarh", "uttar_pradesh", "rajasthan", "maharashtra", "gujarat"],
+    "rajasthan": ["gujarat", "madhya_pradesh", "haryana", "punjab", "uttar_pradesh"],
+    "maharashtra": ["madhya_pradesh", "karnataka", "gujarat", "andhra_pradesh", "chhattisgarh", "goa"],
+    "bihar": ["jharkhand", "uttar_pradesh", "west_bengal"],
+    "west_bengal": ["jharkhand", "bihar", "orissa", "assam"],
+    "orissa": ["chhattisgarh", "jharkhand", "andhra_pradesh", "west_bengal"],
+    "andhra_pradesh": ["karnataka", "tamil_nadu", "orissa", "maharashtra"],
+    "karnataka": ["andhra_pradesh", "tamil_nadu", "kerala", "maharashtra", "goa"],
+    "tamil_nadu": ["kerala", "karnataka", "andhra_pradesh", "puducherry"],
+    "kerala": ["tamil_nadu", "karnataka"],
+    "chhattisgarh": ["madhya_pradesh", "orissa", "jharkhand", "maharashtra"],
+    "jharkhand": ["bihar", "west_bengal", "orissa", "chhattisgarh"],
+    "assam": ["meghalaya", "arunachal_pradesh", "nagaland", "west_bengal"],
+    "uttarakhand": ["himachal_pradesh", "uttar_pradesh"],
+    "himachal_pradesh": ["uttarakhand", "punjab", "jammu_and_kashmir"],
+    "jammu_and_kashmir": ["himachal_pradesh", "punjab"],
+}
+
+
+# Numeric columns kept as arrays (and shared with worker processes)
+NUMERIC_COLUMNS = ("temperature_celsius", "humidity", "precip_mm", "wind_kph")
+
+
+# Sample fields filled from the climatology summary (when one is loaded)
+CLIMATE_FIELDS = {
+    "avg_temperature_c": "temp_mean_c",
+    "max_temperature_c": "temp_max_c",
+    "rainfall_mm": "precip_mean_mm",
+    "humidity_percent": "humidity_mean",
+    "wind_speed_kph": "wind_mean_kph",
+}
+
+
+def normalize_region(name: str) -> str:
+    """'reg_gujarat' / 'Gujarat' / 'Uttar Pradesh' -> 'gujarat' / 'uttar_pradesh'."""
+    key = re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_")
+    if key.startswith("reg_"):
+        key = key[len("reg_"):]
+    return REGION_ALIASES.get(key, key)
 
 
 class WeatherAdapter(BaseAdapter):
@@ -12,9 +80,26 @@ class WeatherAdapter(BaseAdapter):
     Implements Option A thresholds for bucket classification.
     """
 
-    def __init__(self, csv_path: str = "data/raw/weather.csv"):
+    def __init__(self, csv_path: str = "data/raw/weather.csv", seed: int = None, climatology=None,
+                 climatology_dir: str = None):
+        """
+        Args:
+            climatology: Optional loaded Climatology; when given, every sample
+                carries the monthly climate summary of its location and its
+                numeric fields are filled from it.
+            climatology_dir: Directory of build-climatology tables, loaded by
+                load() when no `climatology` is passed and the tables exist.
+        """
         self.csv_path = Path(csv_path)
         self.df = None
+        self.climatology = climatology
+        self.climatology_dir = climatology_dir
+        self.n_rows = 0
+        self.columns: Dict[str, np.ndarray] = {}
+        # normalized region -> bucket -> row positions (plus ALL_INDIA)
+        self.index: Dict[str, Dict[str, np.ndarray]] = {}
+        self.shared: Optional[SharedArrays] = None
+        self.rng = random.Random(seed)
 
     # LOAD DATASET
     def load(self):
@@ -37,6 +122,126 @@ class WeatherAdapter(BaseAdapter):
 
         # Normalize location names (important for generating stable entry IDs)
         self.df["location_id"] = self.df["location_name"].str.lower().str.replace(" ", "_")
+        self.df["region_id"] = self.df["region"].map(normalize_region)
+
+        self._build_index()
+        self._load_climatology()
+
+    def _load_climatology(self):
+        if self.climatology is not None or not self.climatology_dir:
+            return
+        if not (Path(self.climatology_dir) / "location_monthly.parquet").exists():
+            print(f"No climatology tables in {self.climatology_dir} (run build-climatology); "
+                  f"weather samples carry no climate values.")
+            return
+        from agri_data_gen.core.data_access.climatology import Climatology
+
+        self.climatology = Climatology(self.climatology_dir).load()
+
+    def _build_index(self):
+        """
+        Two-level index: normalized region -> bucket -> row positions,
+        so region-conditional sampling is a dict lookup plus one random pick.
+        """
+        # Plain arrays for the per-sample lookups (df.iloc is comparatively slow).
+        # Strings are stored once per distinct value and referenced by code.
+        self.n_rows = len(self.df)
+        self.columns = {column: self.df[column].to_numpy(dtype=float) for column in NUMERIC_COLUMNS}
+        self.months = pd.to_datetime(self.df["last_updated"]).dt.month.to_numpy(dtype="int8") if "last_updated" in self.df else None
+
+        location_codes, location_names = pd.factorize(self.df["location_name"])
+        self.location_codes = location_codes.astype("int32")
+        self.location_names = list(location_names)
+        self.location_ids = [name.lower().replace(" ", "_") for name in self.location_names]
+
+        region_codes, regions = pd.factorize(self.df["region"])
+        self.region_codes = region_codes.astype("int32")
+        self.regions = list(regions)
+        self.region_ids = [normalize_region(region) for region in self.regions]
+
+        region_codes, regions = pd.factorize(self.df["region_id"])
+        self.index = {region: {} for region in regions}
+        self.index[ALL_INDIA] = {}
+
+        for bucket, mask in self._bucket_masks().items():
+            positions = np.flatnonzero(mask)
+            self.index[ALL_INDIA][bucket] = positions
+
+            # Group the bucket's positions by region in one sort
+            codes = region_codes[positions]
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(regions) + 1))
+            for code, region in enumerate(regions):
+                cell = positions[order[bounds[code]:bounds[code + 1]]]
+                if len(cell):
+                    self.index[region][bucket] = cell
+
+    # SHARED MEMORY
+    def export_shared(self) -> SharedArrays:
+        """
+        Publishes the numeric columns, string codes and the bucket index into
+        one shared-memory block. Pass `.handle` to worker processes and build
+        their adapters with from_shared(); close() the block when done.
+        """
+        if not self.index:
+            raise RuntimeError("Call load() before export_shared()")
+
+        arrays = {f"col_{column}": values for column, values in self.columns.items()}
+        arrays["location_codes"] = self.location_codes
+        arrays["region_codes"] = self.region_codes
+        if self.months is not None:
+            arrays["months"] = self.months
+
+        # Every index cell becomes a slice of one flat positions array
+        cells, chunks, start = [], [], 0
+        for region, buckets in self.index.items():
+            for bucket, positions in buckets.items():
+                cells.append((region, bucket, start, start + len(positions)))
+                chunks.append(positions)
+                start += len(positions)
+        arrays["index_positions"] = np.concatenate(chunks).astype(np.int64) if chunks else np.empty(0, np.int64)
+
+        self.shared = SharedArrays.publish(arrays, meta={
+            "csv_path": str(self.csv_path),
+            "n_rows": self.n_rows,
+            "location_names": self.location_names,
+            "regions": self.regions,
+            "index_regions": list(self.index),
+            "cells": cells,
+        })
+        return self.shared
+
+    @classmethod
+    def from_shared(cls, handle: Dict[str, Any], seed: int = None, climatology=None) -> "WeatherAdapter":
+        """Worker-side adapter over arrays published by export_shared(). No CSV is read."""
+        shared = SharedArrays.attach(handle)
+        meta = shared.meta
+
+        adapter = cls(meta["csv_path"], seed=seed, climatology=climatology)
+        adapter.shared = shared
+        adapter.n_rows = meta["n_rows"]
+        adapter.columns = {column: shared[f"col_{column}"] for column in NUMERIC_COLUMNS}
+        adapter.months = shared["months"] if "months" in shared else None
+
+        adapter.location_codes = shared["location_codes"]
+        adapter.location_names = meta["location_names"]
+        adapter.location_ids = [name.lower().replace(" ", "_") for name in adapter.location_names]
+        adapter.region_codes = shared["region_codes"]
+        adapter.regions = meta["regions"]
+        adapter.region_ids = [normalize_region(region) for region in adapter.regions]
+
+        positions = shared["index_positions"]
+        adapter.index = {region: {} for region in meta["index_regions"]}
+        for region, bucket, start, stop in meta["cells"]:
+            adapter.index[region][bucket] = positions[start:stop]
+
+        return adapter
+
+    def numeric_column(self, name: str) -> np.ndarray:
+        """One of NUMERIC_COLUMNS as a float array (a shared view in workers)."""
+        if name not in self.columns:
+            raise KeyError(f"Unknown weather column: {name}")
+        return self.columns[name]
 
     # TAXONOMY ENTRY IDS (weather buckets)
     def get_all_ids(self) -> List[str]:
@@ -55,12 +260,18 @@ class WeatherAdapter(BaseAdapter):
 
     # RULES FOR EACH BUCKET  (Option A)
     def _filter_bucket(self, bucket: str) -> pd.DataFrame:
-        df = self.df
+        masks = self._bucket_masks()
+        if bucket not in masks:
+            # Should never reach here
+            raise KeyError(f"Unknown weather bucket: {bucket}")
+        return self.df[masks[bucket]]
 
+    def _bucket_masks(self) -> Dict[str, np.ndarray]:
+        """Boolean row mask of every bucket (a row can fall into several)."""
         # convenience vars
-        temp = df["temperature_celsius"]
-        hum = df["humidity"]
-        rain = df["precip_mm"]
+        temp = self.columns["temperature_celsius"]
+        hum = self.columns["humidity"]
+        rain = self.columns["precip_mm"]
 
         # Thresholds
         HOT = temp > 30
@@ -73,53 +284,54 @@ class WeatherAdapter(BaseAdapter):
         HEAVY_RAIN = rain > 20
 
         # Bucket definitions 
-        if bucket == "weather_hot_dry":
-            return df[HOT & DRY_HUMIDITY & NO_RAIN]
-
-        if bucket == "weather_hot_humid":
-            return df[HOT & HUMID]
-
-        if bucket == "weather_cool_dry":
-            return df[COOL & NO_RAIN]
-
-        if bucket == "weather_cool_humid":
-            return df[COOL & HUMID]
-
-        if bucket == "weather_heavy_rain":
-            return df[HEAVY_RAIN]
+        return {
+            "weather_hot_dry": HOT & DRY_HUMIDITY & NO_RAIN,
+            "weather_hot_humid": HOT & HUMID,
+            "weather_cool_dry": COOL & NO_RAIN,
+            "weather_cool_humid": COOL & HUMID,
+            "weather_heavy_rain": HEAVY_RAIN,
+            "weather_moderate": (~HOT & ~COOL) & (~HEAVY_RAIN) & (hum >= 40) & (hum <= 70),
+            "weather_arid": HOT & DRY_HUMIDITY & NO_RAIN,
+        }
 
-        if bucket == "weather_moderate":
-            return df[
-                (~HOT & ~COOL) &
-                (~HEAVY_RAIN) &
-                (hum >= 40) & (hum <= 70)
-            ]
+    # SAMPLING LOGIC
+    def _candidates(self, bucket: str, region_id: Optional[str]) -> Tuple[np.ndarray, str]:
+        """
+        Row positions for (region, bucket): the region itself, then its
+        neighbours, then all of India. Returns (positions, match level).
+        """
+        if region_id:
+            region = normalize_region(region_id)
+            cell = self.index.get(region, {}).get(bucket)
+            if cell is not None:
+                return cell, "region"
 
-        if bucket == "weather_arid":
-            return df[HOT & DRY_HUMIDITY & NO_RAIN]
+            for neighbour in REGION_NEIGHBOURS.get(region, []):
+                cell = self.index.get(neighbour, {}).get(bucket)
+                if cell is not None:
+                    return cell, "neighbour"
 
-        # Should never reach here
-        raise KeyError(f"Unknown weather bucket: {bucket}")
+        cell = self.index[ALL_INDIA].get(bucket)
+        if cell is not None and len(cell):
+            return cell, ALL_INDIA
+        # No row anywhere matches the bucket: any row (approximate)
+        return np.arange(self.n_rows), "approx"
 
-    # SAMPLING LOGIC
-    def sample(self, entry_id: str) -> Dict[str, Any]:
+    def sample(self, entry_id: str, region_id: str = None) -> Dict[str, Any]:
         """
         Returns structured weather JSON consistent with taxonomy attributes.
+        With region_id (e.g. "reg_gujarat") the row is drawn from that region,
+        falling back to neighbouring regions and then all of India.
         """
 
-        if self.df is None:
+        if not self.index:
             raise RuntimeError("Call load() before sample()")
 
-        if entry_id not in self.get_all_ids():
+        if entry_id not in self.index[ALL_INDIA]:
             raise KeyError(f"Unknown weather entry ID: {entry_id}")
 
-        bucket_df = self._filter_bucket(entry_id)
-
-        if bucket_df.empty:
-            # If no rows match, fallback to random row (but mark as 'approx')
-            row = self.df.sample(1).iloc[0]
-        else:
-            row = bucket_df.sample(1).iloc[0]
+        positions, match = self._candidates(entry_id, region_id)
+        position = positions[self.rng.randrange(len(positions))]
 
         # return {
         #     "avg_temperature_c": float(row["temperature_celsius"]),
@@ -131,16 +343,31 @@ class WeatherAdapter(BaseAdapter):
         #     "region": row["region"],
         # }
 
-        return {
+        sample = {
             "avg_temperature_c": None,
             "max_temperature_c": None,   # approx conversion 
             "rainfall_mm": None,
             "humidity_percent": None,
             "wind_speed_kph": None,
-            "location_name": None,
-            "region": None,
+            "location_name": self.location_names[self.location_codes[position]],
+            "region": self.regions[self.region_codes[position]],
+            "region_match": match,
         }
 
+        # Stable climate context instead of a single noisy observation
+        if self.climatology is not None:
+            climate = self.climatology.lookup(
+                location_id=self.location_ids[self.location_codes[position]],
+                region_id=self.region_ids[self.region_codes[position]],
+                month=int(self.months[position]) if self.months is not None else None
+            )
+            sample["climate"] = climate
+            if climate:
+                for field, stat in CLIMATE_FIELDS.items():
+                    sample[field] = climate.get(stat)
+
+        return sample
+
     # # WEATHER STRESS LABEL
     # def _infer_weather_stress(self, bucket: str) -> str:
     #     if bucket in ["weather_hot_dry", "weather_arid"]:
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from agri_data_gen.core.data_access.adapters.weather_adapter import normalize_region
+
+# Month 0 rows summarise all months of a location / region
+ALL_MONTHS = 0
+
+LEVELS = {
+    "location": "location_id",
+    "region": "region_id",
+}
+
+
+def require_parquet():
+    """Fails early with an install hint when pandas has no Parquet engine."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "Climatology tables are stored as Parquet, which needs the 'pyarrow' package: pip install pyarrow"
+        ) from e
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["location_id"] = df["location_name"].str.lower().str.replace(" ", "_")
+    df["region_id"] = df["region"].map(normalize_region)
+
+    observed = pd.to_datetime(df["last_updated"])
+    df["month"] = observed.dt.month.astype("int8")
+    df["date"] = observed.dt.normalize()
+    return df
+
+
+def _summarise(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """One row per (key, month) with means, extremes, percentiles and rain-day frequency."""
+    grouped = df.groupby([key, "month"], sort=True)
+
+    table = grouped.agg(
+        n_obs=("temperature_celsius", "size"),
+        temp_mean_c=("temperature_celsius", "mean"),
+        temp_min_c=("temperature_celsius", "min"),
+        temp_max_c=("temperature_celsius", "max"),
+        humidity_mean=("humidity", "mean"),
+        humidity_min=("humidity", "min"),
+        humidity_max=("humidity", "max"),
+        precip_mean_mm=("precip_mm", "mean"),
+        precip_max_mm=("precip_mm", "max"),
+        wind_mean_kph=("wind_kph", "mean"),
+        wind_max_kph=("wind_kph", "max"),
+    )
+
+    for column, prefix in (("temperature_celsius", "temp"), ("humidity", "humidity")):
+        percentiles = grouped[column].quantile([0.1, 0.5, 0.9]).unstack()
+        percentiles.columns = [f"{prefix}_p{int(q * 100)}" for q in percentiles.columns]
+        table = table.join(percentiles)
+
+    # A rain day is a calendar day with any recorded precipitation
+    rain_days = df.groupby([key, "month", "date"])["precip_mm"].max().gt(0)
+    days = rain_days.groupby(level=[0, 1]).agg(["size", "mean"])
+    table["n_days"] = days["size"]
+    table["rain_day_freq"] = days["mean"]
+
+    return table.reset_index()
+
+
+def build_climatology(csv_path: str = "data/raw/weather.csv",
+                      out_dir: str = "data/climatology") -> Dict[str, Path]:
+    """
+    Rolls weather.csv up into monthly climatology tables by location and by
+    region (plus an all-months row per key, month 0), written as Parquet.
+    Returns {level: path}.
+    """
+    require_parquet()
+    path = Path(csv_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Weather dataset not found at: {path}")
+
+    df = _prepare(pd.read_csv(path))
+    all_months = df.assign(month=np.int8(ALL_MONTHS))
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    written = {}
+    for level, key in LEVELS.items():
+        table = pd.concat([_summarise(df, key), _summarise(all_months, key)], ignore_index=True)
+        table = table.sort_values([key, "month"], ignore_index=True)
+
+        written[level] = out / f"{level}_monthly.parquet"
+        table.to_parquet(written[level], index=False)
+        print(f"Wrote {len(table)} {level} climatology rows to {written[level]}")
+
+    return written
+
+
+class Climatology:
+    """
+    Precomputed climatology tables with O(1) lookups by
+    (location or region, month). Build them with build_climatology().
+    """
+
+    def __init__(self, out_dir: str = "data/climatology"):
+        self.out_dir = Path(out_dir)
+        self.tables: Dict[str, Dict[Tuple[str, int], Dict[str, Any]]] = {}
+
+    def load(self) -> "Climatology":
+        require_parquet()
+        for level, key in LEVELS.items():
+            path = self.out_dir / f"{level}_monthly.parquet"
+            if not path.exists():
+                raise FileNotFoundError(f"Climatology table not found at {path}. Run build-climatology first.")
+
+            table = pd.read_parquet(path)
+            stats = table.drop(columns=[key, "month"]).round(2)
+            self.tables[level] = {
+                (k, int(m)): row
+                for k, m, row in zip(table[key], table["month"], stats.to_dict("records"))
+            }
+        return self
+
+    def lookup(self, location_id: str = None, region_id: str = None,
+               month: int = None) -> Optional[Dict[str, Any]]:
+        """
+        Climate summary for a location (preferred) or region in a month.
+        Missing months fall back to the all-months summary.
+        """
+        candidates = []
+        if location_id:
+            candidates.append(("location", location_id))
+        if region_id:
+            candidates.append(("region", normalize_region(region_id)))
+
+        for level, key in candidates:
+            table = self.tables.get(level, {})
+            for m in (month, ALL_MONTHS):
+                if m is not None and (key, m) in table:
+                    return {"level": level, "month": m, **table[(key, m)]}
+        return None
@@ -0,0 +1,100 @@
+import sys
+import threading
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Any, List, Tuple
+
+# Arrays start on 64-byte boundaries inside the block
+ALIGNMENT = 64
+
+_attach_lock = threading.Lock()
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays packed into one multiprocessing.shared_memory block.
+
+    The publishing process calls publish() once and hands `handle` (a small,
+    picklable dict) to its workers, e.g. via a pool initializer. Workers
+    call attach(handle) and get read-only zero-copy views, so memory does not
+    grow with the number of workers and attaching costs no parsing.
+    Small non-array metadata (category names, index layout) travels in the
+    handle itself.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: List[Tuple[str, str, tuple, int]],
+                 meta: Dict[str, Any], owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.meta = meta
+        self.owner = owner
+
+        self.arrays: Dict[str, np.ndarray] = {}
+        for key, dtype, shape, offset in layout:
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            view.flags.writeable = False
+            self.arrays[key] = view
+
+    @classmethod
+    def publish(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any] = None) -> "SharedArrays":
+        """Copies the arrays into a new shared block. The caller owns (and must unlink) it."""
+        layout, offset = [], 0
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise TypeError(f"Array '{key}' has dtype object; only numeric arrays can be shared.")
+            layout.append((key, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (key, dtype, shape, start), array in zip(layout, arrays.values()):
+            target = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=start)
+            target[...] = array
+
+        return cls(shm, layout, meta or {}, owner=True)
+
+    @classmethod
+    def attach(cls, handle: Dict[str, Any]) -> "SharedArrays":
+        """Maps a block published elsewhere. Never copies the data."""
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=handle["name"], track=False)
+        else:
+            # Before 3.13 attaching registers the block with the resource
+            # tracker, which then unlinks it when a worker exits. Only the
+            # publisher should own the block, so skip the registration.
+            with _attach_lock:
+                register = resource_tracker.register
+                resource_tracker.register = lambda name, rtype: None
+                try:
+                    shm = shared_memory.SharedMemory(name=handle["name"])
+                finally:
+                    resource_tracker.register = register
+
+        return cls(shm, [tuple(entry) for entry in handle["layout"]], handle["meta"], owner=False)
+
+    @property
+    def handle(self) -> Dict[str, Any]:
+        return {"name": self.shm.name, "layout": self.layout, "meta": self.meta}
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.arrays
+
+    def close(self):
+        """Drops this process's mapping; the owner also removes the block."""
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,37 +1,65 @@
 import os
 import yaml
+import hashlib
+import concurrent.futures
 from pathlib import Path
 from typing import Dict, List, Any
-from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from agri_data_gen.core.data_access.taxonomy_store import get_store
+
 load_dotenv()
 
 
+def parse_taxonomy_file(path: Path) -> Dict[str, Any]:
+    """
+    Parse one taxonomy YAML/JSON file.
+    Module-level so it can run in a process pool.
+    """
+    if path.suffix in {".yaml", ".yml"}:
+        return yaml.safe_load(path.read_text(encoding="utf-8"))
+    elif path.suffix == ".json":
+        import json
+        return json.loads(path.read_text(encoding="utf-8"))
+    else:
+        raise ValueError(f"Unsupported taxonomy file type: {path}")
+
+
 class TaxonomyManager:
     """
     Manages taxonomy schemas (dimensions), not data.
     Each taxonomy corresponds to exactly one dimension (group).
+
+    Storage is pluggable (MongoDB or an embedded SQLite file, chosen by the
+    TAXONOMY_BACKEND env var). Reads go through a process-wide cache that is
+    invalidated when the store's version counter changes.
     """
 
     REQUIRED_KEYS = {"group", "attributes", "entries"}
 
-    def __init__(self, db_name: str = "taxonomy_db", collection_name: str = "taxonomies"):
-        mongo_uri = os.getenv("MONGO_URI")
-        if not mongo_uri:
-            raise ValueError("MONGO_URI environment variable not set.")
-
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client[db_name]
-        self.collection = self.db[collection_name]
-
-        # index for fast lookup by group
-        self.collection.create_index("group", unique=True)
+    def __init__(self,
+                 db_name: str = "taxonomy_db",
+                 collection_name: str = "taxonomies",
+                 backend: str = None):
+        backend = backend or os.getenv("TAXONOMY_BACKEND", "mongo")
+        if backend == "mongo":
+            self.store = get_store(backend, db_name=db_name, collection_name=collection_name)
+        else:
+            self.store = get_store(backend)
+        self.cache = self.store.cache
 
-    def load_from_files_and_store(self, taxonomy_dir: str) -> None:
+    def load_from_files_and_store(self,
+                                  taxonomy_dir: str,
+                                  force: bool = False,
+                                  max_workers: int = None) -> int:
         """
-        Load taxonomy YAML/JSON files and upsert them into MongoDB.
+        Load taxonomy YAML/JSON files and upsert them into the taxonomy store.
         One document per taxonomy (group).
+
+        Files whose content hash matches the last load are skipped, changed
+        files are parsed in parallel, and all upserts go out in one bulk write
+        that bumps the taxonomy version once. Returns the number of upserted
+        taxonomies.
         """
 
         taxonomy_paths = (
@@ -43,40 +71,82 @@ class TaxonomyManager:
         if not taxonomy_paths:
             raise FileNotFoundError(f"No taxonomy files found in {taxonomy_dir}")
 
-        for path in taxonomy_paths:
-            taxonomy = self._load_taxonomy_file(path)
+        # 1. Detect changed files by content hash
+        known_hashes = {} if force else self.store.get_source_hashes()
+        current_hashes = {
+            str(path.resolve()): hashlib.sha256(path.read_bytes()).hexdigest()
+            for path in taxonomy_paths
+        }
+        changed_paths = [
+            path for path in taxonomy_paths
+            if known_hashes.get(str(path.resolve())) != current_hashes[str(path.resolve())]
+        ]
+
+        if not changed_paths:
+            print(f"All {len(taxonomy_paths)} taxonomy files unchanged. Nothing to load.")
+            return 0
+
+        # 2. Parse changed files (in parallel when there is enough work)
+        if len(changed_paths) > 1 and max_workers != 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                taxonomies = list(executor.map(parse_taxonomy_file, changed_paths))
+        else:
+            taxonomies = [parse_taxonomy_file(path) for path in changed_paths]
+
+        taxonomy_docs = []
+        for path, taxonomy in zip(changed_paths, taxonomies):
             self._validate_taxonomy_schema(taxonomy)
 
-            taxonomy_doc = {
+            taxonomy_docs.append({
                 "group": taxonomy["group"],
                 "description": taxonomy.get("description", ""),
                 "attributes": taxonomy["attributes"],
                 "entries": taxonomy["entries"],
                 "source_file": path.name,
                 "active": True
-            }
+            })
 
-            # upsert by group (dimension name)
-            self.collection.update_one(
-                {"group": taxonomy_doc["group"]},
-                {"$set": taxonomy_doc},
-                upsert=True
-            )
+        # 3. upsert by group (dimension name) in a single bulk write
+        changed_hashes = {str(path.resolve()): current_hashes[str(path.resolve())] for path in changed_paths}
+        self.store.upsert_many(taxonomy_docs, source_hashes=changed_hashes)
+
+        with self.cache.lock:
+            self.cache.clear()
+
+        print(f"Upserted {len(taxonomy_docs)} changed taxonomies "
+              f"({len(taxonomy_paths) - len(changed_paths)} unchanged files skipped).")
+        return len(taxonomy_docs)
+
+    def get_version(self) -> int:
+        """
+        Returns the taxonomy version counter. It increases on every write,
+        so caches and bundle manifests can key on it.
+        """
+        return self.store.get_version()
 
     def get_active_taxonomies(self) -> List[Dict[str, Any]]:
         """
         Returns all active taxonomy definitions.
         """
-        return list(self.collection.find({"active": True}, {"_id": 0}))
+        with self.cache.lock:
+            self.cache.sync(self.store)
+            if not self.cache.all_loaded:
+                self.cache.groups = {t["group"]: t for t in self.store.find_active()}
+                self.cache.all_loaded = True
+            return list(self.cache.groups.values())
 
     def get_taxonomy(self, group: str) -> Dict[str, Any]:
         """
         Fetch a taxonomy by group name.
         """
-        taxonomy = self.collection.find_one(
-            {"group": group, "active": True},
-            {"_id": 0}
-        )
+        with self.cache.lock:
+            self.cache.sync(self.store)
+            taxonomy = self.cache.groups.get(group)
+            if taxonomy is None and not self.cache.all_loaded:
+                taxonomy = self.store.find_one(group)
+                if taxonomy:
+                    self.cache.groups[group] = taxonomy
+
         if not taxonomy:
             raise KeyError(f"Active taxonomy not found for group '{group}'")
         return taxonomy
@@ -96,13 +166,7 @@ class TaxonomyManager:
         return taxonomy["attributes"]
 
     def _load_taxonomy_file(self, path: Path) -> Dict[str, Any]:
-        if path.suffix in {".yaml", ".yml"}:
-            return yaml.safe_load(path.read_text(encoding="utf-8"))
-        elif path.suffix == ".json":
-            import json
-            return json.loads(path.read_text(encoding="utf-8"))
-        else:
-            raise ValueError(f"Unsupported taxonomy file type: {path}")
+        return parse_taxonomy_file(path)
 
     def _validate_taxonomy_schema(self, taxonomy: Dict[str, Any]) -> None:
         missing = self.REQUIRED_KEYS - taxonomy.keys()
@@ -126,6 +190,8 @@ class TaxonomyManager:
 
                 
     def reset_taxonomy_collection(self):
-        """Deletes all taxonomy documents from MongoDB."""
-        result = self.collection.delete_many({})
-        return result.deleted_count
+        """Deletes all taxonomy documents from the store."""
+        deleted = self.store.delete_all()
+        with self.cache.lock:
+            self.cache.clear()
+        return deleted
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+
+class TaxonomyCache:
+    """
+    In-process read-through cache of taxonomy documents, keyed by group.
+
+    The cache remembers the store version it was filled at. The version is
+    re-checked at most once every `ttl` seconds; a changed version drops
+    every cached group.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self.all_loaded = False
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.groups = {}
+        self.all_loaded = False
+        self.version = None
+        self._checked_at = 0.0
+
+    def sync(self, store: "BaseTaxonomyStore"):
+        """Invalidate the cache if the store version moved on."""
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.ttl:
+            return
+
+        current = store.get_version()
+        if current != self.version:
+            self.groups = {}
+            self.all_loaded = False
+            self.version = current
+        self._checked_at = now
+
+
+class BaseTaxonomyStore(ABC):
+    """
+    Abstract storage backend for taxonomy documents (one per group).
+    Every write bumps a monotonically increasing version counter.
+    """
+
+    def __init__(self):
+        self.cache = TaxonomyCache()
+
+    @abstractmethod
+    def upsert_many(self, docs: List[Dict[str, Any]], source_hashes: Dict[str, str] = None) -> None:
+        """
+        Insert or replace taxonomy documents by group in one write, and
+        record the content hashes of the source files they came from.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_source_hashes(self) -> Dict[str, str]:
+        """Return {source file path: content hash} from previous loads."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_active(self) -> List[Dict[str, Any]]:
+        """Return all active taxonomy documents."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_one(self, group: str) -> Optional[Dict[str, Any]]:
+        """Return the active document for a group, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_all(self) -> int:
+        """Delete every taxonomy document. Returns the number deleted."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_version(self) -> int:
+        """Return the current taxonomy version counter."""
+        raise NotImplementedError
+
+
+class MongoTaxonomyStore(BaseTaxonomyStore):
+    """
+    MongoDB backend. Clients and index creation are shared per process.
+    """
+
+    _clients: Dict[str, Any] = {}
+    _indexed = set()
+    _lock = threading.Lock()
+
+    def __init__(self, db_name: str = "taxonomy_db", collection_name: str = "taxonomies"):
+        super().__init__()
+        from pymongo import MongoClient
+
+        mongo_uri = os.getenv("MONGO_URI")
+        if not mongo_uri:
+            raise ValueError("MONGO_URI environment variable not set.")
+
+        with self._lock:
+            if mongo_uri not in self._clients:
+                self._clients[mongo_uri] = MongoClient(mongo_uri)
+            self.client = self._clients[mongo_uri]
+
+            self.db = self.client[db_name]
+            self.collection = self.db[collection_name]
+            self.meta = self.db[f"{collection_name}_meta"]
+
+            # index for fast lookup by group (once per process)
+            index_key = (mongo_uri, db_name, collection_name)
+            if index_key not in self._indexed:
+                self.collection.create_index("group", unique=True)
+                self._indexed.add(index_key)
+
+    def _bump_version(self):
+        self.meta.update_one({"_id": "version"}, {"$inc": {"value": 1}}, upsert=True)
+
+    def upsert_many(self, docs: List[Dict[str, Any]], source_hashes: Dict[str, str] = None) -> None:
+        from pymongo import UpdateOne
+
+        if docs:
+            self.collection.bulk_write(
+                [UpdateOne({"group": doc["group"]}, {"$set": doc}, upsert=True) for doc in docs],
+                ordered=False
+            )
+
+        if source_hashes:
+            # File paths contain dots, so store them as a list rather than as keys
+            merged = {**self.get_source_hashes(), **source_hashes}
+            self.meta.update_one(
+                {"_id": "source_hashes"},
+                {"$set": {"files": [{"path": p, "hash": h} for p, h in merged.items()]}},
+                upsert=True
+            )
+        self._bump_version()
+
+    def get_source_hashes(self) -> Dict[str, str]:
+        doc = self.meta.find_one({"_id": "source_hashes"})
+        if not doc:
+            return {}
+        return {item["path"]: item["hash"] for item in doc.get("files", [])}
+
+    def find_active(self) -> List[Dict[str, Any]]:
+        return list(self.collection.find({"active": True}, {"_id": 0}))
+
+    def find_one(self, group: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"group": group, "active": True}, {"_id": 0})
+
+    def delete_all(self) -> int:
+        result = self.collection.delete_many({})
+        # Forget source hashes so the next load re-inserts everything
+        self.meta.delete_one({"_id": "source_hashes"})
+        self._bump_version()
+        return result.deleted_count
+
+    def get_version(self) -> int:
+        doc = self.meta.find_one({"_id": "version"})
+        return doc["value"] if doc else 0
+
+
+class SQLiteTaxonomyStore(BaseTaxonomyStore):
+    """
+    Embedded single-file backend for offline and CI runs.
+    Documents are stored as JSON, one row per group.
+    """
+
+    def __init__(self, db_path: str = None):
+        super().__init__()
+        self.db_path = Path(db_path or os.getenv("TAXONOMY_SQLITE_PATH", "data/taxonomies.sqlite"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS taxonomies "
+                "(grp TEXT PRIMARY KEY, active INTEGER NOT NULL, doc TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, hash TEXT NOT NULL)"
+            )
+
+    def _bump_version(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def upsert_many(self, docs: List[Dict[str, Any]], source_hashes: Dict[str, str] = None) -> None:
+        rows = [
+            (doc["group"], int(doc.get("active", True)), json.dumps(doc, ensure_ascii=False))
+            for doc in docs
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO taxonomies (grp, active, doc) VALUES (?, ?, ?) "
+                "ON CONFLICT(grp) DO UPDATE SET active = excluded.active, doc = excluded.doc",
+                rows
+            )
+            if source_hashes:
+                self.conn.executemany(
+                    "INSERT INTO sources (path, hash) VALUES (?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET hash = excluded.hash",
+                    list(source_hashes.items())
+                )
+            self._bump_version()
+
+    def get_source_hashes(self) -> Dict[str, str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT path, hash FROM sources").fetchall()
+        return dict(rows)
+
+    def find_active(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT doc FROM taxonomies WHERE active = 1").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def find_one(self, group: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT doc FROM taxonomies WHERE grp = ? AND active = 1", (group,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_all(self) -> int:
+        with self.lock, self.conn:
+            deleted = self.conn.execute("DELETE FROM taxonomies").rowcount
+            # Forget source hashes so the next load re-inserts everything
+            self.conn.execute("DELETE FROM sources")
+            self._bump_version()
+        return deleted
+
+    def get_version(self) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+
+STORE_BACKENDS = {
+    "mongo": MongoTaxonomyStore,
+    "sqlite": SQLiteTaxonomyStore,
+}
+
+_stores: Dict[tuple, BaseTaxonomyStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(backend: str = None, **kwargs) -> BaseTaxonomyStore:
+    """
+    Returns a process-wide store instance for the given backend.
+    The backend defaults to the TAXONOMY_BACKEND env var, then "mongo".
+    """
+    backend = backend or os.getenv("TAXONOMY_BACKEND", "mongo")
+    if backend not in STORE_BACKENDS:
+        raise ValueError(
+            f"Unknown taxonomy backend '{backend}'. Choose from: {list(STORE_BACKENDS)}"
+        )
+
+    key = (backend, tuple(sorted(kwargs.items())))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = STORE_BACKENDS[backend](**kwargs)
+        return _stores[key]
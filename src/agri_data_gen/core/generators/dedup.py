@@ -0,0 +1,236 @@
+import re
+import zlib
+import threading
+import numpy as np
+from typing import Dict, Any, List, Optional, Hashable, Tuple
+
+from agri_data_gen.core.storage import json_codec
+from agri_data_gen.core.providers.response_parser import split_response_text
+from agri_data_gen.core.generators.quality_gate import advisory_text
+
+# Prime just above 2**32: with 32-bit shingle hashes and coefficients,
+# a * x + b cannot overflow uint64
+HASH_PRIME = np.uint64(4294967311)
+
+# Bundle keys that are not taxonomy axes
+NON_AXIS_KEYS = ("id", "bundle_id", "feasibility")
+
+
+def record_text(output: Dict[str, Any]) -> str:
+    """Advisory text of a generated record's output (a Gemini response, see OutputRecord)."""
+    if not isinstance(output, dict):
+        return ""
+    _, answer = split_response_text(output)
+    answer = answer.strip()
+    if answer.startswith("```"):
+        answer = answer.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        return advisory_text(json_codec.loads(answer))
+    except (json_codec.JSONDecodeError, ValueError):
+        return answer
+
+
+def bundle_axes(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """{axis: entry id} of a bundle, e.g. {"region": "reg_gujarat", "crop": "crop_rice"}."""
+    return {
+        axis: value.get("id")
+        for axis, value in bundle.items()
+        if axis not in NON_AXIS_KEYS and isinstance(value, dict)
+    }
+
+
+def _bands_for(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint is nearest `threshold`."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class DedupIndex:
+    """
+    Incremental MinHash / LSH index over advisory texts.
+
+    Each text becomes a MinHash signature of its character shingles. The
+    signature is cut into bands; texts sharing any band bucket are
+    candidates, and a candidate whose estimated Jaccard similarity reaches
+    `threshold` joins its cluster. Adding a text costs O(bands) lookups
+    instead of a comparison with every earlier text.
+
+    With skip_after=k, once a cluster has k members the axis values its
+    bundles share (e.g. crop + stress, any region) become a neighbourhood,
+    and should_skip() reports remaining bundles inside it, so no quota is
+    spent on advisories that would come out the same.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5,
+                 seed: int = 1, skip_after: int = 0):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.skip_after = skip_after
+        self.bands, self.rows = _bands_for(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self.keys: List[Hashable] = []
+        self.signatures: List[np.ndarray] = []
+        self.axes: List[Optional[Dict[str, Any]]] = []
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self.parent: List[int] = []  # union-find over positions
+        self.members: Dict[int, List[int]] = {}  # cluster root -> positions
+        self.neighbourhoods: List[Dict[str, Any]] = []
+        self.skipped_roots = set()
+        self.lock = threading.Lock()
+
+    def _shingles(self, text: str) -> np.ndarray:
+        text = re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text.lower())).strip()
+        k = self.shingle_size
+        if len(text) <= k:
+            grams = {text}
+        else:
+            grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        """num_perm minimum hashes of the text's shingles under (a * x + b) mod p."""
+        shingles = self._shingles(text)
+        hashed = (self.a[:, None] * shingles[None, :] + self.b[:, None]) % HASH_PRIME
+        return hashed.min(axis=1)
+
+    def _find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def _union(self, i: int, j: int) -> int:
+        """Merges two clusters; the earlier position stays the root (lock held)."""
+        ri, rj = self._find(i), self._find(j)
+        if ri == rj:
+            return ri
+        root, child = min(ri, rj), max(ri, rj)
+        self.parent[child] = root
+        self.members[root].extend(self.members.pop(child))
+        return root
+
+    def add(self, key: Hashable, text: str, bundle: Dict[str, Any] = None) -> Optional[Hashable]:
+        """
+        Indexes one advisory. Returns the key of its cluster's first member
+        when the text is a near-duplicate of an earlier one, else None.
+        """
+        if not text or not text.strip():
+            return None
+        return self._insert(key, self.signature(text), bundle_axes(bundle) if bundle is not None else None)
+
+    def _insert(self, key: Hashable, signature: np.ndarray, axes: Optional[Dict[str, Any]]) -> Optional[Hashable]:
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        with self.lock:
+            position = len(self.keys)
+            self.keys.append(key)
+            self.signatures.append(signature)
+            self.axes.append(axes)
+            self.parent.append(position)
+            self.members[position] = [position]
+
+            candidates = set()
+            for band, band_key in enumerate(band_keys):
+                bucket = self.buckets[band].setdefault(band_key, [])
+                candidates.update(bucket)
+                bucket.append(position)
+
+            root = None
+            for other in candidates:
+                # Estimated Jaccard similarity: share of equal MinHash values
+                if float(np.mean(self.signatures[other] == signature)) >= self.threshold:
+                    root = self._union(position, other)
+
+            if root is None:
+                return None
+            self._update_neighbourhood(root)
+            return self.keys[root]
+
+    def _update_neighbourhood(self, root: int):
+        """Registers the shared axis values of a cluster once it has skip_after members (lock held)."""
+        if not self.skip_after:
+            return
+        if root in self.skipped_roots or len(self.members[root]) < self.skip_after:
+            return
+        members = [self.axes[i] for i in self.members[root] if self.axes[i]]
+        if len(members) < self.skip_after:
+            return
+        self.skipped_roots.add(root)
+
+        shared = {axis: value for axis, value in members[0].items()
+                  if all(m.get(axis) == value for m in members[1:])}
+        # Identical bundles or nothing in common: no neighbourhood to skip
+        if shared and len(shared) < len(members[0]) and shared not in self.neighbourhoods:
+            self.neighbourhoods.append(shared)
+
+    def should_skip(self, bundle: Dict[str, Any]) -> bool:
+        """True if the bundle lies in the neighbourhood of a large duplicate cluster."""
+        if not self.neighbourhoods:
+            return False
+        axes = bundle_axes(bundle)
+        with self.lock:
+            return any(all(axes.get(axis) == value for axis, value in shared.items())
+                       for shared in self.neighbourhoods)
+
+    def clusters(self, min_size: int = 2) -> List[List[Hashable]]:
+        """Near-duplicate clusters (keys in insertion order), largest first."""
+        with self.lock:
+            found = [[self.keys[i] for i in sorted(positions)]
+                     for positions in self.members.values() if len(positions) >= min_size]
+        return sorted(found, key=len, reverse=True)
+
+    def report(self, top: int = 10) -> Dict[str, Any]:
+        """Prints and returns cluster statistics."""
+        clusters = self.clusters()
+        duplicates = sum(len(c) - 1 for c in clusters)
+        summary = {
+            "texts": len(self.keys),
+            "clusters": len(clusters),
+            "duplicates": duplicates,
+            "neighbourhoods": list(self.neighbourhoods),
+        }
+        print(f"Dedup: {len(self.keys)} advisories, {len(clusters)} near-duplicate clusters, "
+              f"{duplicates} redundant (threshold {self.threshold}, {self.bands}x{self.rows} bands)")
+        for members in clusters[:top]:
+            shown = ", ".join(str(k) for k in members[:8])
+            print(f"  {len(members):>4}: {shown}{' ...' if len(members) > 8 else ''}")
+        for shared in self.neighbourhoods:
+            print(f"  skipping neighbourhood {shared}")
+        return summary
+
+    def save(self, path: str) -> str:
+        """Writes keys, signatures and bundle axes to one .npz file."""
+        with self.lock:
+            meta = json_codec.dumps({
+                "threshold": self.threshold, "num_perm": self.num_perm,
+                "shingle_size": self.shingle_size, "seed": self.seed,
+                "skip_after": self.skip_after, "keys": self.keys, "axes": self.axes,
+            })
+            signatures = np.array(self.signatures, dtype=np.uint64).reshape(len(self.keys), self.num_perm)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, signatures=signatures, meta=np.array(meta))
+        return str(path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = None, skip_after: int = None) -> "DedupIndex":
+        """
+        Restores a saved index; clusters and neighbourhoods are rebuilt.
+        `threshold` / `skip_after` override the saved values: the stored
+        signatures are simply re-banded and re-clustered under them.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            meta = json_codec.loads(str(data["meta"]))
+            signatures = data["signatures"]
+
+        index = cls(meta["threshold"] if threshold is None else threshold, meta["num_perm"],
+                    meta["shingle_size"], meta["seed"],
+                    meta["skip_after"] if skip_after is None else skip_after)
+        for key, axes, signature in zip(meta["keys"], meta["axes"], signatures):
+            index._insert(key, signature, axes)
+        return index
@@ -1,6 +1,4 @@
-import os
 import time
-import json
 import threading
 import concurrent.futures
 from pathlib import Path
@@ -8,26 +6,17 @@ from typing import Dict, Any, List
 from tqdm import tqdm 
 
 from agri_data_gen.core.prompt.prompt_builder import PromptBuilder
-from agri_data_gen.core.providers.gemini_provider import GeminiProvider
+from agri_data_gen.core.profiling.stage_profiler import profile_stage
+from agri_data_gen.core.storage import json_codec, frame_store
+from agri_data_gen.core.storage.line_index import JsonlIndex
+from agri_data_gen.core.providers.gemini_provider import GeminiProvider, StreamAborted
+from agri_data_gen.core.providers.rate_limiter import RateLimiter
+from agri_data_gen.core.providers.credential_pool import CredentialPool
+from agri_data_gen.core.providers.response_parser import split_response_text
+from agri_data_gen.core.generators.dedup import record_text
+from agri_data_gen.core.generators.quality_gate import StreamMonitor
 
 
-class RateLimiter:
-    """
-    Manages API rate limits (RPM) locally to prevent 429 errors.
-    """
-    def __init__(self, max_calls_per_minute: int = 10):
-        self.delay = 60.0 / max_calls_per_minute
-        self.last_call = 0.0
-        self.lock = threading.Lock()
-
-    def wait(self):
-        with self.lock:
-            now = time.time()
-            elapsed = now - self.last_call
-            if elapsed < self.delay:
-                time.sleep(self.delay - elapsed)
-            self.last_call = time.time()
-
 class GenerationEngine:
     """
     Optimized Engine for JSONL Bundles.
@@ -38,12 +27,40 @@ class GenerationEngine:
                  bundle_file: str = "data/bundles/bundles.jsonl",
                  out_file: str = "data/generated/data.jsonl",
                  max_workers: int = 1,  # Adjust based on API tier
-                 rpm_limit: int = 10):  
+                 rpm_limit: int = 10,  # per key when key_pool is on
+                 key_pool: bool = False,
+                 pack_size: int = 1,  # bundles per request; 1 disables packing
+                 quality_gate=None,  # optional QualityGate checking records as they are written
+                 dedup=None,  # optional DedupIndex of the advisories written so far
+                 stream: bool = False):  # stream responses and abort off-spec ones early
         
         self.bundle_file = Path(bundle_file)
         self.out_file = Path(out_file)
-        self.provider = GeminiProvider()
+        # Compact (.npz) bundle spaces are dereferenced per row inside the workers
+        self.bundle_space = None
+        # Opened by generate_all(); ".zst" output files are written as compressed frames
+        self.writer = None
         self.max_workers = max_workers
+        self.pack_size = max(1, pack_size)
+        self.quality_gate = quality_gate
+        self.dedup = dedup
+        # Rows left out because they sit in a near-duplicate neighbourhood
+        self.dedup_skipped: List[int] = []
+        self.stream = stream
+        # Rows whose stream was cut off early, generated again after the pass
+        self.aborted_rows: List[int] = []
+        self.abort_reasons: Dict[str, int] = {}
+        # Rows whose request failed after the provider's own retries
+        self.failed_rows: List[int] = []
+
+        # Either one pinned key, or every GOOGLE_API_KEY* key with its own limiter
+        self.pool = None
+        if key_pool:
+            self.pool = CredentialPool.from_env(rpm_limit=rpm_limit)
+            self.providers = {s.name: GeminiProvider(api_key=s.api_key) for s in self.pool.states}
+            print(f"Using {len(self.pool)} API keys from the credential pool.")
+        else:
+            self.provider = GeminiProvider()
         
         # Ensure output directory exists
         self.out_file.parent.mkdir(parents=True, exist_ok=True)
@@ -62,64 +79,225 @@ class GenerationEngine:
         """
         processed_ids = set()
         if self.out_file.exists():
-            with open(self.out_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        record = json.loads(line)
-                        # Assuming the input bundle has a 'bundle_id' or we use index
-                        if "bundle_id" in record:
-                            processed_ids.add(record["bundle_id"])
-                        # elif "id" in record:
-                        #     processed_ids.add(record["id"])
-                    except json.JSONDecodeError:
-                        continue
+            for record in frame_store.iter_records(self.out_file, skip_invalid=True):
+                # Assuming the input bundle has a 'bundle_id' or we use index
+                if "bundle_id" in record:
+                    processed_ids.add(record["bundle_id"])
+                elif isinstance(record.get("id"), int):
+                    # Generated records are keyed by their 1-based row number
+                    processed_ids.add(f"row_{record['id']}")
+
+        if self.quality_gate is not None:
+            # Rejected records are written but not done: they get generated again
+            processed_ids -= {f"row_{record_id}" for record_id in self.quality_gate.pending_retry()}
         return processed_ids
 
     def _process_single_bundle(self, line: str, line_idx: int):
         """
-        Worker function to process one line of JSONL.
+        Worker function to process one line of JSONL
+        (or one row of a compact bundle space, when `line` is None).
         """
         try:
-            bundle = json.loads(line)
+            if line is None:
+                bundle = self.bundle_space.bundle(line_idx - 1)
+            else:
+                bundle = json_codec.loads(line)
             #  This ID determines resume capability. 
             bundle_id = bundle.get("bundle_id", f"row_{line_idx}")
 
-            # Input Construction
-            input_context = bundle # Pass everything (Crop, Weather, etc.)
-            
-            # Prompt Building
-            prompt = PromptBuilder.build(
-                json.dumps(input_context, ensure_ascii=False, indent=2), 
-                bundle_id
-            )
+            if self.dedup is not None and self.dedup.should_skip(bundle):
+                self.dedup_skipped.append(line_idx)
+                return False
 
-            # Rate Limiting 
-            self.limiter.wait()
+            # Prompt Building (pass everything: Crop, Weather, etc.)
+            with profile_stage("prompt_render"):
+                prompt = PromptBuilder.render(bundle, bundle_id)
 
-            # API Call with Retry Logic
-            response = self._call_provider_with_retry(prompt)
+            response = self._call(prompt)
 
             # Result Construction
-            combined_record = {
-                "id": line_idx,
-                # "bundle_id": bundle_id,
-                # "input": input_context,
-                "output": response 
-            }
-
-            # Thread-Safe Write with FLUSH
-            with self.file_lock:
-                with open(self.out_file, "a", encoding="utf-8") as f_out:
-                    f_out.write(json.dumps(combined_record, ensure_ascii=False) + "\n")
-                    f_out.flush() 
-                    os.fsync(f_out.fileno())
+            combined_record = json_codec.make_output_record(line_idx, response)
+            self._write_records([combined_record])
+
+            if self.dedup is not None:
+                self.dedup.add(line_idx, record_text(response), bundle)
 
             return True
 
+        except StreamAborted as e:
+            self._record_abort([line_idx], e.reason)
+            return False
+
         except Exception as e:
             print(f"Error processing row {line_idx}: {e}")
+            with self.file_lock:
+                self.failed_rows.append(line_idx)
             return False
 
+    def _record_abort(self, rows: List[int], reason: str):
+        with self.file_lock:
+            self.aborted_rows.extend(rows)
+            self.abort_reasons[reason] = self.abort_reasons.get(reason, 0) + 1
+
+    def _process_pack(self, items: List[tuple]) -> int:
+        """
+        Sends several bundles in one request and splits the JSON-array answer
+        back into one record per bundle. Bundles missing from a parsed answer
+        are retried in two halves, down to the single-bundle path. A failed
+        request (API error, aborted stream, unreadable answer) is not split:
+        its rows go to the end-of-run retry pass instead.
+        Returns the number of records written.
+        """
+        if len(items) == 1:
+            return int(self._process_single_bundle(*items[0]))
+
+        # (line, line_idx, bundle_id, bundle JSON) per bundle in the pack
+        entries, bundles = [], {}
+        for line, line_idx in items:
+            try:
+                bundle = self.bundle_space.bundle(line_idx - 1) if line is None else json_codec.loads(line)
+            except Exception as e:
+                print(f"Error reading row {line_idx}: {e}")
+                continue
+            if self.dedup is not None and self.dedup.should_skip(bundle):
+                self.dedup_skipped.append(line_idx)
+                continue
+            bundle_id = str(bundle.get("bundle_id", f"row_{line_idx}"))
+            entries.append((line, line_idx, bundle_id, json_codec.dumps(bundle, indent=True)))
+            bundles[line_idx] = bundle
+        if not entries:
+            return 0
+        if len(entries) == 1:
+            line, line_idx, _, _ = entries[0]
+            return int(self._process_single_bundle(line, line_idx))
+
+        rows = [line_idx for _, line_idx, _, _ in entries]
+        try:
+            with profile_stage("prompt_render"):
+                prompt = PromptBuilder.build_packed({b_id: ctx for _, _, b_id, ctx in entries})
+            response = self._call(prompt)
+        except StreamAborted as e:
+            self._record_abort(rows, e.reason)
+            return 0
+        except Exception as e:
+            print(f"Error processing pack of {len(entries)} (rows {rows[0]}..{rows[-1]}): {e}")
+            with self.file_lock:
+                self.failed_rows.extend(rows)
+            return 0
+
+        try:
+            answers = self._parse_pack_answer(response)
+        except (json_codec.JSONDecodeError, ValueError) as e:
+            print(f"Unreadable answer for pack of {len(entries)} (rows {rows[0]}..{rows[-1]}): {e}")
+            with self.file_lock:
+                self.failed_rows.extend(rows)
+            return 0
+
+        answered = [line_idx for _, line_idx, bundle_id, _ in entries if answers.get(bundle_id)]
+        records, missing = [], []
+        for line, line_idx, bundle_id, _ in entries:
+            advisory = answers.get(bundle_id)
+            if advisory:
+                output = self._pack_output(response, line_idx, bundle_id, advisory, answered)
+                records.append(json_codec.make_output_record(line_idx, output))
+            else:
+                missing.append((line, line_idx))
+        self._write_records(records)
+
+        if self.dedup is not None:
+            for record in records:
+                self.dedup.add(record["id"], record_text(record["output"]), bundles.get(record["id"]))
+
+        if not missing:
+            return len(records)
+        print(f"Pack answered {len(records)}/{len(entries)} bundles. Retrying {len(missing)}.")
+
+        # Split and retry whatever came back unanswered
+        half = (len(missing) + 1) // 2
+        written = len(records)
+        for part in (missing[:half], missing[half:]):
+            if part:
+                written += self._process_pack(part)
+        return written
+
+    @staticmethod
+    def _pack_output(response: Dict[str, Any], row: int, bundle_id: str, advisory: str,
+                     rows: List[int]) -> Dict[str, Any]:
+        """
+        One bundle's share of a packed response, in the same Gemini response
+        shape single and batch records store. The answer part is that bundle's
+        {"bundle_id", "advisory"} entry. Thinking and token usage cover the
+        whole pack, so only the record of its first row (pack[0]) keeps them.
+        """
+        first = row == rows[0]
+        candidate = dict(((response.get("candidates") or [{}])[0]) or {})
+        thinking, _ = split_response_text(response)
+        parts = []
+        if thinking and first:
+            parts.append({"text": thinking, "thought": True})
+        parts.append({"text": json_codec.dumps({"bundle_id": bundle_id, "advisory": advisory})})
+        candidate["content"] = {**(candidate.get("content") or {}), "parts": parts}
+
+        output = {key: value for key, value in response.items() if key not in ("candidates", "usage_metadata")}
+        if first and "usage_metadata" in response:
+            output["usage_metadata"] = response["usage_metadata"]
+        output["candidates"] = [candidate]
+        output["pack"] = rows
+        return output
+
+    @staticmethod
+    def _parse_pack_answer(response: Dict[str, Any]) -> Dict[str, str]:
+        """Maps bundle_id -> advisory from a packed JSON-array answer."""
+        _, answer = split_response_text(response)
+        answer = answer.strip()
+        # Tolerate a ```json fenced answer
+        if answer.startswith("```"):
+            answer = answer.split("\n", 1)[-1].rsplit("```", 1)[0]
+
+        parsed = json_codec.loads(answer)
+        if not isinstance(parsed, list):
+            raise ValueError("Packed answer is not a JSON array")
+
+        return {
+            str(entry["bundle_id"]): entry["advisory"]
+            for entry in parsed
+            if isinstance(entry, dict) and entry.get("bundle_id") is not None and entry.get("advisory")
+        }
+
+    def _call(self, prompt: str) -> Dict[str, Any]:
+        """Rate-limited provider call, through the key pool when enabled."""
+        with profile_stage("request"):
+            if self.pool is not None:
+                # Per-key rate limiting happens inside the pool call
+                return self._call_pool_with_retry(prompt)
+
+            # Rate Limiting 
+            self.limiter.wait()
+
+            # API Call with Retry Logic
+            return self._call_provider_with_retry(prompt)
+
+    def _write_records(self, records: List[Dict[str, Any]]):
+        # Thread-Safe Write with FLUSH
+        # (compressed output is flushed a whole frame at a time instead)
+        if not records:
+            return
+        with profile_stage("write"), self.file_lock:
+            for record in records:
+                self.writer.write(record)
+            if not frame_store.is_compressed(self.out_file):
+                self.writer.flush(sync=True)
+
+        if self.quality_gate is not None:
+            for record in records:
+                self.quality_gate.submit(record)
+
+
+    def _generate(self, provider, prompt: str) -> Dict[str, Any]:
+        """One request; streamed and checked as it arrives when streaming is on."""
+        if self.stream:
+            return provider.generate_stream(prompt, check=StreamMonitor())
+        return provider.generate(prompt)
 
     def _call_provider_with_retry(self, prompt, retries=3):
         """
@@ -129,7 +307,10 @@ class GenerationEngine:
         for attempt in range(retries):
             try:
                 # Assuming provider.generate returns the string text
-                return self.provider.generate(prompt)
+                return self._generate(self.provider, prompt)
+            except StreamAborted:
+                # The output was off-spec, not the API: re-queued by the caller
+                raise
             except Exception as e:
                 error_msg = str(e).lower()
                 # Check for rate limit or server errors
@@ -144,52 +325,197 @@ class GenerationEngine:
                     raise e # Raise other errors immediately
         raise Exception("Max retries exceeded")
 
+    def _call_pool_with_retry(self, prompt, retries=3):
+        """
+        Sends the request through the least-loaded healthy key.
+        A 429 cools that key down and the request moves to another key.
+        """
+        for attempt in range(retries * len(self.pool)):
+            state = self.pool.acquire()
+            state.limiter.wait()
+            try:
+                response = self._generate(self.providers[state.name], prompt)
+            except StreamAborted:
+                self.pool.release(state)
+                raise
+            except Exception as e:
+                error_msg = str(e).lower()
+                if "429" in error_msg or "quota" in error_msg or "resource_exhausted" in error_msg:
+                    self.pool.release(state, rate_limited=True)
+                elif "500" in error_msg or "internal" in error_msg:
+                    self.pool.release(state, failed=True)
+                    print(f"⚠️ Server Error (500) on {state.name}. Retrying...")
+                    time.sleep(2)
+                else:
+                    self.pool.release(state, failed=True)
+                    raise e # Raise other errors immediately
+                continue
+
+            self.pool.release(state)
+            return response
+        raise Exception("Max retries exceeded")
 
-    def generate_all(self, limit: int = None):
+
+    def total_records(self) -> int:
+        """Number of bundles in the bundle file."""
+        if self.bundle_file.suffix == ".npz":
+            from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+            if self.bundle_space is None:
+                self.bundle_space = CompactBundleSpace.load(self.bundle_file)
+            return len(self.bundle_space)
+        if frame_store.is_compressed(self.bundle_file):
+            return len(frame_store.FrameReader(self.bundle_file))
+        with JsonlIndex(self.bundle_file) as index:
+            return len(index)
+
+    def _shard_range(self, shard: int, num_shards: int):
+        """
+        Record range [start, stop) for one shard of the bundle file.
+        Plain JSONL is split into balanced byte ranges via its offset index.
+        """
+        if self.bundle_file.suffix != ".npz" and not frame_store.is_compressed(self.bundle_file):
+            with JsonlIndex(self.bundle_file) as index:
+                return index.split(num_shards)[shard]
+
+        total = self.total_records()
+        bounds = [total * i // num_shards for i in range(num_shards + 1)]
+        return bounds[shard], bounds[shard + 1]
+
+    def _iter_bundle_lines(self, start: int, stop: int):
+        """Yields raw bundle lines for records [start, stop) without reading the rest."""
+        if frame_store.is_compressed(self.bundle_file):
+            yield from frame_store.iter_lines(self.bundle_file, start, stop)
+        else:
+            with JsonlIndex(self.bundle_file) as index:
+                yield from index.iter_lines(start, stop)
+
+    def generate_all(self, limit: int = None, shard: int = 0, num_shards: int = 1, rows: set = None,
+                     quality_retries: int = 1, stream_retries: int = 1, error_retries: int = 1):
         """
         Main execution loop using ThreadPool.
+        With num_shards > 1 only this process's shard of the bundle file is
+        processed, so several workers can split one file without pre-splitting.
+        `rows` restricts the run to those 1-based row numbers (e.g. top-ups).
+        With a quality gate, rows it rejects are generated again, up to
+        `quality_retries` more passes. Likewise, rows whose stream was aborted
+        as off-spec are generated again up to `stream_retries` times, and rows
+        whose request failed up to `error_retries` times.
         """
         print(f"Starting Generation Engine")
+        if self.quality_gate is not None:
+            self.quality_gate.open()
 
         # Load existing work to skip
         processed_ids = self._load_processed_ids()
         print(f"Found {len(processed_ids)} already processed records. Skipping them.")
 
-        # Read all lines 
-        with open(self.bundle_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        if self.bundle_file.suffix == ".npz":
+            from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+            self.bundle_space = CompactBundleSpace.load(self.bundle_file)
 
+        start, stop = 0, None
+        if num_shards > 1:
+            start, stop = self._shard_range(shard, num_shards)
+            print(f"Shard {shard + 1}/{num_shards}: records {start + 1}..{stop}")
         if limit:
-            lines = lines[:limit]
+            stop = start + limit if stop is None else min(stop, start + limit)
+        if rows is not None:
+            if not rows:
+                print("No rows requested.")
+                return
+            # Only read the part of the file that holds the requested rows
+            start = max(start, min(rows) - 1)
+            stop = max(rows) if stop is None else min(stop, max(rows))
 
-        # Filter out already done
         work_items = []
-        for idx, line in enumerate(lines, start=1):
-            # Quick check if we can parse ID to skip
-            try:
-                b_id = json.loads(line).get("bundle_id", f"row_{idx}")
-                if b_id not in processed_ids:
-                    work_items.append((line, idx))
-            except:
-                continue
+        if self.bundle_space is not None:
+            # Compact bundles carry no bundle_id; only row indices are queued
+            stop = len(self.bundle_space) if stop is None else min(stop, len(self.bundle_space))
+            work_items = [
+                (None, idx) for idx in range(start + 1, stop + 1)
+                if f"row_{idx}" not in processed_ids and (rows is None or idx in rows)
+            ]
+        else:
+            # Filter out already done
+            for idx, line in enumerate(self._iter_bundle_lines(start, stop), start=start + 1):
+                if rows is not None and idx not in rows:
+                    continue
+                # Quick check if we can parse ID to skip
+                try:
+                    b_id = json_codec.loads(line).get("bundle_id", f"row_{idx}")
+                    if b_id not in processed_ids and f"row_{idx}" not in processed_ids:
+                        work_items.append((line, idx))
+                except:
+                    continue
         
         if not work_items:
             print("All items already processed!")
             return
         
-        #  Execution - for parallel increase executors.
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            futures = [
-                executor.submit(self._process_single_bundle, item[0], item[1]) 
-                for item in work_items
-            ]
-            
-            # Progress Bar
-            for _ in tqdm(concurrent.futures.as_completed(futures), total=len(futures), unit="req"):
-                pass
+        self.writer = frame_store.open_jsonl_writer(self.out_file, append=True)
+        try:
+            #  Execution - for parallel increase executors.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                if self.pack_size > 1:
+                    # k bundles per request share one copy of the instructions
+                    packs = [
+                        work_items[i:i + self.pack_size]
+                        for i in range(0, len(work_items), self.pack_size)
+                    ]
+                    print(f"Packing {len(work_items)} bundles into {len(packs)} requests.")
+                    futures = {executor.submit(self._process_pack, pack): len(pack) for pack in packs}
+
+                    with tqdm(total=len(work_items), unit="rec") as progress:
+                        for future in concurrent.futures.as_completed(futures):
+                            progress.update(futures[future])
+                else:
+                    # Submit all tasks
+                    futures = [
+                        executor.submit(self._process_single_bundle, item[0], item[1]) 
+                        for item in work_items
+                    ]
+                    
+                    # Progress Bar
+                    for _ in tqdm(concurrent.futures.as_completed(futures), total=len(futures), unit="req"):
+                        pass
+        finally:
+            self.writer.close()
 
         print(f"\nGeneration complete. Data saved to {self.out_file}")
+        if self.pool is not None:
+            for key_stats in self.pool.stats():
+                print(f"  {key_stats['key']}: {key_stats['requests']} requests, "
+                      f"{key_stats['rate_limited']} rate-limited, {key_stats['failures']} failed")
+
+        if self.dedup is not None:
+            if self.dedup_skipped:
+                print(f"Skipped {len(self.dedup_skipped)} bundles in near-duplicate neighbourhoods.")
+            self.dedup.report()
+
+        # Rows to generate again: streams cut off early, records the gate rejected
+        retry_rows = set()
+        if self.aborted_rows:
+            print(f"Aborted {len(self.aborted_rows)} off-spec streams early: {self.abort_reasons}")
+            if stream_retries > 0:
+                retry_rows.update(self.aborted_rows)
+            self.aborted_rows, self.abort_reasons = [], {}
+
+        if self.failed_rows:
+            print(f"{len(self.failed_rows)} rows failed.")
+            if error_retries > 0:
+                retry_rows.update(self.failed_rows)
+            self.failed_rows = []
+
+        if self.quality_gate is not None:
+            self.quality_gate.drain()
+            rejected = self.quality_gate.pending_retry() & {idx for _, idx in work_items}
+            if rejected and quality_retries > 0:
+                print(f"Quality gate rejected {len(rejected)} records. Re-queueing them.")
+                retry_rows.update(rejected)
+
+        if retry_rows:
+            self.generate_all(rows=retry_rows, quality_retries=quality_retries - 1,
+                              stream_retries=stream_retries - 1, error_retries=error_retries - 1)
 
 
 
@@ -0,0 +1,336 @@
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+from agri_data_gen.core.prompt.prompt_builder import PromptBuilder
+from agri_data_gen.core.prompt.token_estimator import estimate_tokens
+from agri_data_gen.core.providers.generation_config import ONLINE_GENERATION_CONFIG, BATCH_GENERATION_CONFIG
+from agri_data_gen.core.storage import frame_store, json_codec
+from agri_data_gen.core.storage.line_index import JsonlIndex
+
+
+class HybridScheduler:
+    """
+    Routes a bundle set between the Batch API and the online engine.
+
+    Most rows go out as sharded batch jobs (cheaper, but slow). The scheduler
+    polls them and cancels unfinished jobs only when they are projected to
+    miss the deadline and the still-missing rows can be generated online in
+    the time left; those rows are then topped up through GenerationEngine.
+    Failed batch requests are retried online the same way. Both paths render prompts with PromptBuilder and
+    append {"id": row, "output": ...} records to the same output file.
+    """
+
+    FINISHED_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+
+    def __init__(self,
+                 bundle_file: str = "data/bundles/bundles.jsonl",
+                 out_file: str = "data/generated/data.jsonl",
+                 deadline_hours: float = 48.0,
+                 budget_usd: float = None,  # None = no spending cap
+                 num_batch_shards: int = 4,
+                 min_batch_hours: float = 1.0,
+                 batch_hours: float = 24.0,
+                 poll_interval: int = 300,
+                 rpm_limit: int = 10,
+                 max_workers: int = 1,
+                 key_pool: bool = False,
+                 pack_size: int = 1,
+                 input_price: float = 0.30,  # USD per 1M input tokens (online)
+                 output_price: float = 2.50,  # USD per 1M output tokens, incl. thinking
+                 output_tokens: int = 800,  # answer tokens per bundle; thinking is added per request
+                 batch_discount: float = 0.5,
+                 safety_margin: float = 0.25):
+        """
+        Args:
+            deadline_hours: Hours from now by which every row should exist.
+            budget_usd: Estimated spend cap across batch and online requests.
+            min_batch_hours: Below this much time left, batch is skipped entirely.
+            batch_hours: Expected turnaround of one batch job, used until a
+                job has finished and its real turnaround is known.
+            safety_margin: Extra fraction of online time reserved before the deadline.
+            batch_discount: Batch price as a fraction of the online price.
+        """
+        self.bundle_file = Path(bundle_file)
+        self.out_file = Path(out_file)
+        self.deadline = time.time() + deadline_hours * 3600
+        self.budget_usd = budget_usd
+        self.num_batch_shards = max(1, num_batch_shards)
+        self.min_batch_hours = min_batch_hours
+        self.batch_hours = batch_hours
+        self.poll_interval = poll_interval
+
+        self.rpm_limit = rpm_limit
+        self.max_workers = max_workers
+        self.key_pool = key_pool
+        self.pack_size = pack_size
+
+        self.input_price = input_price
+        self.output_price = output_price
+        self.output_tokens = output_tokens
+        self.batch_discount = batch_discount
+        self.safety_margin = safety_margin
+
+        self.spent_usd = 0.0
+        self._sample_tokens = None
+        self.jobs: List[Dict[str, Any]] = []
+        # Rows found in out_file so far and how far it has been read
+        self._done: set = set()
+        self._done_offset = 0
+
+    def _total_rows(self) -> int:
+        if self.bundle_file.suffix == ".npz":
+            from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+            return len(CompactBundleSpace.load(self.bundle_file))
+        if frame_store.is_compressed(self.bundle_file):
+            return len(frame_store.FrameReader(self.bundle_file))
+        with JsonlIndex(self.bundle_file) as index:
+            return len(index)
+
+    def _iter_sample_bundles(self, n: int):
+        if self.bundle_file.suffix == ".npz":
+            from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+            space = CompactBundleSpace.load(self.bundle_file)
+            for i in range(min(n, len(space))):
+                yield space.bundle(i)
+        else:
+            yield from frame_store.iter_records(self.bundle_file, 0, n, skip_invalid=True)
+
+    def _add_done(self, line):
+        try:
+            record = json_codec.loads(line)
+        except json_codec.JSONDecodeError:
+            return
+        if isinstance(record, dict) and isinstance(record.get("id"), int):
+            self._done.add(record["id"])
+
+    def _done_rows(self) -> set:
+        """
+        Row numbers that already have a record in the output file.
+        Only what was appended since the previous call is read: a byte
+        offset for plain JSONL, a line count for compressed output.
+        """
+        if not self.out_file.exists():
+            return self._done
+
+        compressed = frame_store.is_compressed(self.out_file)
+        size = len(frame_store.FrameReader(self.out_file)) if compressed else self.out_file.stat().st_size
+        if size < self._done_offset:
+            # File was replaced or truncated (or a .zst lost its index): start over
+            self._done, self._done_offset = set(), 0
+
+        if compressed:
+            for line in frame_store.FrameReader(self.out_file).iter_lines(self._done_offset):
+                self._done_offset += 1
+                self._add_done(line)
+            return self._done
+
+        with open(self.out_file, "rb") as f:
+            f.seek(self._done_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # unterminated last line, read it once it is complete
+                self._done_offset += len(line)
+                if line.strip():
+                    self._add_done(line)
+        return self._done
+
+    def request_cost(self, batch: bool = False, sample_size: int = 20) -> float:
+        """
+        Estimated USD cost of one row, online or via batch, from a sample of
+        rendered prompts. Thinking is costed at that path's full thinking
+        budget, shared by the rows of an online pack.
+        """
+        if self._sample_tokens is None:
+            prompts = [
+                PromptBuilder.render(bundle, bundle.get("bundle_id"))
+                for bundle in self._iter_sample_bundles(sample_size)
+            ]
+            self._sample_tokens = sum(estimate_tokens(p) for p in prompts) / max(len(prompts), 1)
+
+        if batch:
+            thinking = BATCH_GENERATION_CONFIG["thinking_budget"]
+        else:
+            thinking = ONLINE_GENERATION_CONFIG["thinking_budget"] / max(self.pack_size, 1)
+        cost = (self._sample_tokens * self.input_price + (self.output_tokens + thinking) * self.output_price) / 1e6
+        return cost * self.batch_discount if batch else cost
+
+    def online_rate(self) -> float:
+        """Online requests per minute across every usable key."""
+        keys = 1
+        if self.key_pool:
+            from agri_data_gen.core.providers.credential_pool import CredentialPool
+            keys = len(CredentialPool.from_env())
+        return self.rpm_limit * keys
+
+    def _online_minutes(self, rows: int) -> float:
+        requests = -(-rows // max(self.pack_size, 1))
+        return requests / self.online_rate() * (1 + self.safety_margin)
+
+    def _batch_turnaround(self) -> float:
+        """Seconds a batch job takes: the mean of finished jobs, else batch_hours."""
+        finished = [e["finished"] - e["submitted"] for e in self.jobs if "finished" in e]
+        if finished:
+            return sum(finished) / len(finished)
+        return self.batch_hours * 3600
+
+    def _batch_eta(self, running: List[Dict[str, Any]]) -> float:
+        """
+        Projected time the last running job finishes. A job past its
+        expected turnaround is assumed to run as late again.
+        """
+        turnaround = self._batch_turnaround()
+        now = time.time()
+        eta = now + self.poll_interval
+        for entry in running:
+            due = entry["submitted"] + turnaround
+            eta = max(eta, due if due > now else now + (now - due))
+        return eta
+
+    def _affordable(self, unit_cost: float) -> int:
+        if self.budget_usd is None:
+            return -1
+        return max(int((self.budget_usd - self.spent_usd) / unit_cost), 0)
+
+    def plan(self) -> Dict[str, Any]:
+        """Splits the pending rows into a batch part and an online part."""
+        total = self._total_rows()
+        pending = sorted(set(range(1, total + 1)) - self._done_rows())
+        online_cost = self.request_cost()
+        batch_cost = self.request_cost(batch=True)
+        hours_left = (self.deadline - time.time()) / 3600
+        online_hours = self._online_minutes(len(pending)) / 60
+
+        # Batch when it is projected to finish in time, or when online could not either
+        use_batch = hours_left >= self.min_batch_hours and (
+            self.batch_hours <= hours_left or online_hours > hours_left
+        )
+        unit_cost = batch_cost if use_batch else online_cost
+        affordable = self._affordable(unit_cost)
+        routed = pending if affordable < 0 else pending[:affordable]
+
+        plan = {
+            "total": total,
+            "pending": len(pending),
+            "batch_rows": routed if use_batch else [],
+            "online_rows": [] if use_batch else routed,
+            "unaffordable": len(pending) - len(routed),
+            "online_cost": online_cost,
+            "batch_cost": batch_cost,
+            "hours_left": hours_left,
+            "batch_hours": self.batch_hours,
+            "online_hours": online_hours,
+        }
+        print(f"Plan: {len(pending)} pending rows, {len(plan['batch_rows'])} via batch, "
+              f"{len(plan['online_rows'])} online, {plan['unaffordable']} over budget.")
+        print(f"  Est. cost/request: ${online_cost:.5f} online, ${batch_cost:.5f} batch. "
+              f"Est. time: {self.batch_hours:.1f}h batch, {online_hours:.1f}h online. "
+              f"{hours_left:.1f}h to deadline.")
+        return plan
+
+    def _submit_batches(self, rows: List[int], unit_cost: float):
+        from agri_data_gen.gemini_batch_processing.create_job import TextBatchJob
+
+        shard_size = -(-len(rows) // self.num_batch_shards)
+        for shard in range(self.num_batch_shards):
+            shard_rows = rows[shard * shard_size:(shard + 1) * shard_size]
+            if not shard_rows:
+                continue
+
+            job = TextBatchJob(job_name=f"agri-advisory-shard{shard}")
+            count = job.create_jsonl(
+                str(self.bundle_file),
+                start=shard_rows[0] - 1,
+                stop=shard_rows[-1],
+                rows=set(shard_rows)
+            )
+            job.submit_job()
+            self.spent_usd += count * unit_cost
+            self.jobs.append({"job": job, "rows": set(shard_rows), "state": "JOB_STATE_PENDING",
+                              "submitted": time.time()})
+
+    def _poll_batches(self):
+        for entry in self.jobs:
+            if entry["state"] in self.FINISHED_STATES:
+                continue
+            entry["state"] = entry["job"].get_state()
+            if entry["state"] in self.FINISHED_STATES:
+                entry["finished"] = time.time()
+            if entry["state"] == "JOB_STATE_SUCCEEDED":
+                entry["job"].download_and_parse_results(out_file=str(self.out_file))
+
+    def _wait_for_batches(self, rows: List[int]):
+        """
+        Polls batch jobs until they finish. Running jobs are cancelled only
+        when they are projected to miss the deadline and online generation
+        of the missing rows can still finish before it; otherwise batch is
+        the better bet and polling goes on.
+        """
+        while True:
+            self._poll_batches()
+            running = [e for e in self.jobs if e["state"] not in self.FINISHED_STATES]
+            if not running:
+                return
+
+            missing = len(set(rows) - self._done_rows())
+            minutes_left = (self.deadline - time.time()) / 60
+            eta = self._batch_eta(running)
+            online_fits = self._online_minutes(missing) < minutes_left
+            if online_fits and eta > self.deadline:
+                print(f"Batch projected to finish {(eta - self.deadline) / 3600:.1f}h after the deadline: "
+                      f"cancelling {len(running)} batch jobs, {missing} rows go online.")
+                for entry in running:
+                    entry["job"].cancel()
+                    entry["state"] = "JOB_STATE_CANCELLED"
+                return
+
+            print(f"{len(running)} batch jobs running, {missing} rows missing, "
+                  f"{minutes_left / 60:.1f}h left, batch due in {(eta - time.time()) / 3600:.1f}h. "
+                  f"Next check in {self.poll_interval}s.")
+            time.sleep(self.poll_interval)
+
+    def _top_up(self, rows: List[int], unit_cost: float):
+        affordable = self._affordable(unit_cost)
+        if affordable >= 0 and affordable < len(rows):
+            print(f"Budget covers {affordable} of {len(rows)} online rows.")
+            rows = rows[:affordable]
+        if not rows:
+            return
+
+        from agri_data_gen.core.generators.generator import GenerationEngine
+
+        engine = GenerationEngine(
+            bundle_file=str(self.bundle_file),
+            out_file=str(self.out_file),
+            rpm_limit=self.rpm_limit,
+            max_workers=self.max_workers,
+            key_pool=self.key_pool,
+            pack_size=self.pack_size
+        )
+        self.spent_usd += len(rows) * unit_cost
+        engine.generate_all(rows=set(rows))
+
+    def run(self) -> Dict[str, Any]:
+        plan = self.plan()
+        batch_rows = plan["batch_rows"]
+
+        if batch_rows:
+            self._submit_batches(batch_rows, plan["batch_cost"])
+            self._wait_for_batches(batch_rows)
+
+        # Rows batch did not deliver (failed, cancelled) plus the online share
+        done = self._done_rows()
+        missing = sorted((set(batch_rows) | set(plan["online_rows"])) - done)
+        if missing:
+            print(f"Topping up {len(missing)} rows online.")
+            self._top_up(missing, plan["online_cost"])
+
+        done = self._done_rows()
+        summary = {
+            "records": len(done),
+            "missing": plan["total"] - len(done),
+            "spent_usd": round(self.spent_usd, 4),
+        }
+        print(f"Hybrid run finished: {summary['records']} records, {summary['missing']} missing, "
+              f"~${summary['spent_usd']:.2f} spent. Data saved to {self.out_file}")
+        return summary
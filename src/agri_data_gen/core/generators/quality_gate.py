@@ -0,0 +1,334 @@
+import os
+import re
+import threading
+import multiprocessing
+import concurrent.futures
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from agri_data_gen.core.storage import json_codec, frame_store
+from agri_data_gen.core.providers.response_parser import split_response_text, finish_reason
+
+DEVANAGARI = re.compile(r"[\u0900-\u097F]")
+# Letters of any other script (Latin, etc.); digits and punctuation do not count
+OTHER_LETTERS = re.compile(r"[^\W\d_\u0900-\u097F]")
+
+# Finish reasons of a complete answer (None: packed records carry no reason)
+COMPLETE_REASONS = (None, "STOP")
+
+
+def advisory_text(decoded: Any) -> str:
+    """The advisory inside a decoded JSON answer: a string, an "advisory" field, or all strings joined."""
+    if isinstance(decoded, str):
+        return decoded
+    if isinstance(decoded, dict):
+        if isinstance(decoded.get("advisory"), str):
+            return decoded["advisory"]
+        return "\n".join(advisory_text(value) for value in decoded.values())
+    if isinstance(decoded, list):
+        return "\n".join(advisory_text(value) for value in decoded)
+    return ""
+
+
+def check_record(record: Dict[str, Any], min_chars: int = 200, max_chars: int = 12000,
+                 min_devanagari: float = 0.6) -> List[str]:
+    """
+    Returns the reasons a generated record needs a retry (empty when it passes):
+    empty_output, empty_candidates, finish_<reason>, invalid_json, no_text,
+    too_short, too_long, low_devanagari.
+    """
+    output = record.get("output")
+    if not isinstance(output, dict) or not output:
+        return ["empty_output"]
+
+    if not output.get("candidates"):
+        return ["empty_candidates"]
+
+    reasons = []
+    reason = finish_reason(output)
+    if reason not in COMPLETE_REASONS:
+        reasons.append(f"finish_{str(reason).lower()}")
+
+    _, answer = split_response_text(output)
+    answer = answer.strip()
+    # Tolerate a ```json fenced answer
+    if answer.startswith("```"):
+        answer = answer.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        text = advisory_text(json_codec.loads(answer))
+    except (json_codec.JSONDecodeError, ValueError):
+        reasons.append("invalid_json")
+        text = answer
+
+    text = text.strip()
+    if not text:
+        return reasons + ["no_text"]
+    if len(text) < min_chars:
+        reasons.append("too_short")
+    elif len(text) > max_chars:
+        reasons.append("too_long")
+
+    devanagari = len(DEVANAGARI.findall(text))
+    letters = devanagari + len(OTHER_LETTERS.findall(text))
+    if letters and devanagari / letters < min_devanagari:
+        reasons.append("low_devanagari")
+
+    return reasons
+
+
+class StreamMonitor:
+    """
+    Cheap incremental checks on a streaming answer, for
+    GeminiProvider.generate_stream(check=...). Call it with the answer text
+    so far; it scans only the new characters and returns a reason once the
+    output is clearly unusable:
+    invalid_json (not a JSON prefix), low_devanagari (after
+    `min_script_letters` letters) or too_long.
+    A fresh monitor is needed per request.
+    """
+
+    def __init__(self, max_chars: int = 12000, min_devanagari: float = 0.6,
+                 min_script_letters: int = 200):
+        self.max_chars = max_chars
+        self.min_devanagari = min_devanagari
+        self.min_script_letters = min_script_letters
+
+        self.seen = 0
+        self.devanagari = 0
+        self.letters = 0
+        # JSON prefix scanner state
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+        self.fence_header = False
+
+    def _json_prefix_ok(self, text: str) -> bool:
+        for char in text:
+            if self.fence_header:
+                # Skip an opening ```json line
+                self.fence_header = char != "\n"
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    self.closed = self.depth == 0
+                continue
+            if char.isspace():
+                continue
+            if not self.started and char == "`":
+                self.fence_header = True
+                continue
+            if self.closed:
+                # Nothing but a closing fence may follow the top-level value
+                if char != "`":
+                    return False
+                continue
+            if not self.started:
+                if char not in '{["':
+                    return False
+                self.started = True
+
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth < 0:
+                    return False
+                self.closed = self.depth == 0
+        return True
+
+    def __call__(self, answer: str) -> Optional[str]:
+        new = answer[self.seen:]
+        self.seen = len(answer)
+
+        if len(answer) > self.max_chars:
+            return "too_long"
+        if not self._json_prefix_ok(new):
+            return "invalid_json"
+
+        devanagari = len(DEVANAGARI.findall(new))
+        self.devanagari += devanagari
+        self.letters += devanagari + len(OTHER_LETTERS.findall(new))
+        if self.letters >= self.min_script_letters and self.devanagari / self.letters < self.min_devanagari:
+            return "low_devanagari"
+        return None
+
+
+def _check_lines(lines: List[str], limits: Dict[str, Any]) -> List[Tuple[Any, List[str], Optional[str]]]:
+    """
+    Process-pool task: (record id, reasons, retry line) per input line.
+    Only failing records are re-encoded (annotated with their reasons).
+    """
+    results = []
+    for line in lines:
+        try:
+            record = json_codec.loads(line)
+        except json_codec.JSONDecodeError:
+            reasons = ["unreadable_record"]
+            results.append((None, reasons, json_codec.dumps({"quality_reasons": reasons, "raw": line})))
+            continue
+
+        reasons = check_record(record, **limits)
+        retry_line = json_codec.dumps({**record, "quality_reasons": reasons}) if reasons else None
+        results.append((record.get("id"), reasons, retry_line))
+    return results
+
+
+class QualityGate:
+    """
+    Streaming post-generation checks run in a process pool.
+
+    Records are submitted as they are written and checked in batches of
+    `batch_size` lines. At most `max_in_flight` batches are outstanding;
+    submit() blocks on the oldest one beyond that, so memory stays bounded
+    while throughput scales with the number of worker processes.
+    Passing records go to `accepted_file`, failing ones (with their
+    "quality_reasons") to `retry_file`, in submission order.
+    """
+
+    def __init__(self,
+                 accepted_file: str = "data/generated/accepted.jsonl",
+                 retry_file: str = "data/generated/needs_retry.jsonl",
+                 workers: int = None,
+                 batch_size: int = 32,
+                 max_in_flight: int = None,
+                 min_chars: int = 200,
+                 max_chars: int = 12000,
+                 min_devanagari: float = 0.6):
+        self.accepted_file = Path(accepted_file)
+        self.retry_file = Path(retry_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.limits = {"min_chars": min_chars, "max_chars": max_chars, "min_devanagari": min_devanagari}
+
+        self.lock = threading.Lock()
+        self.buffer: List[str] = []
+        # (lines, future) per outstanding batch, oldest first
+        self.in_flight = deque()
+        self.executor = None
+        self.accepted_writer = None
+        self.retry_writer = None
+
+        self.stats = Counter()
+        self.accepted_ids = set()
+        self.retry_ids = set()
+
+    def open(self) -> "QualityGate":
+        """Starts the pool and opens both outputs for appending. Safe to call twice."""
+        with self.lock:
+            if self.executor is not None:
+                return self
+
+            # Earlier runs' verdicts, so pending_retry() survives a restart
+            for path, ids in ((self.accepted_file, self.accepted_ids), (self.retry_file, self.retry_ids)):
+                if path.exists():
+                    ids.update(r.get("id") for r in frame_store.iter_records(path, skip_invalid=True))
+
+            # Records arrive from the engine's threads; forking a threaded process is unsafe
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self.accepted_writer = frame_store.open_jsonl_writer(self.accepted_file, append=True)
+            self.retry_writer = frame_store.open_jsonl_writer(self.retry_file, append=True)
+        return self
+
+    def submit(self, record: Dict[str, Any]):
+        self.submit_line(json_codec.dumps(record))
+
+    def submit_line(self, line: str):
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.batch_size:
+                self._dispatch()
+
+    def _dispatch(self):
+        """Sends the buffered lines to the pool (lock held)."""
+        if not self.buffer:
+            return
+        # Back-pressure: never more than max_in_flight batches outstanding
+        while len(self.in_flight) >= self.max_in_flight:
+            self._collect(*self.in_flight.popleft())
+
+        self.in_flight.append((self.buffer, self.executor.submit(_check_lines, self.buffer, self.limits)))
+        self.buffer = []
+
+        # Write out whatever already finished, so verdicts land while the run goes on
+        while self.in_flight and self.in_flight[0][1].done():
+            self._collect(*self.in_flight.popleft())
+
+    def _collect(self, lines: List[str], future: concurrent.futures.Future):
+        """Writes one finished batch to the accepted / retry outputs (lock held)."""
+        for line, (record_id, reasons, retry_line) in zip(lines, future.result()):
+            if not reasons:
+                self.accepted_writer.write_line(line)
+                self.accepted_ids.add(record_id)
+                self.stats["accepted"] += 1
+                continue
+
+            self.retry_writer.write_line(retry_line)
+            self.retry_ids.add(record_id)
+            self.stats["needs_retry"] += 1
+            self.stats.update(reasons)
+
+    def drain(self):
+        """Blocks until every submitted record has been checked and written."""
+        with self.lock:
+            if self.executor is None:
+                return
+            self._dispatch()
+            while self.in_flight:
+                self._collect(*self.in_flight.popleft())
+            self.accepted_writer.flush()
+            self.retry_writer.flush()
+
+    def pending_retry(self) -> set:
+        """Record ids that failed and have not been accepted since."""
+        with self.lock:
+            return {i for i in self.retry_ids - self.accepted_ids if i is not None}
+
+    def close(self):
+        self.drain()
+        with self.lock:
+            if self.executor is None:
+                return
+            self.executor.shutdown()
+            self.accepted_writer.close()
+            self.retry_writer.close()
+            self.executor = self.accepted_writer = self.retry_writer = None
+
+    def run_file(self, in_file: str) -> Dict[str, int]:
+        """Checks an existing output file (e.g. parsed batch results) end to end."""
+        self.open()
+        try:
+            for line in frame_store.iter_lines(in_file):
+                if line.strip():
+                    self.submit_line(line.rstrip("\n"))
+        finally:
+            self.close()
+        return self.summary()
+
+    def summary(self) -> Dict[str, int]:
+        """Prints and returns accepted / needs-retry counts and failures per reason."""
+        summary = dict(self.stats)
+        print(f"Quality gate: {summary.get('accepted', 0)} accepted, "
+              f"{summary.get('needs_retry', 0)} need a retry ({self.accepted_file}, {self.retry_file})")
+        for reason, count in self.stats.most_common():
+            if reason not in ("accepted", "needs_retry"):
+                print(f"  {reason:<20}{count:>8}")
+        return summary
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
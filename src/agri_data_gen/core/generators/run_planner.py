@@ -0,0 +1,364 @@
+import heapq
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from agri_data_gen.core.prompt.prompt_builder import PromptBuilder
+from agri_data_gen.core.providers.generation_config import (
+    ONLINE_GENERATION_CONFIG, BATCH_GENERATION_CONFIG, batch_generation_config
+)
+from agri_data_gen.core.prompt.token_estimator import char_counts, ASCII_CHARS_PER_TOKEN, NON_ASCII_CHARS_PER_TOKEN
+from agri_data_gen.core.storage import json_codec, frame_store
+from agri_data_gen.core.generators.dedup import NON_AXIS_KEYS
+
+# Largest input the Batch API accepts in one request file
+BATCH_FILE_LIMIT_BYTES = 2 * 1024 ** 3
+
+
+def _tokens(ascii_counts: np.ndarray, non_ascii: np.ndarray) -> np.ndarray:
+    """Vectorized token_estimator.tokens_from_counts."""
+    return np.ceil(ascii_counts / ASCII_CHARS_PER_TOKEN + non_ascii / NON_ASCII_CHARS_PER_TOKEN).astype(np.int64)
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    if seconds < 48 * 3600:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} days"
+
+
+class RunPlanner:
+    """
+    Offline dry run of a generation job: token counts, cost and wall-clock
+    time for the online path (GenerationEngine) and the Batch API path,
+    with a cost breakdown per axis value. Nothing is sent anywhere.
+
+    Prompts are counted piece by piece instead of being rendered whole.
+    The token estimate is linear in (ASCII, non-ASCII) characters, and a
+    rendered prompt is the fixed PromptBuilder template plus the bundle's
+    indented JSON, which is itself one fragment per key. Each axis entry's
+    fragment is rendered and counted once (per-bundle content, such as the
+    weather observation, once per bundle), so a compact bundle space of
+    millions of rows is costed with a few array operations, and the counts
+    match rendering every prompt exactly.
+    """
+
+    def __init__(self,
+                 bundle_file: str = "data/bundles/bundles.jsonl",
+                 rpm_limit: int = 10,
+                 max_workers: int = 1,
+                 keys: int = 1,
+                 pack_size: int = 1,
+                 limit: int = None,
+                 sample: int = None,  # JSONL only: count this many evenly spaced bundles
+                 input_price: float = 0.30,  # USD per 1M input tokens (online)
+                 output_price: float = 2.50,  # USD per 1M output tokens, incl. thinking
+                 output_tokens: int = 800,  # answer tokens per bundle; thinking is added per request
+                 batch_discount: float = 0.5,
+                 batch_hours: float = 24.0,  # Batch API turnaround target
+                 request_overhead: float = 2.0,  # seconds per request before decoding
+                 output_tokens_per_second: float = 150.0):
+        self.bundle_file = Path(bundle_file)
+        self.rpm_limit = rpm_limit
+        self.max_workers = max(1, max_workers)
+        self.keys = max(1, keys)
+        self.pack_size = max(1, pack_size)
+        self.limit = limit
+        self.sample = sample
+
+        self.input_price = input_price
+        self.output_price = output_price
+        self.output_tokens = output_tokens
+        self.batch_discount = batch_discount
+        self.batch_hours = batch_hours
+        self.request_overhead = request_overhead
+        self.output_tokens_per_second = output_tokens_per_second
+        # Thinking is costed at each path's full budget (an upper bound), once per request
+        self.online_thinking = ONLINE_GENERATION_CONFIG["thinking_budget"]
+        self.batch_thinking = BATCH_GENERATION_CONFIG["thinking_budget"]
+
+        # Prompt pieces, each rendered and counted once
+        self.prompt_base = char_counts(PromptBuilder.build("", None))
+        self.pack_bases: Dict[int, Tuple[int, int]] = {}
+        self.fragments: Dict[tuple, Tuple[str, Tuple[int, int]]] = {}
+
+    # PROMPT PIECES
+
+    def _pack_base(self, n: int) -> Tuple[int, int]:
+        """Counts of a packed prompt for n bundles, minus their contexts and bundle ids."""
+        if n not in self.pack_bases:
+            ids = [str(i) for i in range(n)]
+            a, na = char_counts(PromptBuilder.build_packed({i: "" for i in ids}))
+            self.pack_bases[n] = (a - sum(len(i) for i in ids), na)
+        return self.pack_bases[n]
+
+    @staticmethod
+    def _render_fragment(key: str, value: Any) -> Tuple[int, int]:
+        # '{\n  "key": value\n}' -> the '  "key": value' line(s) it contributes to a bundle
+        return char_counts(json_codec.dumps({key: value}, indent=True)[2:-2])
+
+    def _fragment(self, key: str, value: Any) -> Tuple[int, int]:
+        """
+        Counts of one key of a bundle's indented JSON. Axis entries are cached
+        by id; an entry whose content differs between bundles under the same
+        id (weather carries a per-bundle observation) is rendered each time.
+        """
+        entry_id = value.get("id") if isinstance(value, dict) else None
+        if key in NON_AXIS_KEYS or not isinstance(entry_id, (str, int)):
+            return self._render_fragment(key, value)
+        # repr() is a cheap exact fingerprint: equal reprs encode to equal JSON
+        fingerprint = repr(value)
+        cached = self.fragments.get((key, entry_id))
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        counts = self._render_fragment(key, value)
+        if cached is None:
+            self.fragments[(key, entry_id)] = (fingerprint, counts)
+        return counts
+
+    def context_counts(self, bundle: Dict[str, Any]) -> Tuple[int, int]:
+        """(ASCII, non-ASCII) counts of json_codec.dumps(bundle, indent=True)."""
+        if not bundle:
+            return 2, 0
+        a = 4 + 2 * (len(bundle) - 1)  # braces and ",\n" separators
+        na = 0
+        for key, value in bundle.items():
+            fa, fna = self._fragment(key, value)
+            a += fa
+            na += fna
+        return a, na
+
+    # BUNDLE SOURCES
+    # Both return per-row arrays (context ASCII, context non-ASCII, bundle id
+    # ASCII, bundle id non-ASCII), {axis: (labels, codes)}, and the row count
+    # they stand for (more than len(arrays) when sampling).
+
+    def _scan_space(self):
+        from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+
+        space = CompactBundleSpace.load(self.bundle_file)
+        rows = len(space) if self.limit is None else min(self.limit, len(space))
+        matrix = space.matrix[:rows]
+        index = np.arange(1, rows + 1)
+
+        # {"id": n, <axes>}: "  \"id\": " plus the digits of n
+        digits = np.floor(np.log10(np.maximum(index, 1))).astype(np.int64) + 1
+        ctx_a = 4 + 2 * len(space.axes) + 8 + digits
+        ctx_na = np.zeros(rows, dtype=np.int64)
+
+        axes = {}
+        for column, axis in enumerate(space.axes):
+            entries = space.entries[axis]
+            counts = np.array([self._render_fragment(axis, e) for e in entries], dtype=np.int64).reshape(-1, 2)
+            codes = matrix[:, column].astype(np.int64)
+            ctx_a = ctx_a + counts[codes, 0]
+            ctx_na = ctx_na + counts[codes, 1]
+            axes[axis] = ([str(e.get("id", i)) for i, e in enumerate(entries)], codes)
+
+        # Compact bundles carry no bundle_id, so packs label them row_<n>
+        bid_a = 4 + digits
+        return (ctx_a, ctx_na, bid_a, np.zeros(rows, dtype=np.int64)), axes, rows
+
+    def _iter_jsonl(self):
+        """(row index, bundle) for every bundle to count, plus the row count they stand for."""
+        if not self.sample:
+            def rows():
+                for index, line in enumerate(frame_store.iter_lines(self.bundle_file, 0, self.limit)):
+                    if line.strip():
+                        yield index, json_codec.loads(line)
+            return rows(), None
+
+        if frame_store.is_compressed(self.bundle_file):
+            total = len(frame_store.FrameReader(self.bundle_file))
+        else:
+            from agri_data_gen.core.storage.line_index import JsonlIndex
+            with JsonlIndex(self.bundle_file) as index:
+                total = len(index)
+        total = total if self.limit is None else min(self.limit, total)
+        picks = set(np.linspace(0, total - 1, min(self.sample, total), dtype=np.int64).tolist()) if total else set()
+
+        def sampled():
+            for index, line in enumerate(frame_store.iter_lines(self.bundle_file, 0, total)):
+                if index in picks and line.strip():
+                    yield index, json_codec.loads(line)
+        return sampled(), total
+
+    def _scan_jsonl(self):
+        bundles, total = self._iter_jsonl()
+        ctx_a, ctx_na, bid_a, bid_na = [], [], [], []
+        labels: Dict[str, Dict[str, int]] = {}
+        codes: Dict[str, List[int]] = {}
+
+        for row, (index, bundle) in enumerate(bundles):
+            a, na = self.context_counts(bundle)
+            ctx_a.append(a)
+            ctx_na.append(na)
+            # Same bundle id the engine puts in packed prompts
+            a, na = char_counts(str(bundle.get("bundle_id", f"row_{index + 1}")))
+            bid_a.append(a)
+            bid_na.append(na)
+
+            for key, value in bundle.items():
+                if key in NON_AXIS_KEYS or not isinstance(value, dict):
+                    continue
+                axis_labels = labels.setdefault(key, {})
+                axis_codes = codes.setdefault(key, [])
+                # Bundles missing an axis earlier on get -1 there
+                axis_codes.extend([-1] * (row - len(axis_codes)))
+                axis_codes.append(axis_labels.setdefault(str(value.get("id")), len(axis_labels)))
+
+        rows = len(ctx_a)
+        axes = {}
+        for key, axis_labels in labels.items():
+            axis_codes = codes[key] + [-1] * (rows - len(codes[key]))
+            axes[key] = (list(axis_labels), np.array(axis_codes, dtype=np.int64))
+
+        arrays = tuple(np.array(values, dtype=np.int64) for values in (ctx_a, ctx_na, bid_a, bid_na))
+        return arrays, axes, rows if total is None else total
+
+    # SIMULATION
+
+    def request_seconds(self, bundles: int) -> float:
+        """Rough latency of one request answering `bundles` bundles."""
+        return self.request_overhead + (bundles * self.output_tokens + self.online_thinking) / self.output_tokens_per_second
+
+    def simulate_online(self, latencies: np.ndarray) -> float:
+        """
+        Wall-clock seconds for the engine to send every request: max_workers
+        threads, each waiting on the rate limiter (one call per 60 / rpm
+        seconds, per key) before its request, which then takes its latency.
+        """
+        spacing = 60.0 / (self.rpm_limit * self.keys)
+        free = [0.0] * self.max_workers
+        next_slot = 0.0
+        finish = 0.0
+        for latency in latencies.tolist():
+            start = max(heapq.heappop(free), next_slot)
+            next_slot = start + spacing
+            done = start + latency
+            finish = max(finish, done)
+            heapq.heappush(free, done)
+        return finish
+
+    # PLAN
+
+    def plan(self, top: int = 5) -> Dict[str, Any]:
+        """Costs the run, prints a report and returns it as a dict."""
+        started = time.perf_counter()
+        if self.bundle_file.suffix == ".npz":
+            (ctx_a, ctx_na, bid_a, bid_na), axes, rows = self._scan_space()
+        else:
+            (ctx_a, ctx_na, bid_a, bid_na), axes, rows = self._scan_jsonl()
+        counted = len(ctx_a)
+        scale = rows / counted if counted else 0.0
+
+        # Single prompts: what the batch path (and online with pack_size 1) sends
+        single = _tokens(self.prompt_base[0] + ctx_a, self.prompt_base[1] + ctx_na)
+
+        # Online requests: consecutive bundles share a packed prompt
+        if self.pack_size > 1 and counted:
+            starts = np.arange(0, counted, self.pack_size)
+            sizes = np.diff(np.append(starts, counted))
+            piece_a = np.add.reduceat(ctx_a + bid_a, starts)
+            piece_na = np.add.reduceat(ctx_na + bid_na, starts)
+            bases = np.array([self._pack_base(int(n)) for n in sizes], dtype=np.int64).reshape(-1, 2)
+            # A pack of one goes down the single-bundle path
+            request_input = np.where(sizes > 1, _tokens(bases[:, 0] + piece_a, bases[:, 1] + piece_na), single[starts])
+        else:
+            sizes = np.ones(counted, dtype=np.int64)
+            request_input = single
+
+        requests = -(-rows // self.pack_size)
+        online_input = float(request_input.sum()) * scale
+        batch_input = float(single.sum()) * scale
+        online_output = rows * self.output_tokens + requests * self.online_thinking
+        batch_output = rows * (self.output_tokens + self.batch_thinking)
+
+        online_cost = (online_input * self.input_price + online_output * self.output_price) / 1e6
+        batch_cost = (batch_input * self.input_price + batch_output * self.output_price) / 1e6 * self.batch_discount
+
+        latencies = np.array([self.request_seconds(int(n)) for n in sizes], dtype=np.float64)
+        if len(latencies) and len(latencies) != requests:
+            # Sampled: the counted requests stand in for the whole run
+            latencies = np.resize(latencies, requests)
+        online_seconds = self.simulate_online(latencies)
+        # Workers keep up with the limiter while one request lasts less than max_workers slots
+        spacing = 60.0 / (self.rpm_limit * self.keys)
+        mean_latency = float(latencies.mean()) if len(latencies) else 0.0
+        bound = "rate limit" if spacing * self.max_workers >= mean_latency else "workers"
+
+        # Batch request file: prompt bytes (Devanagari is 3 bytes in UTF-8) plus the request wrapper
+        wrapper = len(json_codec.dumps_line({
+            "custom_id": "", "request": {"contents": [{"parts": [{"text": ""}]}],
+                                         "generationConfig": batch_generation_config()}}).encode("utf-8"))
+        batch_bytes = float((self.prompt_base[0] + ctx_a + 3 * (self.prompt_base[1] + ctx_na) + wrapper).sum()) * scale
+
+        # Per axis value: bundles, single-prompt input tokens and online cost of those bundles
+        bundle_output = self.output_tokens + self.online_thinking / self.pack_size
+        breakdown = {}
+        for axis, (labels, codes) in axes.items():
+            present = codes >= 0
+            bundles = np.bincount(codes[present], minlength=len(labels)) * scale
+            tokens = np.bincount(codes[present], weights=single[present], minlength=len(labels)) * scale
+            cost = (tokens * self.input_price + bundles * bundle_output * self.output_price) / 1e6
+            breakdown[axis] = sorted(
+                ({"value": label, "bundles": int(round(b)), "input_tokens": int(round(t)), "online_cost": float(c)}
+                 for label, b, t, c in zip(labels, bundles, tokens, cost)),
+                key=lambda item: item["online_cost"], reverse=True
+            )
+
+        plan = {
+            "bundle_file": str(self.bundle_file),
+            "rows": rows,
+            "counted": counted,
+            "online": {
+                "requests": requests,
+                "pack_size": self.pack_size,
+                "input_tokens": int(round(online_input)),
+                "output_tokens": online_output,
+                "thinking_budget": self.online_thinking,
+                "cost_usd": online_cost,
+                "seconds": online_seconds,
+                "bound_by": bound,
+            },
+            "batch": {
+                "requests": rows,
+                "input_tokens": int(round(batch_input)),
+                "output_tokens": batch_output,
+                "thinking_budget": self.batch_thinking,
+                "cost_usd": batch_cost,
+                "request_file_bytes": int(batch_bytes),
+                "request_files": max(1, -(-int(batch_bytes) // BATCH_FILE_LIMIT_BYTES)),
+                "turnaround_hours": self.batch_hours,
+            },
+            "axes": breakdown,
+            "plan_seconds": time.perf_counter() - started,
+        }
+        self._print(plan, top)
+        return plan
+
+    def _print(self, plan: Dict[str, Any], top: int):
+        online, batch = plan["online"], plan["batch"]
+        sampled = f" (counted {plan['counted']}, scaled)" if plan["counted"] != plan["rows"] else ""
+        print(f"Plan for {plan['rows']} bundles in {plan['bundle_file']}{sampled}, "
+              f"computed in {plan['plan_seconds']:.2f}s")
+        print(f"  Online: {online['requests']} requests (pack size {online['pack_size']}), "
+              f"{online['input_tokens']:,} input + {online['output_tokens']:,} output tokens "
+              f"(thinking budget {online['thinking_budget']}/request), "
+              f"${online['cost_usd']:.2f}, ~{_duration(online['seconds'])} "
+              f"at {self.rpm_limit} rpm x {self.keys} key(s), {self.max_workers} worker(s) "
+              f"(bound by {online['bound_by']})")
+        print(f"  Batch:  {batch['requests']} requests, "
+              f"{batch['input_tokens']:,} input + {batch['output_tokens']:,} output tokens "
+              f"(thinking budget {batch['thinking_budget']}/request), "
+              f"${batch['cost_usd']:.2f}, up to {batch['turnaround_hours']:.0f} h per job, "
+              f"request file ~{batch['request_file_bytes'] / 1024 ** 2:.1f} MB "
+              f"({batch['request_files']} file(s) under the 2 GB limit)")
+        for axis, values in plan["axes"].items():
+            print(f"  [{axis}] {len(values)} values, most expensive online:")
+            for item in values[:top]:
+                print(f"    {item['value']:<32}{item['bundles']:>10} bundles"
+                      f"{item['input_tokens']:>14,} in   ${item['online_cost']:.2f}")
@@ -0,0 +1,442 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from agri_data_gen.core.storage import frame_store, json_codec
+
+
+# FAILED: finished after max_attempts with rows still missing (kept on the range)
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+class Lease:
+    """
+    A worker's time-limited claim on the record range [start, stop).
+    `token` grows with every hand-out of the range, so a worker whose
+    lease expired (and was re-issued) can no longer heartbeat or complete it.
+    """
+
+    def __init__(self, queue: str, start: int, stop: int, owner: str,
+                 token: int, lease_until: float, attempts: int):
+        self.queue = queue
+        self.start = start
+        self.stop = stop
+        self.owner = owner
+        self.token = token
+        self.lease_until = lease_until
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"Lease({self.queue}:{self.start}-{self.stop}, owner={self.owner}, token={self.token})"
+
+
+class BaseLeaseStore(ABC):
+    """
+    Shared state of a work queue: one entry per record range, each
+    pending, leased (until a deadline), done, or failed with the row ids
+    it could not produce. Completion is recorded at most once per range.
+    """
+
+    @abstractmethod
+    def seed(self, queue: str, ranges: List[Tuple[int, int]]) -> int:
+        """Adds ranges that are not queued yet. Returns how many were added."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def acquire(self, queue: str, owner: str, lease_seconds: float) -> Optional[Lease]:
+        """Leases the first pending or expired range, or returns None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, lease: Lease, lease_seconds: float) -> bool:
+        """Extends a lease. False means it was lost to another worker."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, lease: Lease, missing: List[int] = None) -> bool:
+        """
+        Marks the range done, or failed when `missing` lists rows it gave up on.
+        True only for the one call that completed it.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, lease: Lease) -> None:
+        """Gives a range back unfinished, so another worker can take it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def progress(self, queue: str) -> Dict[str, int]:
+        """Returns {state: number of ranges}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def failed_rows(self, queue: str) -> List[int]:
+        """Row ids recorded as missing on failed ranges, sorted."""
+        raise NotImplementedError
+
+
+class SQLiteLeaseStore(BaseLeaseStore):
+    """
+    Single-host backend. SQLite's file lock serialises acquire() across
+    every process on the machine.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = Path(db_path or os.getenv("WORK_QUEUE_SQLITE_PATH", "data/work_queue.sqlite"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.lock = threading.Lock()
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "queue TEXT NOT NULL, start INTEGER NOT NULL, stop INTEGER NOT NULL, "
+                "state TEXT NOT NULL, owner TEXT, token INTEGER NOT NULL DEFAULT 0, "
+                "lease_until REAL NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+                "completed_at REAL, missing TEXT, PRIMARY KEY (queue, start))"
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(leases)")}
+            if "missing" not in columns:
+                # Queues created before failed ranges were tracked
+                self.conn.execute("ALTER TABLE leases ADD COLUMN missing TEXT")
+
+    def _write(self, sql: str, params: tuple) -> int:
+        with self.lock:
+            return self.conn.execute(sql, params).rowcount
+
+    def seed(self, queue: str, ranges: List[Tuple[int, int]]) -> int:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for start, stop in ranges:
+                    added += self.conn.execute(
+                        "INSERT OR IGNORE INTO leases (queue, start, stop, state) VALUES (?, ?, ?, ?)",
+                        (queue, start, stop, PENDING)
+                    ).rowcount
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def acquire(self, queue: str, owner: str, lease_seconds: float) -> Optional[Lease]:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute(
+                    "SELECT start, stop, token, attempts FROM leases "
+                    "WHERE queue = ? AND (state = ? OR (state = ? AND lease_until < ?)) "
+                    "ORDER BY start LIMIT 1",
+                    (queue, PENDING, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+
+                start, stop, token, attempts = row
+                lease = Lease(queue, start, stop, owner, token + 1, now + lease_seconds, attempts + 1)
+                self.conn.execute(
+                    "UPDATE leases SET state = ?, owner = ?, token = ?, lease_until = ?, attempts = ? "
+                    "WHERE queue = ? AND start = ?",
+                    (LEASED, owner, lease.token, lease.lease_until, lease.attempts, queue, start)
+                )
+                self.conn.execute("COMMIT")
+                return lease
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, lease: Lease, lease_seconds: float) -> bool:
+        lease_until = time.time() + lease_seconds
+        updated = self._write(
+            "UPDATE leases SET lease_until = ? WHERE queue = ? AND start = ? AND token = ? AND state = ?",
+            (lease_until, lease.queue, lease.start, lease.token, LEASED)
+        )
+        if updated:
+            lease.lease_until = lease_until
+        return updated == 1
+
+    def complete(self, lease: Lease, missing: List[int] = None) -> bool:
+        return self._write(
+            "UPDATE leases SET state = ?, completed_at = ?, missing = ? "
+            "WHERE queue = ? AND start = ? AND token = ? AND state = ?",
+            (FAILED if missing else DONE, time.time(), json_codec.dumps(sorted(missing)) if missing else None,
+             lease.queue, lease.start, lease.token, LEASED)
+        ) == 1
+
+    def release(self, lease: Lease) -> None:
+        self._write(
+            "UPDATE leases SET state = ?, lease_until = 0 "
+            "WHERE queue = ? AND start = ? AND token = ? AND state = ?",
+            (PENDING, lease.queue, lease.start, lease.token, LEASED)
+        )
+
+    def progress(self, queue: str) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM leases WHERE queue = ? GROUP BY state", (queue,)
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def failed_rows(self, queue: str) -> List[int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT missing FROM leases WHERE queue = ? AND state = ?", (queue, FAILED)
+            ).fetchall()
+        return sorted(row for (missing,) in rows for row in json_codec.loads(missing or "[]"))
+
+
+class MongoLeaseStore(BaseLeaseStore):
+    """
+    Multi-host backend on the existing MongoDB. Every state change is a
+    single-document conditional update, so concurrent workers never
+    both win the same range.
+    """
+
+    def __init__(self, db_name: str = "taxonomy_db", collection_name: str = "work_leases"):
+        from pymongo import MongoClient, ASCENDING
+
+        mongo_uri = os.getenv("MONGO_URI")
+        if not mongo_uri:
+            raise ValueError("MONGO_URI environment variable not set.")
+
+        self.client = MongoClient(mongo_uri)
+        self.collection = self.client[db_name][collection_name]
+        self.collection.create_index([("queue", ASCENDING), ("state", ASCENDING), ("start", ASCENDING)])
+
+    @staticmethod
+    def _key(queue: str, start: int) -> str:
+        return f"{queue}:{start}"
+
+    def _owned(self, lease: Lease) -> Dict[str, Any]:
+        return {"_id": self._key(lease.queue, lease.start), "token": lease.token, "state": LEASED}
+
+    def seed(self, queue: str, ranges: List[Tuple[int, int]]) -> int:
+        from pymongo import UpdateOne
+
+        if not ranges:
+            return 0
+        result = self.collection.bulk_write([
+            UpdateOne(
+                {"_id": self._key(queue, start)},
+                {"$setOnInsert": {
+                    "queue": queue, "start": start, "stop": stop, "state": PENDING,
+                    "owner": None, "token": 0, "lease_until": 0.0, "attempts": 0,
+                }},
+                upsert=True
+            )
+            for start, stop in ranges
+        ], ordered=False)
+        return result.upserted_count
+
+    def acquire(self, queue: str, owner: str, lease_seconds: float) -> Optional[Lease]:
+        from pymongo import ReturnDocument
+
+        now = time.time()
+        doc = self.collection.find_one_and_update(
+            {
+                "queue": queue,
+                "$or": [
+                    {"state": PENDING},
+                    {"state": LEASED, "lease_until": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {"state": LEASED, "owner": owner, "lease_until": now + lease_seconds},
+                "$inc": {"token": 1, "attempts": 1},
+            },
+            sort=[("start", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return None
+        return Lease(queue, doc["start"], doc["stop"], owner, doc["token"], doc["lease_until"], doc["attempts"])
+
+    def heartbeat(self, lease: Lease, lease_seconds: float) -> bool:
+        lease_until = time.time() + lease_seconds
+        result = self.collection.update_one(self._owned(lease), {"$set": {"lease_until": lease_until}})
+        if result.modified_count:
+            lease.lease_until = lease_until
+        return result.modified_count == 1
+
+    def complete(self, lease: Lease, missing: List[int] = None) -> bool:
+        result = self.collection.update_one(
+            self._owned(lease),
+            {"$set": {"state": FAILED if missing else DONE, "completed_at": time.time(),
+                      "missing": sorted(missing) if missing else None}}
+        )
+        return result.modified_count == 1
+
+    def release(self, lease: Lease) -> None:
+        self.collection.update_one(self._owned(lease), {"$set": {"state": PENDING, "lease_until": 0.0}})
+
+    def progress(self, queue: str) -> Dict[str, int]:
+        return {
+            doc["_id"]: doc["count"]
+            for doc in self.collection.aggregate([
+                {"$match": {"queue": queue}},
+                {"$group": {"_id": "$state", "count": {"$sum": 1}}},
+            ])
+        }
+
+    def failed_rows(self, queue: str) -> List[int]:
+        docs = self.collection.find({"queue": queue, "state": FAILED}, {"missing": 1})
+        return sorted(row for doc in docs for row in doc.get("missing") or [])
+
+
+LEASE_BACKENDS = {
+    "sqlite": SQLiteLeaseStore,
+    "mongo": MongoLeaseStore,
+}
+
+
+def get_lease_store(backend: str = None, **kwargs) -> BaseLeaseStore:
+    """
+    Returns a lease store for the given backend.
+    The backend defaults to the WORK_QUEUE_BACKEND env var, then "sqlite".
+    """
+    backend = backend or os.getenv("WORK_QUEUE_BACKEND", "sqlite")
+    if backend not in LEASE_BACKENDS:
+        raise ValueError(
+            f"Unknown work queue backend '{backend}'. Choose from: {list(LEASE_BACKENDS)}"
+        )
+    return LEASE_BACKENDS[backend](**kwargs)
+
+
+class QueueWorker:
+    """
+    Pulls record ranges from a lease store and generates them with a
+    GenerationEngine, so any number of workers on any number of hosts can
+    share one bundle file.
+
+    Each range is written to its own part file in `out_dir`. While a lease
+    is held, output goes to a temp file named after the lease token, and a
+    background thread keeps the lease alive. A worker that takes over an
+    expired range first copies the records its crashed predecessor left
+    behind, so finished requests are not paid for twice. A finished range
+    is renamed into place and then completed in the store exactly once;
+    if rows are still missing after max_attempts, the range is recorded as
+    failed together with those row ids (see failed_rows()).
+    """
+
+    def __init__(self, engine, store: BaseLeaseStore, queue: str, out_dir: str,
+                 lease_seconds: float = 600.0, max_attempts: int = 3, worker_id: str = None):
+        self.engine = engine
+        self.store = store
+        self.queue = queue
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        # Part files are named after the engine's configured output file
+        self.part_stem = engine.out_file.name.split(".")[0]
+        self.part_suffix = ".jsonl.zst" if frame_store.is_compressed(engine.out_file) else ".jsonl"
+
+    def seed(self, range_size: int = 500) -> int:
+        """Queues [start, stop) ranges covering the engine's bundle file. Safe to repeat."""
+        total = self.engine.total_records()
+        ranges = [(start, min(start + range_size, total)) for start in range(0, total, range_size)]
+        added = self.store.seed(self.queue, ranges)
+        print(f"Queue '{self.queue}': {len(ranges)} ranges ({added} new).")
+        return added
+
+    def part_path(self, lease: Lease, token: int = None) -> Path:
+        """Final part file of a range, or the temp file of one lease on it."""
+        name = f"{self.part_stem}_{lease.start:09d}_{lease.stop:09d}"
+        if token is not None:
+            name += f".tmp{token}"
+        return self.out_dir / (name + self.part_suffix)
+
+    def _carry_over(self, lease: Lease, temp: Path):
+        """Moves records from earlier (crashed or lost) attempts at this range into `temp`."""
+        seen = set()
+        pattern = self.part_path(lease, token=0).name.replace(".tmp0", ".tmp*")
+        with frame_store.open_jsonl_writer(temp) as writer:
+            for old in sorted(self.out_dir.glob(pattern)):
+                if old == temp:
+                    continue
+                for record in frame_store.iter_records(old, skip_invalid=True):
+                    if record.get("id") not in seen:
+                        seen.add(record.get("id"))
+                        writer.write(record)
+                old.unlink(missing_ok=True)
+                frame_store.index_path(old).unlink(missing_ok=True)
+        if seen:
+            print(f"Recovered {len(seen)} records from earlier attempts at range {lease.start}-{lease.stop}.")
+
+    def _keep_alive(self, lease: Lease, stop: threading.Event, lost: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.store.heartbeat(lease, self.lease_seconds):
+                print(f"Lost {lease}; its output will be discarded.")
+                lost.set()
+                return
+
+    def process(self, lease: Lease) -> bool:
+        part = self.part_path(lease)
+        temp = self.part_path(lease, token=lease.token)
+        self._carry_over(lease, temp)
+
+        stop, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._keep_alive, args=(lease, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            self.engine.out_file = temp
+            self.engine.generate_all(rows=set(range(lease.start + 1, lease.stop + 1)))
+        except Exception as e:
+            print(f"Error processing {lease}: {e}")
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            return False
+
+        written = {r.get("id") for r in frame_store.iter_records(temp, skip_invalid=True)} if temp.exists() else set()
+        missing = sorted(set(range(lease.start + 1, lease.stop + 1)) - written)
+        expected = lease.stop - lease.start
+        if missing and lease.attempts < self.max_attempts:
+            # Leave the partial temp file for whoever retries the range
+            print(f"{lease}: {expected - len(missing)}/{expected} records. Releasing for retry.")
+            self.store.release(lease)
+            return False
+
+        if temp.exists():
+            os.replace(temp, part)
+            if frame_store.index_path(temp).exists():
+                os.replace(frame_store.index_path(temp), frame_store.index_path(part))
+        completed = self.store.complete(lease, missing)
+        if completed and missing:
+            print(f"Failed {lease} after {lease.attempts} attempts: {len(missing)}/{expected} rows missing "
+                  f"(recorded on the range) -> {part.name}")
+        elif completed:
+            print(f"Completed {lease}: {expected}/{expected} records -> {part.name}")
+        return completed
+
+    def run(self, max_ranges: int = None) -> int:
+        """Processes ranges until the queue is drained. Returns ranges completed."""
+        completed = 0
+        while max_ranges is None or completed < max_ranges:
+            lease = self.store.acquire(self.queue, self.worker_id, self.lease_seconds)
+            if lease is None:
+                break
+            print(f"[{self.worker_id}] Took {lease} (attempt {lease.attempts}).")
+            completed += int(self.process(lease))
+
+        print(f"[{self.worker_id}] Done. Queue '{self.queue}': {self.store.progress(self.queue)}")
+        failed = self.store.failed_rows(self.queue)
+        if failed:
+            print(f"  {len(failed)} rows missing on failed ranges: {failed[:20]}"
+                  f"{' ...' if len(failed) > 20 else ''}")
+        return completed
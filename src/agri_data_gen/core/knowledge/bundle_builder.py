@@ -1,10 +1,11 @@
-import json
-import itertools
 from typing import List, Dict, Any
 from pathlib import Path
 
 from agri_data_gen.core.data_access.taxonomy_manager import TaxonomyManager
-from agri_data_gen.core.data_access.adapters.adapter import GenericAdapter
+from agri_data_gen.core.data_access.adapters.adapter_registry import AdapterRegistry, get_registry
+from agri_data_gen.core.knowledge.ordering import iter_combinations
+from agri_data_gen.core.profiling.stage_profiler import profile_stage
+from agri_data_gen.core.storage import frame_store
 
 class BundleBuilder:
     """
@@ -12,10 +13,12 @@ class BundleBuilder:
     Region -> Crop -> Classification -> Variety -> Stress -> Yield -> Stage
     """
 
-    def __init__(self, out_dir: str = "data/bundles"):
+    def __init__(self, out_dir: str = "data/bundles", registry: AdapterRegistry = None):
         self.out_dir = Path(out_dir)
         self.out_dir.mkdir(parents=True, exist_ok=True)
         self.taxonomy_manager = TaxonomyManager()
+        # Dataset adapters are only loaded when a step needs them
+        self.registry = registry or get_registry()
         
         # 1. Define the Strict Order
         self.ORDER = [
@@ -31,40 +34,48 @@ class BundleBuilder:
         
         # We will initialize adapters in load_all() once we have the schema
         self.adapters = {}
+        self.schema_reports = {}
 
     def load_all(self):
         """
         Load datasets and taxonomy definitions.
         Then, initialize adapters with the correct schema attributes.
         """
-        # 1. Load Taxonomies first
-        self.taxonomies = self.taxonomy_manager.get_active_taxonomies()
+        # 1. Load Taxonomies first (single read, cached by the manager)
+        with profile_stage("taxonomy_load"):
+            self.taxonomies = self.taxonomy_manager.get_active_taxonomies()
+        self.taxonomies_by_group = {t["group"]: t for t in self.taxonomies}
         
         # 2. Initialize Adapters dynamically based on loaded schemas
         print("Initializing adapters with schemas...")
+        version = self.taxonomy_manager.get_version()
         for group in self.ORDER:
             # Find the taxonomy definition to get its attributes
-            tax_def = next((t for t in self.taxonomies if t["group"] == group), None)
+            tax_def = self.taxonomies_by_group.get(group)
             
             # If found, extract attributes (e.g. ['soil_type', 'rainfall'])
             attrs = tax_def["attributes"] if tax_def else []
             
             # Initialize the adapter with these attributes
-            self.adapters[group] = GenericAdapter(group, attributes=attrs)
-            self.adapters[group].load() # Validates readiness
+            with profile_stage("adapter_load"):
+                self.adapters[group] = self.registry.get_schema_adapter(group, attrs)
 
-    def build_all(self, filename: str = "bundles.jsonl") -> str:
-        output_path = self.out_dir / filename
-        print(f"Building ordered bundles into: {output_path} ...")
+                # Validate every entry once per taxonomy version, not per build
+                if tax_def:
+                    self.schema_reports[group] = self.adapters[group].compile(tax_def["entries"], version=version)
 
-        # 1. Collect Data for each Axis in strict order
+    def _collect_axes(self) -> List[List[tuple]]:
+        """
+        Collects (group_name, entry_id, real_data) values for each axis,
+        in strict ORDER. Axes without a taxonomy are skipped.
+        """
         axes_data = []
         
         for group_name in self.ORDER:
-            tax_def = next((t for t in self.taxonomies if t["group"] == group_name), None)
+            tax_def = self.taxonomies_by_group.get(group_name)
             
             if not tax_def:
-                print(f"Warning: Taxonomy group '{group_name}' not found in DB. Skipping axis.")
+                print(f"Warning: Taxonomy group '{group_name}' not found in taxonomy store. Skipping axis.")
                 continue
 
             adapter = self.adapters.get(group_name)
@@ -76,8 +87,9 @@ class BundleBuilder:
                 
                 # FIX 2: Pass the FULL entry object, not just ID
                 if adapter:
-                    # Returns {'data': {...}, 'schema_attributes': [...]}
-                    real_data = adapter.sample(entry) 
+                    # Returns the compiled, read-only {'data': {...}, 'schema_attributes': (...)};
+                    # bundles get a plain copy of the data so they serialize as before
+                    real_data = {"data": dict(adapter.sample(entry)["data"])}
                 else:
                     real_data = {"data": entry} # Fallback structure
                 
@@ -86,26 +98,114 @@ class BundleBuilder:
             if current_axis_values:
                 axes_data.append(current_axis_values)
 
-        # 2. Generate Combinations
+        return axes_data
+
+    def build_all(self, filename: str = "bundles.jsonl", order: str = "lexicographic",
+                  feasibility: bool = False, min_score: float = None) -> str:
+        """
+        Writes every combination as one JSONL line.
+        A ".zst" filename produces compressed, seekable frames instead.
+        order="coverage" interleaves the axes so that any prefix of the file
+        (e.g. a --limit run) covers every region, crop, etc. as evenly as possible.
+        feasibility=True scores each crop against the weather data and adds a
+        "feasibility" field; bundles scoring below min_score are left out.
+        """
+        output_path = self.out_dir / filename
+        print(f"Building ordered bundles into: {output_path} ...")
+
+        # 1. Collect Data for each Axis in strict order
+        axes_data = self._collect_axes()
+
+        # 2. Generate Combinations (weather drawn per bundle, from the bundle's region)
+        bundles = self._iter_bundles(axes_data, order, weather=self._weather_sampler())
+        if feasibility:
+            bundles = self._feasibility_scorer().annotate(bundles, min_score=min_score)
+
         count = 0
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for combination in itertools.product(*axes_data):
-                bundle = {}
-                bundle["id"] = count+1
-                id_parts = []
-
-                for group_name, entry_id, real_data in combination:
-                    # Unpack the structured data from the adapter
-                    # We store the actual data (id, label, attributes) in the bundle
-                    bundle[group_name] = real_data.get("data", real_data)
-                    
-                    id_parts.append(entry_id)
-
-                # Create ID
-                # bundle["bundle_id"] = "__".join(id_parts)
-
-                f.write(json.dumps(bundle, ensure_ascii=False) + "\n")
+        # Plain JSONL also gets a byte-offset sidecar for seeking / sharding
+        with profile_stage("bundle_build"), frame_store.open_jsonl_writer(output_path, index=True) as f:
+            for bundle in bundles:
+                # Ids are assigned after filtering, so they stay contiguous
+                f.write({"id": count + 1, **bundle})
                 count += 1
 
         print(f"Successfully generated {count} unique scenarios.")
-        return str(output_path)
\ No newline at end of file
+        return str(output_path)
+
+    def _iter_bundles(self, axes_data: List[List[tuple]], order: str, weather=None):
+        unknown_buckets = set()
+        for combination in iter_combinations(axes_data, order):
+            bundle = {}
+            id_parts = []
+
+            for group_name, entry_id, real_data in combination:
+                # Unpack the structured data from the adapter
+                # We store the actual data (id, label, attributes) in the bundle
+                bundle[group_name] = real_data.get("data", real_data)
+                
+                id_parts.append(entry_id)
+
+            # Create ID
+            # bundle["bundle_id"] = "__".join(id_parts)
+
+            if weather is not None and "weather" in bundle:
+                bundle["weather"] = self._resolve_weather(weather, bundle, unknown_buckets)
+
+            yield bundle
+
+    def _weather_sampler(self):
+        """The registry's WeatherAdapter, or None when there is no weather axis or dataset."""
+        if "weather" not in self.ORDER or "weather" not in self.taxonomies_by_group:
+            return None
+        try:
+            return self.registry.get_adapter("weather")
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Warning: weather dataset unavailable ({e}). Weather entries are used without observations.")
+            return None
+
+    @staticmethod
+    def _resolve_weather(weather, bundle: Dict[str, Any], unknown_buckets: set) -> Dict[str, Any]:
+        """Taxonomy weather entry plus an observation sampled from the bundle's region."""
+        entry = bundle["weather"]
+        region_id = (bundle.get("region") or {}).get("id")
+        try:
+            observation = weather.sample(entry.get("id"), region_id=region_id)
+        except KeyError:
+            if entry.get("id") not in unknown_buckets:
+                unknown_buckets.add(entry.get("id"))
+                print(f"Warning: weather entry '{entry.get('id')}' has no dataset bucket. Kept as is.")
+            return entry
+        return {**entry, **observation}
+
+    def _feasibility_scorer(self):
+        """Crop envelopes from the crop adapter, scored against the weather adapter's cells."""
+        from agri_data_gen.core.knowledge.feasibility import CropEnvelopes, FeasibilityScorer
+
+        envelopes = CropEnvelopes.from_adapter(self.registry.get_adapter("crop"))
+        return FeasibilityScorer(envelopes, self.registry.get_adapter("weather"))
+
+    def build_compact(self, filename: str = "bundles.npz", order: str = "lexicographic") -> str:
+        """
+        Same bundle space as build_all(), stored as a uint16 index matrix plus
+        one shared entry dictionary. Bundles are dereferenced lazily by
+        CompactBundleSpace at prompt-render time.
+        Entries are shared by every row, so the weather axis holds the
+        taxonomy entries only, without region-specific observations.
+        """
+        from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+
+        output_path = self.out_dir / filename
+        print(f"Building compact bundle space into: {output_path} ...")
+
+        axes_data = self._collect_axes()
+        axes_entries = [
+            (axis[0][0], [real_data.get("data", real_data) for _, _, real_data in axis])
+            for axis in axes_data
+        ]
+
+        with profile_stage("bundle_build"):
+            space = CompactBundleSpace.from_axes(axes_entries, order=order)
+            space.save(output_path)
+
+        print(f"Successfully generated {len(space)} unique scenarios (compact).")
+        return str(output_path)
@@ -0,0 +1,194 @@
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator, Tuple
+
+from agri_data_gen.core.prompt.token_estimator import estimate_tokens
+from agri_data_gen.core.storage import json_codec
+
+
+class ChunkPacker:
+    """
+    Packs validation scenarios into chunks bounded by an estimated token budget.
+
+    Instead of repeating every label in every scenario, each chunk carries a
+    small legend (e.g. "C1" -> "Wheat (गेहूं) (crop_wheat)") and scenarios only
+    reference the legend codes.
+    """
+
+    # (bundle key, legend code prefix)
+    DEFAULT_AXES = [
+        ("crop", "C"),
+        ("growth_stage", "G"),
+        ("weather", "W"),
+        ("stress", "S"),
+    ]
+
+    def __init__(self,
+                 token_budget: int = 3000,
+                 max_scenarios: int = 200,
+                 axes: List[Tuple[str, str]] = None):
+        """
+        Args:
+            token_budget: Target size of the scenario payload per request.
+            max_scenarios: Hard cap on scenarios per chunk, regardless of budget.
+            axes: Bundle keys to describe, with their legend code prefixes.
+        """
+        self.token_budget = token_budget
+        self.max_scenarios = max_scenarios
+        self.axes = axes or self.DEFAULT_AXES
+
+    @staticmethod
+    def _legend_text(entry: Dict[str, Any]) -> str:
+        label = entry.get("label", entry.get("id", "Unknown"))
+        if "id" in entry:
+            return f"{label} ({entry['id']})"
+        return label
+
+    def _new_chunk(self) -> Dict[str, Any]:
+        return {
+            "ids": [],
+            "legend": {},      # code -> text
+            "codes": {},       # (axis, entry id) -> code
+            "lines": [],
+            "tokens": 0,
+        }
+
+    def _finalize(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "ids": chunk["ids"],
+            "legend": chunk["legend"],
+            "scenarios": "\n".join(chunk["lines"]),
+            "tokens": chunk["tokens"],
+        }
+
+    def _encode(self, chunk: Dict[str, Any], bundle: Dict[str, Any]):
+        """
+        Returns (scenario line, new legend entries, estimated token cost)
+        for adding one bundle to the given chunk. Does not mutate the chunk.
+        """
+        new_legend = {}
+        codes = []
+        counters = {}
+
+        for axis, prefix in self.axes:
+            entry = bundle.get(axis)
+            if not entry:
+                continue
+
+            key = (axis, entry.get("id", entry.get("label")))
+            code = chunk["codes"].get(key)
+            if code is None:
+                code = new_legend.get(key)
+            if code is None:
+                used = sum(1 for k in chunk["codes"] if k[0] == axis)
+                counters[axis] = counters.get(axis, used) + 1
+                code = f"{prefix}{counters[axis]}"
+                new_legend[key] = code
+            codes.append(code)
+
+        line = f"{bundle['id']}: {' '.join(codes)}"
+        cost = estimate_tokens(line) + 1  # +1 for the newline
+
+        for key, code in new_legend.items():
+            axis_entry = bundle[key[0]]
+            cost += estimate_tokens(f'"{code}": "{self._legend_text(axis_entry)}", ')
+
+        return line, new_legend, cost
+
+    def pack(self, bundles: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily groups bundles into chunks. Each yielded chunk has:
+        - 'ids': bundle ids in the chunk
+        - 'legend': code -> label text
+        - 'scenarios': one "id: codes" line per bundle
+        - 'tokens': estimated token size of legend + scenarios
+        """
+        chunk = self._new_chunk()
+
+        for bundle in bundles:
+            line, new_legend, cost = self._encode(chunk, bundle)
+
+            over_budget = chunk["tokens"] + cost > self.token_budget
+            if chunk["ids"] and (over_budget or len(chunk["ids"]) >= self.max_scenarios):
+                yield self._finalize(chunk)
+                chunk = self._new_chunk()
+                # Legend codes are per chunk, so re-encode against the empty chunk
+                line, new_legend, cost = self._encode(chunk, bundle)
+
+            for key, code in new_legend.items():
+                chunk["codes"][key] = code
+                chunk["legend"][code] = self._legend_text(bundle[key[0]])
+
+            chunk["ids"].append(bundle["id"])
+            chunk["lines"].append(line)
+            chunk["tokens"] += cost
+
+        if chunk["ids"]:
+            yield self._finalize(chunk)
+
+
+class MissRateTracker:
+    """
+    Tracks how many scenario IDs the model dropped, bucketed by chunk size.
+    Stats persist across runs so the packer can be capped at a size that
+    the model actually answers completely.
+
+    Counts are exponentially weighted (`decay` per recorded chunk), so a
+    run of complete chunks brings a bucket's miss rate back down. Buckets
+    above the cap receive no chunks at all; their misses are scaled by
+    `forgive` on every run that does not observe them, so the cap relaxes
+    and the larger size gets probed again.
+    """
+
+    def __init__(self, stats_path: str, bucket_size: int = 10, decay: float = 0.95, forgive: float = 0.5):
+        self.stats_path = Path(stats_path)
+        self.bucket_size = bucket_size
+        self.decay = decay
+        self.forgive = forgive
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.observed = set()
+
+        if self.stats_path.exists():
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                self.stats = json_codec.loads(f.read()).get("buckets", {})
+
+    def _bucket(self, chunk_size: int) -> str:
+        start = ((chunk_size - 1) // self.bucket_size) * self.bucket_size + 1
+        return f"{start}-{start + self.bucket_size - 1}"
+
+    def record(self, chunk_size: int, missed: int):
+        name = self._bucket(chunk_size)
+        bucket = self.stats.setdefault(name, {"chunks": 0, "scenarios": 0, "missed": 0})
+        bucket["chunks"] += 1
+        bucket["scenarios"] = round(bucket["scenarios"] * self.decay + chunk_size, 3)
+        bucket["missed"] = round(bucket["missed"] * self.decay + missed, 3)
+        self.observed.add(name)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for name, b in sorted(self.stats.items(), key=lambda kv: int(kv[0].split("-")[0])):
+            rate = b["missed"] / b["scenarios"] if b["scenarios"] else 0.0
+            report[name] = {**b, "miss_rate": round(rate, 4)}
+        return report
+
+    def recommend_max_scenarios(self, max_miss_rate: float = 0.01, default: int = None):
+        """
+        Largest observed chunk size whose bucket (and every smaller bucket)
+        stays under the accepted miss rate. Returns `default` without data.
+        """
+        best = None
+        for name, b in self.summary().items():
+            if b["miss_rate"] > max_miss_rate:
+                break
+            best = int(name.split("-")[1])
+        return best if best is not None else default
+
+    def save(self):
+        """Persists the stats; call once per run, after recording its chunks."""
+        for name, bucket in self.stats.items():
+            if name not in self.observed and bucket["missed"]:
+                bucket["missed"] = round(bucket["missed"] * self.forgive, 3)
+        self.observed = set()
+
+        self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.stats_path, 'w', encoding='utf-8') as f:
+            f.write(json_codec.dumps({"bucket_size": self.bucket_size, "buckets": self.stats}, indent=True))
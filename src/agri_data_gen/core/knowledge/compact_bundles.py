@@ -0,0 +1,89 @@
+import numpy as np
+from typing import Dict, Any, List, Tuple, Iterator
+
+from agri_data_gen.core.storage import json_codec
+
+
+class CompactBundleSpace:
+    """
+    Interned representation of a bundle space.
+
+    Each bundle is a row of small integer entry indices (one column per axis)
+    in a uint16 matrix. The entry dicts themselves are stored once per axis
+    and only dereferenced when a full bundle dict is requested.
+    """
+
+    MAX_ENTRIES_PER_AXIS = np.iinfo(np.uint16).max + 1
+
+    def __init__(self, axes: List[str], entries: Dict[str, List[Dict[str, Any]]], matrix: np.ndarray):
+        """
+        Args:
+            axes: Group names in column order (e.g. ["region", "crop", ...]).
+            entries: group -> list of entry dicts, indexed by the matrix values.
+            matrix: (n_bundles, n_axes) uint16 array of entry indices.
+        """
+        self.axes = axes
+        self.entries = entries
+        self.matrix = matrix
+
+    @classmethod
+    def from_axes(cls, axes_entries: List[Tuple[str, List[Dict[str, Any]]]],
+                  order: str = "lexicographic") -> "CompactBundleSpace":
+        """
+        Builds the full Cartesian product, in the same lexicographic order
+        as itertools.product over the axes, or coverage-first (order="coverage").
+        """
+        axes = [group for group, _ in axes_entries]
+        entries = {group: list(values) for group, values in axes_entries}
+        sizes = [len(values) for _, values in axes_entries]
+
+        for group, size in zip(axes, sizes):
+            if size > cls.MAX_ENTRIES_PER_AXIS:
+                raise ValueError(f"Axis '{group}' has {size} entries; uint16 indices support at most {cls.MAX_ENTRIES_PER_AXIS}.")
+
+        if not sizes:
+            return cls(axes, entries, np.zeros((0, 0), dtype=np.uint16))
+
+        if order == "coverage":
+            from agri_data_gen.core.knowledge.ordering import CoverageOrder
+            return cls(axes, entries, CoverageOrder(sizes).matrix(dtype=np.uint16))
+        if order != "lexicographic":
+            raise ValueError(f"Unknown bundle order '{order}'.")
+
+        matrix = np.indices(sizes, dtype=np.uint16).reshape(len(sizes), -1).T
+        return cls(axes, entries, np.ascontiguousarray(matrix))
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def row(self, index: int) -> Tuple[int, ...]:
+        """Returns the bundle at `index` as a tuple of entry indices."""
+        return tuple(int(v) for v in self.matrix[index])
+
+    def bundle(self, index: int) -> Dict[str, Any]:
+        """Dereferences one bundle into the full dict format of bundles.jsonl."""
+        bundle = {"id": index + 1}
+        for group, entry_idx in zip(self.axes, self.matrix[index]):
+            bundle[group] = self.entries[group][entry_idx]
+        return bundle
+
+    def iter_bundles(self, start: int = 0, stop: int = None) -> Iterator[Dict[str, Any]]:
+        """Lazily yields full bundle dicts for rows [start, stop)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield self.bundle(index)
+
+    def save(self, path: str) -> str:
+        """Writes the matrix and the shared entry dictionary into one .npz file."""
+        meta = json_codec.dumps({"axes": self.axes, "entries": self.entries})
+        with open(path, "wb") as f:
+            np.savez_compressed(f, matrix=self.matrix, meta=np.array(meta))
+        return str(path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactBundleSpace":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json_codec.loads(str(data["meta"]))
+            matrix = data["matrix"]
+        return cls(meta["axes"], meta["entries"], matrix)
+
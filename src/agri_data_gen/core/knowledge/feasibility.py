@@ -0,0 +1,212 @@
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+
+from agri_data_gen.core.data_access.adapters.weather_adapter import (
+    ALL_INDIA, REGION_NEIGHBOURS, normalize_region
+)
+
+# Envelope features, in column order of every matrix below
+FEATURES = ("temperature", "humidity", "rainfall", "ph")
+
+# Weather dataset column feeding each feature. Daily precip_mm is not
+# comparable with the crops' seasonal rainfall and the dataset has no soil pH,
+# so those features stay NaN (unchecked) unless a caller supplies them.
+WEATHER_COLUMNS = {
+    "temperature": "temperature_celsius",
+    "humidity": "humidity",
+}
+
+# Smallest distance outside an envelope at which a feature scores 0, so that
+# narrow envelopes (e.g. rice humidity spans ~5%) are not all-or-nothing
+MIN_TOLERANCE = {
+    "temperature": 3.0,  # °C
+    "humidity": 10.0,  # %
+    "rainfall": 50.0,  # mm
+    "ph": 0.5,
+}
+
+
+def normalize_crop(name: str) -> str:
+    """'crop_kidney_beans' / 'Kidney Beans' -> 'kidneybeans' (Crop_recommendation.csv labels)."""
+    key = re.sub(r"[^a-z0-9]", "", str(name).lower().replace("crop_", "", 1))
+    return key
+
+
+class CropEnvelopes:
+    """
+    Per-crop climatic envelopes from Crop_recommendation.csv: the
+    [low, high] quantile band of each feature over that crop's rows.
+    """
+
+    def __init__(self, crops: List[str], low: np.ndarray, high: np.ndarray):
+        """
+        Args:
+            crops: Normalized crop names, one per row of low/high.
+            low, high: (n_crops, n_features) arrays in FEATURES order.
+        """
+        self.crops = crops
+        self.low = low
+        self.high = high
+        self.positions = {crop: i for i, crop in enumerate(crops)}
+
+    @classmethod
+    def from_csv(cls, csv_path: str = "data/raw/Crop_recommendation.csv",
+                 quantiles: Tuple[float, float] = (0.05, 0.95)) -> "CropEnvelopes":
+        path = Path(csv_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Crop dataset not found at {path}")
+
+        df = pd.read_csv(path)
+        grouped = df.groupby(df["label"].map(normalize_crop))[list(FEATURES)]
+        low = grouped.quantile(quantiles[0])
+        high = grouped.quantile(quantiles[1]).loc[low.index]
+        return cls(list(low.index), low.to_numpy(dtype=float), high.to_numpy(dtype=float))
+
+    @classmethod
+    def from_adapter(cls, crop_adapter,
+                     quantiles: Tuple[float, float] = (0.05, 0.95)) -> "CropEnvelopes":
+        """Same envelopes from a loaded (or shared-memory attached) CropAdapter, without re-reading the CSV."""
+        crops, low, high = [], [], []
+        for crop, rows in sorted(crop_adapter.crop_rows.items(), key=lambda item: normalize_crop(item[0])):
+            values = np.column_stack([crop_adapter.columns[feature][rows] for feature in FEATURES])
+            crops.append(normalize_crop(crop))
+            low.append(np.quantile(values, quantiles[0], axis=0))
+            high.append(np.quantile(values, quantiles[1], axis=0))
+        return cls(crops, np.array(low), np.array(high))
+
+    def index_of(self, crop_id: str) -> Optional[int]:
+        return self.positions.get(normalize_crop(crop_id))
+
+
+class FeasibilityResult:
+    """
+    Scores of every crop x weather-sample pair.
+
+    score[c, s] is in [0, 1]: 1 inside every envelope, falling linearly to 0
+    as the worst feature moves `tolerance` envelope widths (at least
+    MIN_TOLERANCE) outside it.
+    too_low / too_high flag the violated constraint of each feature.
+    """
+
+    def __init__(self, score: np.ndarray, too_low: np.ndarray, too_high: np.ndarray):
+        self.score = score
+        self.too_low = too_low
+        self.too_high = too_high
+
+    def violations(self, crop: int, sample: int) -> List[str]:
+        """e.g. ["temperature_high", "humidity_low"]"""
+        return (
+            [f"{name}_low" for name, hit in zip(FEATURES, self.too_low[crop, sample]) if hit] +
+            [f"{name}_high" for name, hit in zip(FEATURES, self.too_high[crop, sample]) if hit]
+        )
+
+
+def score_pairs(envelopes: CropEnvelopes, samples: np.ndarray,
+                tolerance: float = 0.5) -> FeasibilityResult:
+    """
+    Broadcasts every crop envelope against every weather sample.
+
+    Args:
+        samples: (n_samples, n_features) array in FEATURES order; NaN
+            marks a feature the sample does not provide (never violated).
+        tolerance: Envelope widths outside the band at which a feature scores 0
+            (never less than MIN_TOLERANCE).
+    """
+    low = envelopes.low[:, None, :]  # (C, 1, F)
+    high = envelopes.high[:, None, :]
+    x = samples[None, :, :]  # (1, S, F)
+
+    with np.errstate(invalid="ignore"):
+        below = np.where(np.isnan(x), 0.0, low - x)
+        above = np.where(np.isnan(x), 0.0, x - high)
+    distance = np.maximum(np.maximum(below, above), 0.0)  # (C, S, F)
+
+    min_tolerance = np.array([MIN_TOLERANCE[name] for name in FEATURES])
+    width = np.maximum((high - low) * tolerance, min_tolerance)
+    suitability = np.clip(1.0 - distance / width, 0.0, 1.0)
+
+    # The limiting factor decides (Liebig's law of the minimum)
+    score = suitability.min(axis=2)
+    return FeasibilityResult(score, below > 0, above > 0)
+
+
+class FeasibilityScorer:
+    """
+    Scores bundles by crop x (region, weather bucket).
+
+    Each (region, bucket) cell of the WeatherAdapter index is summarised by
+    the median of its rows, all cells are scored against all crops in one
+    broadcast, and annotating a bundle is then a table lookup.
+    """
+
+    def __init__(self, envelopes: CropEnvelopes, weather_adapter, tolerance: float = 0.5):
+        """
+        Args:
+            weather_adapter: A loaded (or shared-memory attached) WeatherAdapter.
+        """
+        self.envelopes = envelopes
+        self.weather = weather_adapter
+
+        cells, profiles = self._cell_profiles()
+        self.cells = {cell: i for i, cell in enumerate(cells)}
+        self.result = score_pairs(envelopes, profiles, tolerance=tolerance)
+
+    def _cell_profiles(self) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """Median feature vector of every (region, bucket) cell."""
+        columns = np.full((self.weather.n_rows, len(FEATURES)), np.nan)
+        for i, feature in enumerate(FEATURES):
+            if feature in WEATHER_COLUMNS:
+                columns[:, i] = self.weather.numeric_column(WEATHER_COLUMNS[feature])
+
+        cells, profiles = [], []
+        for region, buckets in self.weather.index.items():
+            for bucket, positions in buckets.items():
+                if len(positions):
+                    cells.append((region, bucket))
+                    profiles.append(np.median(columns[positions], axis=0))
+
+        return cells, np.array(profiles).reshape(len(profiles), len(FEATURES))
+
+    def _cell_for(self, region_id: Optional[str], bucket: str) -> Optional[int]:
+        if region_id:
+            region = normalize_region(region_id)
+            for candidate in [region] + REGION_NEIGHBOURS.get(region, []):
+                if (candidate, bucket) in self.cells:
+                    return self.cells[(candidate, bucket)]
+        return self.cells.get((ALL_INDIA, bucket))
+
+    def assess(self, crop_id: str, bucket: str, region_id: str = None) -> Dict[str, Any]:
+        """{"score": float or None, "violations": [...]} for one combination."""
+        crop = self.envelopes.index_of(crop_id)
+        cell = self._cell_for(region_id, bucket)
+        if crop is None or cell is None:
+            # No envelope for this crop (or no weather for the bucket): unknown
+            return {"score": None, "violations": []}
+        return {
+            "score": round(float(self.result.score[crop, cell]), 3),
+            "violations": self.result.violations(crop, cell),
+        }
+
+    def annotate(self, bundles: Iterable[Dict[str, Any]],
+                 min_score: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        Adds a "feasibility" field to each bundle. With min_score, bundles
+        scoring below it are dropped (unknown scores are always kept).
+        """
+        for bundle in bundles:
+            crop = (bundle.get("crop") or {}).get("id")
+            weather = (bundle.get("weather") or {}).get("id")
+            region = (bundle.get("region") or {}).get("id")
+
+            feasibility = {"score": None, "violations": []}
+            if crop and weather:
+                feasibility = self.assess(crop, weather, region)
+
+            if min_score is not None and feasibility["score"] is not None and feasibility["score"] < min_score:
+                continue
+
+            bundle["feasibility"] = feasibility
+            yield bundle
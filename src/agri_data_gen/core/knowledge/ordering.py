@@ -0,0 +1,99 @@
+from typing import List, Tuple, Iterator, Sequence
+
+
+ORDERS = ("lexicographic", "coverage")
+
+
+class CoverageOrder:
+    """
+    Coverage-first ("anytime") enumeration of a Cartesian product.
+
+    Position p is written in mixed radix over the axes, largest axis first
+    and fastest: digits d_0, d_1, ... Each axis value is then sheared by the
+    sum of the faster digits:
+
+        v_i = (d_i + d_0 + ... + d_{i-1}) mod n_i
+
+    This is a bijection on the product space, and computed per position
+    without materialising it. Because n_0 >= n_i, the first n_0 positions
+    already contain every value of every axis, each about n_0 / n_i times,
+    and every later prefix stays close to that balance.
+    """
+
+    def __init__(self, sizes: Sequence[int]):
+        """
+        Args:
+            sizes: Number of entries on each axis, in the caller's axis order.
+        """
+        self.sizes = [int(n) for n in sizes]
+        # Digit order: axes by size, largest first (stable on ties)
+        self.axis_order = sorted(range(len(self.sizes)), key=lambda i: -self.sizes[i])
+        self.radices = [self.sizes[i] for i in self.axis_order]
+
+    def __len__(self) -> int:
+        total = 1
+        for n in self.sizes:
+            total *= n
+        return total if self.sizes else 0
+
+    def indices(self, position: int) -> Tuple[int, ...]:
+        """Entry index on each axis (caller's axis order) at `position`."""
+        if not 0 <= position < len(self):
+            raise IndexError(f"Position {position} outside bundle space of {len(self)}")
+
+        values = [0] * len(self.sizes)
+        shear = 0
+        for axis, radix in zip(self.axis_order, self.radices):
+            position, digit = divmod(position, radix)
+            values[axis] = (digit + shear) % radix
+            shear += digit
+        return tuple(values)
+
+    def position(self, indices: Sequence[int]) -> int:
+        """Inverse of indices(): the position of an entry-index tuple."""
+        position, scale, shear = 0, 1, 0
+        for axis, radix in zip(self.axis_order, self.radices):
+            digit = (indices[axis] - shear) % radix
+            position += digit * scale
+            scale *= radix
+            shear += digit
+        return position
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        return self.iter(0)
+
+    def iter(self, start: int = 0, stop: int = None) -> Iterator[Tuple[int, ...]]:
+        """Lazily yields index tuples for positions [start, stop)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for position in range(start, stop):
+            yield self.indices(position)
+
+    def matrix(self, start: int = 0, stop: int = None, dtype="uint16"):
+        """Vectorized indices() for positions [start, stop), one row per position."""
+        import numpy as np
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        position = np.arange(start, stop, dtype=np.int64)
+
+        out = np.empty((len(position), len(self.sizes)), dtype=dtype)
+        shear = np.zeros_like(position)
+        for axis, radix in zip(self.axis_order, self.radices):
+            position, digit = np.divmod(position, radix)
+            out[:, axis] = (digit + shear) % radix
+            shear += digit
+        return out
+
+
+def iter_combinations(axes: List[list], order: str = "lexicographic") -> Iterator[tuple]:
+    """
+    Yields one value per axis for every combination of `axes`, either in
+    itertools.product order or coverage-first (see CoverageOrder).
+    """
+    if order == "lexicographic":
+        import itertools
+        yield from itertools.product(*axes)
+    elif order == "coverage":
+        for indices in CoverageOrder([len(axis) for axis in axes]):
+            yield tuple(axis[i] for axis, i in zip(axes, indices))
+    else:
+        raise ValueError(f"Unknown bundle order '{order}'. Choose from: {list(ORDERS)}")
@@ -1,29 +1,82 @@
-import json
 import os
 import time
 import logging
-from google import genai
-from google.genai import types
+import numpy as np
 from dotenv import load_dotenv
 
+from agri_data_gen.core.knowledge.chunk_packer import ChunkPacker, MissRateTracker
+from agri_data_gen.core.storage import json_codec
+from agri_data_gen.core.storage.line_index import JsonlIndex
+
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class DecisionArray:
+    """
+    Compact per-bundle decision store indexed by integer bundle id.
+    One byte per bundle instead of one dict entry per bundle.
+    """
+
+    MISSED = 0
+    REJECTED = 1
+    VALID = 2
+
+    def __init__(self, capacity: int = 1024):
+        self.values = np.zeros(capacity, dtype=np.uint8)
+
+    def set(self, bundle_id: int, is_valid: bool):
+        if bundle_id < 0:
+            raise IndexError(f"Negative bundle id: {bundle_id}")
+        if bundle_id >= len(self.values):
+            # Grow geometrically so repeated sets stay amortized O(1)
+            grown = np.zeros(max(bundle_id + 1, 2 * len(self.values)), dtype=np.uint8)
+            grown[:len(self.values)] = self.values
+            self.values = grown
+        self.values[bundle_id] = self.VALID if is_valid else self.REJECTED
+
+    def get(self, bundle_id: int) -> int:
+        if 0 <= bundle_id < len(self.values):
+            return int(self.values[bundle_id])
+        return self.MISSED
+
+    def count(self) -> int:
+        return int(np.count_nonzero(self.values))
+
+
 class BatchValidator:
-    def __init__(self):
-        self.api_key = os.getenv('GOOGLE_API_KEY_SOKET')
+    def __init__(self, shard: int = 0, num_shards: int = 1, api_key: str = None):
+        """
+        With num_shards > 1 this validator only handles its shard of the
+        input (a balanced byte range from the offset index) and writes
+        shard-suffixed output files. `api_key` overrides GOOGLE_API_KEY_SOKET,
+        so shards can be spread over several keys.
+        """
+        self.api_key = api_key or os.getenv('GOOGLE_API_KEY_SOKET')
         self.model_name = "gemini-2.5-flash" 
-        self.client = genai.Client(api_key=self.api_key)
+        self._client = None
         
         # Paths
         self.job_id = f"validation_batch_{int(time.time())}"
         self.input_path = "data/bundles/bundles.jsonl"
         self.batch_request_file = f"data/bundles/classify/{self.job_id}_requests.jsonl"
         self.raw_results_file = f"data/bundles/classify/{self.job_id}_results.jsonl"
+        self.chunk_manifest_file = f"data/bundles/classify/{self.job_id}_chunks.jsonl"
+        self.miss_stats_file = "data/bundles/classify/chunk_miss_stats.json"
         self.valid_output = "data/bundles/classify/valid_bundles.jsonl"
         self.invalid_output = "data/bundles/classify/invalid_bundles.jsonl"
 
+        self.shard = shard
+        self.num_shards = num_shards
+        if num_shards > 1:
+            suffix = f"_shard{shard}"
+            self.job_id += suffix
+            self.batch_request_file = f"data/bundles/classify/{self.job_id}_requests.jsonl"
+            self.raw_results_file = f"data/bundles/classify/{self.job_id}_results.jsonl"
+            self.chunk_manifest_file = f"data/bundles/classify/{self.job_id}_chunks.jsonl"
+            self.valid_output = f"data/bundles/classify/valid_bundles{suffix}.jsonl"
+            self.invalid_output = f"data/bundles/classify/invalid_bundles{suffix}.jsonl"
+
         self.system_instruction = """
         You are an Expert Agricultural Scientist. Validate these scenarios.
         Logic:
@@ -36,43 +89,53 @@ class BatchValidator:
         Example: { "1": 1, "2": 0 , ...}
         """
 
-    def create_batch_file(self, chunk_size=50):
-        """1. Reads bundles and creates a JSONL file for Batch API."""
+    @property
+    def client(self):
+        """genai client, constructed (and the SDK imported) on first use."""
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def create_batch_file(self, token_budget=3000, max_scenarios=200, max_miss_rate=0.01):
+        """1. Reads bundles and creates a JSONL file for Batch API.
+
+        Chunks are packed up to `token_budget` estimated tokens. If earlier runs
+        showed the model dropping IDs above some chunk size, that size caps
+        `max_scenarios`.
+        """
         if not os.path.exists(self.input_path):
             logger.error(f"Input file not found: {self.input_path}")
             return False
 
-        logger.info("Reading input bundles...")
-        all_bundles = []
-        with open(self.input_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    all_bundles.append(json.loads(line))
-        
-        logger.info(f"Loaded {len(all_bundles)} bundles. Creating batch requests...")
+        logger.info("Streaming input bundles into batch requests...")
 
-        with open(self.batch_request_file, 'w', encoding='utf-8') as f_out:
-            # Split into chunks of 50
-            for i in range(0, len(all_bundles), chunk_size):
-                chunk = all_bundles[i : i + chunk_size]
-                
-                # Format the data string to save tokens
-                prompt_data = []
-                for b in chunk:
-                    prompt_data.append({
-                        "id": b["id"],
-                        "text": f"Crop: {b['crop']['label']} ({b['crop']['id']}), Stage: {b['growth_stage']['label']}, Weather: {b['weather']['label']} ({b['weather']['id']}), Stress: {b['stress']['label']} ({b['stress']['id']})"
-                    })
+        tracker = MissRateTracker(self.miss_stats_file)
+        safe_size = tracker.recommend_max_scenarios(max_miss_rate, default=max_scenarios)
+        if safe_size < max_scenarios:
+            logger.info(f"Capping chunks at {safe_size} scenarios (observed miss rate above {max_miss_rate}).")
+            max_scenarios = safe_size
+
+        packer = ChunkPacker(token_budget=token_budget, max_scenarios=max_scenarios)
+        os.makedirs(os.path.dirname(self.batch_request_file), exist_ok=True)
+
+        chunk_count = 0
+        with open(self.batch_request_file, 'w', encoding='utf-8') as f_out, \
+             open(self.chunk_manifest_file, 'w', encoding='utf-8') as f_manifest:
+            for chunk in packer.pack(self._iter_bundles()):
+                custom_id = f"chunk_{chunk_count}"
 
                 prompt = f"""
-                Classify these {len(prompt_data)} scenarios. 
+                Classify these {len(chunk['ids'])} scenarios. 
                 Return JSON mapping ID to 0 or 1.
-                Scenarios: {json.dumps(prompt_data, ensure_ascii=False)}
+                Legend: {json_codec.dumps(chunk['legend'])}
+                Scenarios (ID: Crop Stage Weather Stress):
+                {chunk['scenarios']}
                 """
 
                 # Create Batch Request Object
                 request_entry = {
-                    "custom_id": f"chunk_{i}", # Helps track which chunk this is
+                    "custom_id": custom_id, # Helps track which chunk this is
                     "request": {
                         "contents": [{"parts": [{"text": prompt}]}],
                         "generationConfig": {
@@ -83,13 +146,32 @@ class BatchValidator:
                         }
                     }
                 }
-                f_out.write(json.dumps(request_entry) + "\n")
+                f_out.write(json_codec.dumps_line(request_entry))
+
+                # Remember which IDs went into which chunk (for miss-rate tracking)
+                f_manifest.write(json_codec.dumps_line({"custom_id": custom_id, "ids": chunk["ids"]}))
+                chunk_count += 1
         
-        logger.info(f"Batch request file created: {self.batch_request_file}")
+        logger.info(f"Batch request file created: {self.batch_request_file} ({chunk_count} chunks)")
         return True
 
+    def _iter_lines(self):
+        """Lazily yields raw input lines of this validator's shard."""
+        with JsonlIndex(self.input_path) as index:
+            start, stop = index.split(self.num_shards)[self.shard]
+            for line in index.iter_lines(start, stop):
+                if line.strip():
+                    yield line
+
+    def _iter_bundles(self):
+        """Lazily yields bundles from the input file, one line at a time."""
+        for line in self._iter_lines():
+            yield json_codec.loads(line)
+
     def submit_and_wait(self):
         """Uploads file and starts the Batch Job."""
+        from google.genai import types
+
         logger.info("Uploading batch file to Google...")
         batch_input_file = self.client.files.upload(
             file=self.batch_request_file,
@@ -129,53 +211,62 @@ class BatchValidator:
         return True
 
     def parse_and_split(self):
-        """parses results and splits the original file."""
+        """parses results and splits the original file in a single pass."""
         logger.info("Parsing results...")
         
-        validation_map = {}
+        decisions = DecisionArray()
         
         # Load the raw results from Google
         with open(self.raw_results_file, 'r', encoding='utf-8') as f:
             for line in f:
                 try:
-                    resp = json.loads(line)
+                    resp = json_codec.loads(line)
                     # Extract the JSON string from the model response
                     candidates = resp['response']['candidates'][0]['content']['parts'][0]['text']
-                    chunk_decisions = json.loads(candidates)
-                    
-                    # Add to our main map (force keys to strings)
-                    for k, v in chunk_decisions.items():
-                        validation_map[str(k)] = v
+                    chunk_decisions = json_codec.loads(candidates)
+                    items = chunk_decisions.items()
                 except Exception as e:
                     logger.error(f"Error parsing a result line: {e}")
+                    continue
+
+                # Bundle ids are integers; the model returns them as string keys.
+                # A bad key only loses its own decision, not the whole chunk's.
+                bad_keys = []
+                for k, v in items:
+                    try:
+                        decisions.set(int(k), v == 1)
+                    except (TypeError, ValueError, IndexError):
+                        bad_keys.append(k)
+                if bad_keys:
+                    logger.warning(f"Skipped {len(bad_keys)} malformed ids in {resp.get('key') or resp.get('custom_id')}: {bad_keys[:5]}")
+
+        logger.info(f"Loaded {decisions.count()} validation decisions.")
 
-        logger.info(f"Loaded {len(validation_map)} validation decisions.")
+        self._record_miss_rates(decisions)
 
         # Split the original file
         valid_cnt = 0
         invalid_cnt = 0
         
-        with open(self.input_path, 'r', encoding='utf-8') as infile, \
-             open(self.valid_output, 'w', encoding='utf-8') as valid_out, \
+        with open(self.valid_output, 'wb') as valid_out, \
              open(self.invalid_output, 'w', encoding='utf-8') as invalid_out:
             
-            for line in infile:
-                bundle = json.loads(line)
-                b_id = str(bundle['id'])
+            for line in self._iter_lines():
+                bundle = json_codec.loads(line)
                 
-                # Default to Invalid (0) if LLM missed it (safety first)
-                is_valid = validation_map.get(b_id, 0)
+                # Default to Invalid if LLM missed it (safety first)
+                decision = decisions.get(int(bundle['id']))
                 
-                if is_valid == 1:
+                if decision == DecisionArray.VALID:
                     valid_out.write(line)
                     valid_cnt += 1
                 else:
-                    if b_id not in validation_map:
+                    if decision == DecisionArray.MISSED:
                         bundle['validation_status'] = "LLM_MISSED"
                     else:
                         bundle['validation_status'] = "LLM_REJECTED"
                     
-                    invalid_out.write(json.dumps(bundle, ensure_ascii=False) + "\n")
+                    invalid_out.write(json_codec.dumps_line(bundle))
                     invalid_cnt += 1
 
         print("="*40)
@@ -184,6 +275,23 @@ class BatchValidator:
         print(f"Invalid Scenarios: {invalid_cnt}")
         print("="*40)
 
+    def _record_miss_rates(self, decisions: DecisionArray):
+        """Updates per-chunk-size miss statistics from the chunk manifest."""
+        if not os.path.exists(self.chunk_manifest_file):
+            logger.warning("No chunk manifest found. Skipping miss-rate tracking.")
+            return
+
+        tracker = MissRateTracker(self.miss_stats_file)
+        with open(self.chunk_manifest_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                chunk = json_codec.loads(line)
+                missed = sum(1 for b_id in chunk["ids"] if decisions.get(int(b_id)) == DecisionArray.MISSED)
+                tracker.record(len(chunk["ids"]), missed)
+        tracker.save()
+
+        for bucket, stats in tracker.summary().items():
+            logger.info(f"Chunk size {bucket}: miss rate {stats['miss_rate']:.2%} over {stats['scenarios']} scenarios")
+
 if __name__ == "__main__":
     validator = BatchValidator()
     validator.create_batch_file()
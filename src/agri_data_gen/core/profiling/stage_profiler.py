@@ -0,0 +1,177 @@
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+MODES = ("cpu", "mem", "both")
+
+
+class StageStats:
+    """Accumulated measurements of one pipeline stage across all threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.mem_delta = 0  # net bytes still allocated after the stage
+        self.mem_peak = 0  # highest traced memory seen while the stage ran
+        self.profiles: List[cProfile.Profile] = []
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_at = 0.0
+
+
+class StageProfiler:
+    """
+    Per-stage CPU (cProfile) and memory (tracemalloc) capture.
+
+    Code marks stages with profile_stage("name"). Each thread gets its own
+    cProfile per stage; nested stages pause the outer one, so time is
+    attributed to the innermost stage. A tracemalloc snapshot is taken at
+    stage exit at most once every `interval` seconds per stage, and compared
+    against a baseline taken when profiling started.
+    finish() writes <stage>.pstats / <stage>.snap files and prints a summary.
+    """
+
+    def __init__(self, mode: str = "both", out_dir: str = "profiles",
+                 interval: float = 30.0, top_n: int = 10):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Choose from: {list(MODES)}")
+
+        self.cpu = mode in ("cpu", "both")
+        self.mem = mode in ("mem", "both")
+        self.out_dir = Path(out_dir)
+        self.interval = interval
+        self.top_n = top_n
+
+        self.stages: Dict[str, StageStats] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+
+        self.baseline = None
+        if self.mem:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            # Stage snapshots are reported as growth against this one
+            self.baseline = tracemalloc.take_snapshot()
+
+    def _stage(self, name: str) -> StageStats:
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageStats(name)
+            return self.stages[name]
+
+    def _enable(self, profile: cProfile.Profile) -> bool:
+        try:
+            profile.enable()
+            return True
+        except ValueError:
+            # Python 3.12+ allows only one active profiler per process
+            return False
+
+    @contextmanager
+    def stage(self, name: str):
+        stats = self._stage(name)
+        stack = self.local.__dict__.setdefault("stack", [])
+
+        profile = None
+        if self.cpu:
+            if stack and stack[-1] is not None:
+                stack[-1].disable()
+            profile = cProfile.Profile()
+            if not self._enable(profile):
+                profile = None
+        stack.append(profile)
+
+        mem_before = tracemalloc.get_traced_memory()[0] if self.mem else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+            if stack and stack[-1] is not None:
+                self._enable(stack[-1])
+
+            snapshot = None
+            current = peak = 0
+            if self.mem:
+                current, peak = tracemalloc.get_traced_memory()
+                if time.time() - stats.snapshot_at >= self.interval:
+                    snapshot = tracemalloc.take_snapshot()
+
+            with self.lock:
+                stats.calls += 1
+                stats.wall += wall
+                if profile is not None:
+                    stats.profiles.append(profile)
+                stats.mem_delta += current - mem_before
+                stats.mem_peak = max(stats.mem_peak, peak)
+                if snapshot is not None:
+                    stats.snapshot, stats.snapshot_at = snapshot, time.time()
+
+    def finish(self):
+        """Writes per-stage pstats / snapshots and prints the summary table."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"\nProfile ({time.time() - self.started:.1f}s total), files in {self.out_dir}/")
+        print(f"{'stage':<16}{'calls':>8}{'wall s':>10}{'avg ms':>10}{'net MB':>10}{'peak MB':>10}")
+        for stats in self.stages.values():
+            avg_ms = stats.wall / stats.calls * 1000 if stats.calls else 0.0
+            print(f"{stats.name:<16}{stats.calls:>8}{stats.wall:>10.2f}{avg_ms:>10.1f}"
+                  f"{stats.mem_delta / 1e6:>10.2f}{stats.mem_peak / 1e6:>10.2f}")
+
+        for stats in self.stages.values():
+            if stats.profiles:
+                merged = pstats.Stats(stats.profiles[0])
+                for profile in stats.profiles[1:]:
+                    merged.add(profile)
+                merged.dump_stats(self.out_dir / f"{stats.name}.pstats")
+
+                print(f"\n[{stats.name}] top {self.top_n} functions by cumulative time:")
+                merged.sort_stats("cumulative").print_stats(self.top_n)
+
+            if stats.snapshot is not None:
+                stats.snapshot.dump(str(self.out_dir / f"{stats.name}.snap"))
+
+                print(f"\n[{stats.name}] top {self.top_n} allocation sites (growth since start):")
+                for line in stats.snapshot.compare_to(self.baseline, "lineno")[:self.top_n]:
+                    print(f"  {line}")
+
+        if self.mem:
+            tracemalloc.stop()
+
+
+_active: Optional[StageProfiler] = None
+
+
+def enable_profiling(mode: str, out_dir: str = "profiles", interval: float = 30.0,
+                     top_n: int = 10) -> StageProfiler:
+    """Installs the process-wide profiler that profile_stage() reports to."""
+    global _active
+    _active = StageProfiler(mode, out_dir=out_dir, interval=interval, top_n=top_n)
+    return _active
+
+
+def finish_profiling():
+    global _active
+    if _active is not None:
+        _active.finish()
+        _active = None
+
+
+def profile_stage(name: str):
+    """
+    Context manager marking a pipeline stage. A no-op unless profiling
+    was enabled (e.g. with the CLI's --profile option).
+    """
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name)
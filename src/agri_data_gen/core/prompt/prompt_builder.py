@@ -1,12 +1,57 @@
 import json
 from typing import Dict, Any
 
+from agri_data_gen.core.storage import json_codec
+
+
+# Analysis steps and constraints shared by single and packed prompts
+INSTRUCTIONS = """
+                Step 1: Feasibility Analysis (Crucial)
+                Compare the 'Crop' requirements (Temperature, Rainfall, etc.) against the provided 'Weather' conditions and various other constraints.
+                
+                Step 2: Generate Advisory
+                Based on Step 1, generate the advisory in Hindi.
+
+                **Your advisory MUST cover the following Actionable Areas (where applicable):**
+                1. **Feasibility:** Can this crop actually be grown here?
+                2. **Disease Prevention:** Specific preventive measures for likely pests/diseases.
+                3. **Soil Management:** Advice on fertilizers, nutrients, or land preparation.
+                4. **Water Management:** Irrigation advice (saving water or critical stages).
+                5. **Risk Handling:** How to handle weather uncertainty or risks.
+                6. **Economic/Operational:** Practical tips on costs or operations.
+
+                **Condition Logic:**
+                - If the scenario is IMPOSSIBLE/FATAL (e.g., Wrong Crop Classification): 
+                * Focus ONLY on the "Feasibility" aspect.
+                * Clearly state that farming this crop is NOT recommended and explain *why*.
+                * Do NOT give false hope or advice for soil/water/disease (it is irrelevant for a failed crop).
+                - If the scenario is STRESSFUL but SALVAGEABLE: 
+                * Acknowledge the stress (e.g., "Drought stress", etc).
+                * Provide specific mitigation steps across the actionable areas above.
+                - If the scenario is IDEAL: 
+                * Focus on yield maximization across all actionable areas.
+
+                Constraints:
+                - Output strictly the advisory in hindi with proper utilisation of hindi words even for english terms.
+                - The advisory should be a single coherent Hindi text (formatted with bullet points).
+                - Use simple, clear Hindi suitable for farmers.
+                - Reference specific numbers from the input (e.g., "Since rainfall is 0mm...", etc).
+""".strip("\n")
+
 
 class PromptBuilder:
     """
     Builds prompts for generating Hindi agronomic reasoning examples.
     """
 
+    @staticmethod
+    def render(bundle: Dict[str, Any], record_id) -> str:
+        """
+        Renders one bundle into its prompt. Online and batch generation
+        both go through here, so the two paths always send the same text.
+        """
+        return PromptBuilder.build(json_codec.dumps(bundle, indent=True), record_id)
+
     @staticmethod
     def build(input_context: Dict[str, Any], record_id: int) -> str:
         """
@@ -25,25 +70,45 @@ class PromptBuilder:
                 Task:
                 You are provided with a data bundle describing a specific agricultural scenario.
                 
-                Step 1: Feasibility Analysis (Crucial)
-                Compare the 'Crop' requirements (Temperature, Rainfall, etc.) against the provided 'Weather' conditions and various other constraints.
+{INSTRUCTIONS}
+                """
+
+        return prompt.strip()
+
+
+    @staticmethod
+    def build_packed(input_contexts: Dict[str, str]) -> str:
+        """
+        One prompt for several bundles. `input_contexts` maps bundle id to
+        that bundle's JSON text. The model must answer with a JSON array
+        holding one {"bundle_id", "advisory"} object per input bundle.
+        """
+
+        bundles_block = "\n".join(
+            f"""                [bundle_id: {bundle_id}]
+                ```json
+                {context}
+                ```"""
+            for bundle_id, context in input_contexts.items()
+        )
+
+        prompt = f"""
+                Role: Expert Agricultural Advisor (Kisan Mitra).
+                Language: Hindi (Strictly).
                 
-                Step 2: Generate Advisory
-                Based on Step 1, generate the advisory in Hindi:
-                - If the scenario is IMPOSSIBLE/FATAL: 
-                * Clearly state that farming this crop is NOT recommended.
-                * Explain *why* clearly.
-                * Do NOT give false hope or generic fertilizer tips for a dying crop.
-                - If the scenario is STRESSFUL but SALVAGEABLE: 
-                * Acknowledge the stress (e.g., "Drought stress", etc).
-                * Provide specific mitigation steps.
-                - If the scenario is IDEAL: 
-                * Focus on yield maximization and standard care.
+                Input Data ({len(input_contexts)} independent scenarios):
+{bundles_block}
+                
+                Task:
+                Each data bundle above describes a separate agricultural scenario.
+                Handle every scenario on its own, following the steps below.
+                
+{INSTRUCTIONS}
 
-                Constraints:
-                - Output strictly the advisory in hindi with proper utilisation of hindi words even for english terms.
-                - Use simple, clear Hindi suitable for farmers. Use bullet points for steps.
-                - Reference specific numbers from the input (e.g., "Since rainfall is 0mm...", etc).
+                Output Format:
+                A JSON array with exactly one object per scenario, in any order:
+                [{{"bundle_id": "<bundle_id>", "advisory": "<Hindi advisory>"}}, ...]
+                Every bundle_id listed above MUST appear exactly once.
                 """
 
         return prompt.strip()
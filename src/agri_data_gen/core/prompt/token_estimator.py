@@ -0,0 +1,38 @@
+import math
+from typing import Tuple
+
+
+# Rough characters-per-token ratios for the Gemini tokenizer.
+# ASCII text averages ~4 chars per token, while Devanagari and other
+# non-ASCII scripts split much more aggressively.
+ASCII_CHARS_PER_TOKEN = 4.0
+NON_ASCII_CHARS_PER_TOKEN = 1.5
+
+
+def char_counts(text: str) -> Tuple[int, int]:
+    """
+    (ASCII, non-ASCII) character counts of `text`. The estimate is linear
+    in both, so counts of prompt pieces can be added up before converting.
+    """
+    if not text:
+        return 0, 0
+    # encode(..., "ignore") drops exactly the non-ASCII characters, in C
+    ascii_count = len(text.encode("ascii", "ignore"))
+    return ascii_count, len(text) - ascii_count
+
+
+def tokens_from_counts(ascii_count: int, non_ascii: int) -> int:
+    return math.ceil(
+        ascii_count / ASCII_CHARS_PER_TOKEN +
+        non_ascii / NON_ASCII_CHARS_PER_TOKEN
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, offline token estimate for a piece of prompt text.
+    Good enough for budgeting; never use it for billing.
+    """
+    if not text:
+        return 0
+    return tokens_from_counts(*char_counts(text))
@@ -0,0 +1,147 @@
+import os
+import time
+import threading
+from typing import Dict, List, Any
+
+from agri_data_gen.core.providers.rate_limiter import RateLimiter
+
+
+class KeyState:
+    """
+    Runtime state of one API key: its own rate limiter, in-flight count,
+    and cool-down after rate-limit (429) responses.
+    Only the env var name is ever logged, never the key itself.
+    """
+
+    def __init__(self, name: str, api_key: str, rpm_limit: int):
+        self.name = name
+        self.api_key = api_key
+        self.limiter = RateLimiter(max_calls_per_minute=rpm_limit)
+
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.consecutive_failures = 0
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+
+class CredentialPool:
+    """
+    Routes requests across several API keys.
+
+    Each call to acquire() picks the healthy key with the fewest in-flight
+    requests (ties broken by whose rate limiter frees up first). Keys that
+    hit a 429 cool down with exponential backoff while the others carry on,
+    so aggregate throughput scales with the number of keys.
+    """
+
+    def __init__(self,
+                 keys: Dict[str, str],
+                 rpm_limit: int = 10,
+                 base_cooldown: float = 30.0,
+                 max_cooldown: float = 600.0,
+                 max_failures: int = 3):
+        """
+        Args:
+            keys: env var name -> API key.
+            rpm_limit: Requests per minute allowed per key.
+            base_cooldown: Seconds a key rests after its first 429.
+            max_cooldown: Upper bound for the exponential cool-down.
+            max_failures: Consecutive non-429 errors before a key is rested.
+        """
+        if not keys:
+            raise RuntimeError("CredentialPool needs at least one API key.")
+
+        self.states: List[KeyState] = [
+            KeyState(name, key, rpm_limit) for name, key in keys.items()
+        ]
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.max_failures = max_failures
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str = "GOOGLE_API_KEY", **kwargs) -> "CredentialPool":
+        """
+        Collects every env var named `prefix` or `prefix_*`
+        (e.g. GOOGLE_API_KEY, GOOGLE_API_KEY_2, GOOGLE_API_KEY_SOKET).
+        Duplicate key values are only used once.
+        """
+        keys, seen = {}, set()
+        for name in sorted(os.environ):
+            if name != prefix and not name.startswith(prefix + "_"):
+                continue
+            value = os.environ[name].strip()
+            if value and value not in seen:
+                keys[name] = value
+                seen.add(value)
+
+        if not keys:
+            raise RuntimeError(f"No API keys found. Set {prefix} or {prefix}_<N> env vars.")
+        return cls(keys, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def acquire(self) -> KeyState:
+        """
+        Reserves the least-loaded healthy key. Blocks while every key is
+        cooling down. The caller must pass the key back to release().
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                healthy = [s for s in self.states if s.is_healthy(now)]
+                if healthy:
+                    state = min(healthy, key=lambda s: (s.in_flight, s.limiter.next_slot()))
+                    state.in_flight += 1
+                    state.requests += 1
+                    return state
+                wake_at = min(s.cooldown_until for s in self.states)
+
+            time.sleep(max(wake_at - time.time(), 0.1))
+
+    def release(self, state: KeyState, rate_limited: bool = False, failed: bool = False):
+        """Returns a key to the pool, recording how its request went."""
+        with self.lock:
+            state.in_flight -= 1
+
+            if rate_limited:
+                state.rate_limited += 1
+                state.consecutive_rate_limits += 1
+                cooldown = min(
+                    self.base_cooldown * (2 ** (state.consecutive_rate_limits - 1)),
+                    self.max_cooldown
+                )
+                state.cooldown_until = time.time() + cooldown
+                print(f"[{state.name}] Rate limited. Cooling down for {cooldown:.0f}s.")
+            elif failed:
+                state.failures += 1
+                state.consecutive_failures += 1
+                if state.consecutive_failures >= self.max_failures:
+                    state.cooldown_until = time.time() + self.base_cooldown
+                    state.consecutive_failures = 0
+            else:
+                state.consecutive_rate_limits = 0
+                state.consecutive_failures = 0
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self.lock:
+            return [
+                {
+                    "key": s.name,
+                    "healthy": s.is_healthy(now),
+                    "in_flight": s.in_flight,
+                    "requests": s.requests,
+                    "rate_limited": s.rate_limited,
+                    "failures": s.failures,
+                }
+                for s in self.states
+            ]
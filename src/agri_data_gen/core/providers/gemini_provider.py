@@ -1,35 +1,102 @@
 import os
+from typing import Any, Callable, Dict, Optional
 from google.genai import types
 from google import genai
 from dotenv import load_dotenv
 
+from agri_data_gen.core.providers.generation_config import ONLINE_GENERATION_CONFIG
+
 
 load_dotenv()
 
+
+class StreamAborted(Exception):
+    """Raised by generate_stream() when a check rejects the partial output."""
+
+    def __init__(self, reason: str, answer_chars: int, thinking_chars: int):
+        super().__init__(f"Stream aborted ({reason}) after {answer_chars} answer chars")
+        self.reason = reason
+        self.answer_chars = answer_chars
+        self.thinking_chars = thinking_chars
+
+
 class GeminiProvider:
     """
     Minimal wrapper around Gemini 2.5 Flash.
     Call:   GeminiProvider().generate(prompt)
     """
 
-    def __init__(self, model_name: str = "models/gemini-2.5-flash"):
-        api_key = os.getenv("GOOGLE_API_KEY_2")
+    def __init__(self, model_name: str = "models/gemini-2.5-flash", api_key: str = None):
+        api_key = api_key or os.getenv("GOOGLE_API_KEY_2")
         if not api_key:
             raise RuntimeError("Set GOOGLE_API_KEY env var first.")
         self.client = genai.Client(api_key=api_key)
         self.model_name = model_name
         
+    def _config(self):
+        return types.GenerateContentConfig(
+            temperature=ONLINE_GENERATION_CONFIG["temperature"],
+            response_mime_type=ONLINE_GENERATION_CONFIG["response_mime_type"],
+            thinking_config=types.ThinkingConfig(
+                include_thoughts=ONLINE_GENERATION_CONFIG["include_thoughts"],
+                thinking_budget=ONLINE_GENERATION_CONFIG["thinking_budget"]
+            )
+        )
+
     def generate(self, prompt: str) -> str:
         response = self.client.models.generate_content(
                     model=self.model_name,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.7,
-                        response_mime_type="application/json",
-                        thinking_config=types.ThinkingConfig(
-                            include_thoughts=True,
-                            thinking_budget= 2048
-                        )
-                    )
+                    config=self._config()
                 )        
         return response.model_dump()
+
+    def generate_stream(self, prompt: str,
+                        check: Callable[[str], Optional[str]] = None) -> Dict[str, Any]:
+        """
+        Same request as generate(), consumed chunk by chunk.
+
+        After every chunk `check` receives the answer text so far (thought
+        parts excluded) and returns a reason string to give up, or None.
+        On a reason the stream is closed, so no more tokens are generated or
+        billed, and StreamAborted is raised. Otherwise the chunks are merged
+        into one response dict shaped like generate()'s.
+        """
+        stream = self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt,
+            config=self._config()
+        )
+
+        thinking, answer = [], []
+        answer_chars = 0
+        last = {}
+        try:
+            for chunk in stream:
+                last = chunk.model_dump()
+                candidates = last.get("candidates") or []
+                parts = ((candidates[0].get("content") or {}).get("parts") or []) if candidates else []
+                for part in parts:
+                    text = part.get("text") or ""
+                    if part.get("thought"):
+                        thinking.append(text)
+                    else:
+                        answer.append(text)
+                        answer_chars += len(text)
+
+                reason = check("".join(answer)) if check is not None and answer_chars else None
+                if reason:
+                    raise StreamAborted(reason, answer_chars, sum(len(t) for t in thinking))
+        finally:
+            # Closing the generator drops the HTTP stream, which stops generation
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+        candidate = dict(((last.get("candidates") or [{}])[0]) or {})
+        parts = []
+        if thinking:
+            parts.append({"text": "".join(thinking), "thought": True})
+        parts.append({"text": "".join(answer)})
+        candidate["content"] = {**(candidate.get("content") or {}), "parts": parts}
+        return {**last, "candidates": [candidate]}
@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+
+# Sampling settings per generation path. Online requests (GeminiProvider)
+# keep the larger thinking budget; batch jobs (TextBatchJob) trade some
+# reasoning for half the thinking-token spend. Pass ONLINE_GENERATION_CONFIG
+# to TextBatchJob to send batch requests with the online settings instead.
+ONLINE_GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.7,
+    "response_mime_type": "application/json",
+    "include_thoughts": True,
+    "thinking_budget": 2048,
+}
+
+BATCH_GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.2,
+    "response_mime_type": "application/json",
+    "include_thoughts": True,
+    "thinking_budget": 1024,
+}
+
+
+def batch_generation_config(config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """A generation config (default: BATCH_GENERATION_CONFIG) in the camelCase shape of a Batch API request."""
+    config = config or BATCH_GENERATION_CONFIG
+    return {
+        "responseMimeType": config["response_mime_type"],
+        "temperature": config["temperature"],
+        "thinkingConfig": {
+            "includeThoughts": config["include_thoughts"],
+            "thinkingBudget": config["thinking_budget"],
+        },
+    }
@@ -0,0 +1,24 @@
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Manages API rate limits (RPM) locally to prevent 429 errors.
+    """
+    def __init__(self, max_calls_per_minute: int = 10):
+        self.delay = 60.0 / max_calls_per_minute
+        self.last_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            elapsed = now - self.last_call
+            if elapsed < self.delay:
+                time.sleep(self.delay - elapsed)
+            self.last_call = time.time()
+
+    def next_slot(self) -> float:
+        """Earliest wall-clock time the next call may go out."""
+        return self.last_call + self.delay
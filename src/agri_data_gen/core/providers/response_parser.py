@@ -0,0 +1,35 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+def _first_candidate(response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    candidates = (response or {}).get("candidates") or []
+    return candidates[0] if candidates else None
+
+
+def split_response_text(response: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Splits a Gemini response dict (model_dump() or Batch API JSON) into
+    (thinking text, answer text). Thought parts carry `thought: True`.
+    """
+    candidate = _first_candidate(response)
+    if not candidate:
+        return "", ""
+
+    thinking, answer = [], []
+    for part in (candidate.get("content") or {}).get("parts") or []:
+        text = part.get("text") or ""
+        if part.get("thought"):
+            thinking.append(text)
+        else:
+            answer.append(text)
+    return "".join(thinking), "".join(answer)
+
+
+def finish_reason(response: Dict[str, Any]) -> Optional[str]:
+    """Returns the first candidate's finish reason (e.g. "STOP", "MAX_TOKENS")."""
+    candidate = _first_candidate(response)
+    if not candidate:
+        return None
+    reason = candidate.get("finish_reason") or candidate.get("finishReason")
+    # model_dump() keeps enums; the Batch API returns plain strings
+    return getattr(reason, "name", reason)
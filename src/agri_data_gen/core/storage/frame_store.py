@@ -0,0 +1,332 @@
+import io
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Union
+
+from agri_data_gen.core.storage import json_codec
+
+# Files with this suffix are stored as zstd-compressed JSONL frames.
+COMPRESSED_SUFFIX = ".zst"
+INDEX_SUFFIX = ".idx"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "Compressed JSONL (.zst) needs the 'zstandard' package: pip install zstandard"
+        ) from e
+    return zstandard
+
+
+def is_compressed(path: Union[str, Path]) -> bool:
+    return str(path).endswith(COMPRESSED_SUFFIX)
+
+
+def index_path(path: Union[str, Path]) -> Path:
+    return Path(str(path) + INDEX_SUFFIX)
+
+
+class FrameWriter:
+    """
+    Writes JSONL records as a sequence of independently decodable zstd frames.
+
+    Every frame holds up to `records_per_frame` lines. A sidecar index
+    (<file>.idx, itself JSONL) records for each frame its byte offset,
+    compressed length, first record number and record count, so readers can
+    seek straight to the frames covering a record range.
+    """
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 records_per_frame: int = 1000,
+                 level: int = 3,
+                 append: bool = False):
+        self.path = Path(path)
+        self.index_path = index_path(self.path)
+        self.records_per_frame = records_per_frame
+        self.compressor = _zstd().ZstdCompressor(level=level)
+
+        self.next_record = 0
+        if append and self.path.exists():
+            frames = _recover(self.path)
+            if frames:
+                self.next_record = frames[-1]["first"] + frames[-1]["count"]
+        else:
+            self.path.unlink(missing_ok=True)
+            self.index_path.unlink(missing_ok=True)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.data_file = open(self.path, "ab")
+        self.index_file = open(self.index_path, "a", encoding="utf-8")
+        self.pending: List[str] = []
+
+    def write(self, record: Dict[str, Any]):
+        self.write_line(json_codec.dumps_line(record))
+
+    def write_line(self, line: str):
+        if not line.endswith("\n"):
+            line += "\n"
+        self.pending.append(line)
+        if len(self.pending) >= self.records_per_frame:
+            self.flush()
+
+    def flush(self, sync: bool = False):
+        """Compresses buffered lines into one frame and indexes it."""
+        if not self.pending:
+            return
+
+        frame = self.compressor.compress("".join(self.pending).encode("utf-8"))
+        offset = self.data_file.tell()
+        self.data_file.write(frame)
+        self.data_file.flush()
+        # The frame is durable before the index points at it; a crash in
+        # between leaves unindexed bytes, which the next append truncates
+        os.fsync(self.data_file.fileno())
+
+        self.index_file.write(json_codec.dumps_line({
+            "offset": offset,
+            "length": len(frame),
+            "first": self.next_record,
+            "count": len(self.pending),
+        }))
+        self.index_file.flush()
+
+        if sync:
+            os.fsync(self.index_file.fileno())
+
+        self.next_record += len(self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.data_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_index(path: Path) -> List[Dict[str, int]]:
+    """Frame entries of an index, up to the first unreadable or inconsistent line."""
+    frames = []
+    if not path.exists():
+        return frames
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                frame = json_codec.loads(line)
+                expected = frames[-1]["offset"] + frames[-1]["length"] if frames else 0
+                first = frames[-1]["first"] + frames[-1]["count"] if frames else 0
+                if frame["offset"] != expected or frame["first"] != first:
+                    break
+            except (json_codec.JSONDecodeError, KeyError, TypeError):
+                break
+            frames.append(frame)
+    return frames
+
+
+def scan_frames(path: Union[str, Path]) -> List[Dict[str, int]]:
+    """
+    Rebuilds index entries by decompressing the file frame by frame.
+    Stops at the first incomplete or corrupt frame.
+    """
+    zstd = _zstd()
+    frames = []
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+
+    offset = first = 0
+    while offset < len(data):
+        decompressor = zstd.ZstdDecompressor().decompressobj()
+        try:
+            text = decompressor.decompress(data[offset:])
+        except zstd.ZstdError:
+            break
+        if not decompressor.eof:
+            break
+        length = len(data) - offset - len(decompressor.unused_data)
+        count = text.count(b"\n")
+        frames.append({"offset": offset, "length": length, "first": first, "count": count})
+        offset += length
+        first += count
+    return frames
+
+
+def _recover(path: Path) -> List[Dict[str, int]]:
+    """
+    Makes an existing framed file safe to append to and returns its frames.
+    A missing or damaged index is rebuilt from the data, and bytes past the
+    last indexed frame (a frame written before a crash) are truncated.
+    """
+    idx = index_path(path)
+    frames = _read_index(idx)
+    size = path.stat().st_size
+    end = frames[-1]["offset"] + frames[-1]["length"] if frames else 0
+
+    if end > size or (not frames and size):
+        # Index missing, unreadable or pointing past the data: scan the frames
+        frames = scan_frames(path)
+        end = frames[-1]["offset"] + frames[-1]["length"] if frames else 0
+
+    if size > end:
+        with open(path, "r+b") as f:
+            f.truncate(end)
+            os.fsync(f.fileno())
+
+    # Rewrite the index when it does not hold exactly these frames
+    expected = "".join(json_codec.dumps_line(frame) for frame in frames)
+    current = idx.read_text(encoding="utf-8") if idx.exists() else None
+    if current != expected:
+        tmp = idx.with_name(idx.name + ".tmp")
+        tmp.write_text(expected, encoding="utf-8")
+        os.replace(tmp, idx)
+    return frames
+
+
+class FrameReader:
+    """
+    Reads a framed .zst JSONL file, either as a stream or by record range.
+    Range reads only decompress the frames that overlap the range.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.frames: List[Dict[str, int]] = []
+
+        idx = index_path(self.path)
+        if idx.exists():
+            self.frames = list(json_codec.iter_jsonl(idx))
+
+    def __len__(self) -> int:
+        if not self.frames:
+            return 0
+        return self.frames[-1]["first"] + self.frames[-1]["count"]
+
+    def _read_frame(self, f, frame: Dict[str, int]) -> List[str]:
+        f.seek(frame["offset"])
+        data = _zstd().ZstdDecompressor().decompress(f.read(frame["length"]))
+        return data.decode("utf-8").splitlines(keepends=True)
+
+    def iter_lines(self, start: int = 0, stop: int = None) -> Iterator[str]:
+        """Yields raw JSONL lines for records [start, stop)."""
+        if not self.frames:
+            # No index: fall back to streaming across all frames
+            if start or stop is not None:
+                raise FileNotFoundError(f"Range reads need the frame index: {index_path(self.path)}")
+            with open(self.path, "rb") as f:
+                reader = _zstd().ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                yield from io.TextIOWrapper(reader, encoding="utf-8")
+            return
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        with open(self.path, "rb") as f:
+            for frame in self.frames:
+                first, last = frame["first"], frame["first"] + frame["count"]
+                if last <= start:
+                    continue
+                if first >= stop:
+                    break
+                lines = self._read_frame(f, frame)
+                yield from lines[max(start - first, 0):stop - first]
+
+    def iter_records(self, start: int = 0, stop: int = None) -> Iterator[Any]:
+        for line in self.iter_lines(start, stop):
+            if line.strip():
+                yield json_codec.loads(line)
+
+
+class PlainJsonlWriter:
+    """
+    Uncompressed counterpart of FrameWriter with the same interface.
+    With index=True it also emits the .offsets sidecar (one uint64 byte
+    offset per record) as it writes, so no separate indexing pass is needed.
+    """
+
+    def __init__(self, path: Union[str, Path], append: bool = False, index: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "ab" if append else "wb")
+        self.position = self.file.tell()
+
+        self.offsets_file = None
+        if index:
+            from agri_data_gen.core.storage.line_index import offsets_path
+
+            sidecar = offsets_path(self.path)
+            if append and self.position and not sidecar.exists():
+                # Existing data without an index: index it before appending
+                from agri_data_gen.core.storage.line_index import build_index
+                build_index(self.path)
+            self.offsets_file = open(sidecar, "ab" if append else "wb")
+
+    def write(self, record: Dict[str, Any]):
+        self.write_line(json_codec.dumps_line(record))
+
+    def write_line(self, line: str):
+        data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+        if self.offsets_file is not None:
+            self.offsets_file.write(self.position.to_bytes(8, "little"))
+        self.file.write(data)
+        self.position += len(data)
+
+    def flush(self, sync: bool = False):
+        self.file.flush()
+        if self.offsets_file is not None:
+            self.offsets_file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        # Data first, so the sidecar is never older than the file it indexes
+        self.file.close()
+        if self.offsets_file is not None:
+            self.offsets_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_jsonl_writer(path: Union[str, Path], append: bool = False, index: bool = False, **kwargs):
+    """
+    Returns a FrameWriter for .zst paths (always indexed by frame), a plain
+    JSONL writer otherwise (with a byte-offset sidecar when index=True).
+    """
+    if is_compressed(path):
+        return FrameWriter(path, append=append, **kwargs)
+    return PlainJsonlWriter(path, append=append, index=index)
+
+
+def iter_lines(path: Union[str, Path], start: int = 0, stop: int = None) -> Iterator[str]:
+    """Yields raw JSONL lines from a plain or compressed file."""
+    if is_compressed(path):
+        yield from FrameReader(path).iter_lines(start, stop)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if index < start:
+                continue
+            if stop is not None and index >= stop:
+                break
+            yield line
+
+
+def iter_records(path: Union[str, Path], start: int = 0, stop: int = None,
+                 skip_invalid: bool = False) -> Iterator[Any]:
+    """Yields decoded records from a plain or compressed JSONL file."""
+    for line in iter_lines(path, start, stop):
+        if not line.strip():
+            continue
+        try:
+            yield json_codec.loads(line)
+        except json_codec.JSONDecodeError:
+            if not skip_invalid:
+                raise
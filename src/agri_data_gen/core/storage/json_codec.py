@@ -0,0 +1,148 @@
+import os
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterator, Union, TypedDict
+
+# Optional accelerated backend. orjson emits UTF-8 without escaping
+# (same as ensure_ascii=False) and is several times faster than stdlib json.
+# Set AGRI_JSON_BACKEND=stdlib to force the fallback.
+try:
+    if os.getenv("AGRI_JSON_BACKEND", "").lower() == "stdlib":
+        raise ImportError
+    import orjson
+    BACKEND = "orjson"
+except ImportError:
+    orjson = None
+    BACKEND = "stdlib"
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except works
+JSONDecodeError = json.JSONDecodeError
+
+
+class BundleRecord(TypedDict, total=False):
+    """One line of bundles.jsonl: an integer id plus one entry dict per axis."""
+    id: int
+    bundle_id: str
+    region: Dict[str, Any]
+    crop: Dict[str, Any]
+    growth_stage: Dict[str, Any]
+    weather: Dict[str, Any]
+    stress: Dict[str, Any]
+
+
+class OutputRecord(TypedDict, total=False):
+    """
+    One line of generated data.jsonl, the same for online, packed and batch rows.
+
+    id is the 1-based bundle row. output is a Gemini response dict
+    (model_dump() or Batch API JSON): candidates[0].content.parts holds the
+    thought parts ("thought": true) and the JSON answer. A packed row's answer
+    is its {"bundle_id", "advisory"} entry, and its output also has
+    "pack": [rows answered by the same request]. The pack's thinking and
+    usage_metadata are stored once, on the record of pack[0].
+    """
+    id: int
+    bundle_id: str
+    output: Dict[str, Any]
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode one JSON document (str or bytes)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    """Values neither backend encodes natively (numpy scalars and arrays from pandas rows)."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _sanitize(obj: Any) -> Any:
+    """Copy of `obj` as orjson sees it: NaN / inf -> None, numpy -> Python, keys -> str."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {_key(k): _sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sanitize(v) for v in obj]
+    if isinstance(obj, (str, int, bool)) or obj is None:
+        return obj
+    return _sanitize(_default(obj))
+
+
+def _key(key: Any) -> str:
+    # Same spelling as orjson.OPT_NON_STR_KEYS (and stdlib) for the usual key types
+    if isinstance(key, str):
+        return key
+    if isinstance(key, bool) or key is None:
+        return json.dumps(key)
+    if isinstance(key, float) and not math.isfinite(key):
+        return "null"
+    return str(_default(key) if hasattr(key, "item") else key)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """
+    Encode to a compact JSON string, non-ASCII characters kept as-is.
+    `indent=True` gives 2-space pretty printing.
+
+    Both backends use the same separators and agree on the values bundles
+    carry: NaN / inf become null, numpy scalars and arrays become plain
+    numbers and lists, and non-string dict keys are stringified.
+    Floats that need an exponent may still be spelled differently
+    (orjson "1e16", stdlib "1e+16").
+    """
+    if orjson is not None:
+        option = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        try:
+            return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+        except TypeError:
+            # e.g. numpy scalar dict keys, which OPT_NON_STR_KEYS does not take
+            return orjson.dumps(_sanitize(obj), option=option).decode("utf-8")
+
+    kwargs = {"ensure_ascii": False, "allow_nan": False, "default": _default}
+    if indent:
+        kwargs["indent"] = 2
+    else:
+        kwargs["separators"] = (",", ":")
+    try:
+        return json.dumps(obj, **kwargs)
+    except (ValueError, TypeError):
+        # NaN / inf, or keys stdlib will not stringify: retry on a sanitized copy
+        return json.dumps(_sanitize(obj), **kwargs)
+
+
+def dumps_line(obj: Any) -> str:
+    """Encode one JSONL line (including the trailing newline)."""
+    return dumps(obj) + "\n"
+
+
+def iter_jsonl(path: Union[str, Path], skip_invalid: bool = False) -> Iterator[Any]:
+    """
+    Streams decoded records from a JSONL file, skipping blank lines.
+    With skip_invalid, undecodable lines are dropped instead of raising.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except JSONDecodeError:
+                if not skip_invalid:
+                    raise
+
+
+def make_output_record(record_id: int, output: Dict[str, Any]) -> OutputRecord:
+    """Builds the generated-data record written to data.jsonl."""
+    return {"id": record_id, "output": output}
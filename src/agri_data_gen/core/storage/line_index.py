@@ -0,0 +1,137 @@
+import os
+import mmap
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Any, Iterator, List, Tuple, Union
+
+from agri_data_gen.core.storage import json_codec
+
+# Sidecar file holding one little-endian uint64 byte offset per record.
+OFFSETS_SUFFIX = ".offsets"
+OFFSET_DTYPE = np.dtype("<u8")
+
+
+def offsets_path(path: Union[str, Path]) -> Path:
+    return Path(str(path) + OFFSETS_SUFFIX)
+
+
+def build_index(path: Union[str, Path], block_size: int = 1 << 24) -> np.ndarray:
+    """
+    Scans a JSONL file once and writes the start offset of every line
+    to the .offsets sidecar. Returns the offsets array.
+    """
+    path = Path(path)
+    chunks = [np.zeros(1, dtype=OFFSET_DTYPE)]
+    position = 0
+
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord("\n"))
+            chunks.append((newlines + position + 1).astype(OFFSET_DTYPE))
+            position += len(block)
+
+    offsets = np.concatenate(chunks)
+    # The last newline starts no new record
+    if offsets[-1] >= position:
+        offsets = offsets[:-1]
+
+    # Written aside and renamed into place, so a concurrent reader never maps a partial sidecar
+    sidecar = offsets_path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=sidecar.name + ".", suffix=".tmp", dir=sidecar.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            offsets.tofile(f)
+        os.replace(tmp_path, sidecar)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return offsets
+
+
+class JsonlIndex:
+    """
+    Random access into a JSONL file through its byte-offset sidecar.
+
+    The data file is memory-mapped, so reading record k is a seek-free slice,
+    and split() hands out balanced byte ranges for parallel workers.
+    """
+
+    def __init__(self, path: Union[str, Path], build_if_missing: bool = True):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        sidecar = offsets_path(self.path)
+
+        if self._is_stale(sidecar):
+            if not build_if_missing:
+                raise FileNotFoundError(f"Missing or stale offset index: {sidecar}")
+            build_index(self.path)
+
+        self.offsets = np.fromfile(sidecar, dtype=OFFSET_DTYPE)
+
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def _is_stale(self, sidecar: Path) -> bool:
+        if not sidecar.exists():
+            return True
+        if sidecar.stat().st_mtime < self.path.stat().st_mtime:
+            return True
+        count = sidecar.stat().st_size // OFFSET_DTYPE.itemsize
+        if count == 0:
+            return self.size > 0
+        # Cheap consistency check: the last offset must fall inside the file
+        last = int(np.fromfile(sidecar, dtype=OFFSET_DTYPE, offset=(count - 1) * OFFSET_DTYPE.itemsize)[0])
+        if last >= self.size:
+            return True
+        # and the last indexed line must end the file (mtimes can tie on an append)
+        with open(self.path, "rb") as f:
+            f.seek(last)
+            return last + len(f.readline()) < self.size
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _end(self, k: int) -> int:
+        return int(self.offsets[k + 1]) if k + 1 < len(self.offsets) else self.size
+
+    def read_line(self, k: int) -> bytes:
+        """Raw bytes of record k (including the trailing newline)."""
+        return self._mmap[int(self.offsets[k]):self._end(k)]
+
+    def read(self, k: int) -> Any:
+        return json_codec.loads(self.read_line(k))
+
+    def iter_lines(self, start: int = 0, stop: int = None) -> Iterator[bytes]:
+        stop = len(self) if stop is None else min(stop, len(self))
+        for k in range(start, stop):
+            yield self.read_line(k)
+
+    def iter_records(self, start: int = 0, stop: int = None) -> Iterator[Any]:
+        for line in self.iter_lines(start, stop):
+            if line.strip():
+                yield json_codec.loads(line)
+
+    def split(self, n: int) -> List[Tuple[int, int]]:
+        """
+        Splits the file into n contiguous record ranges [start, stop)
+        of roughly equal byte size.
+        """
+        targets = np.linspace(0, self.size, n + 1)[1:-1]
+        cuts = np.searchsorted(self.offsets, targets, side="left").tolist()
+        bounds = [0] + cuts + [len(self)]
+        return [(bounds[i], bounds[i + 1]) for i in range(n)]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
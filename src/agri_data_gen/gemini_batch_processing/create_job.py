@@ -1,11 +1,12 @@
 import time
-import json
 import os
 import logging
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
 
+from agri_data_gen.core.prompt.prompt_builder import PromptBuilder
+from agri_data_gen.core.providers.generation_config import BATCH_GENERATION_CONFIG, batch_generation_config
+from agri_data_gen.core.storage import json_codec, frame_store
+
 
 load_dotenv()
 # Setup simple logging
@@ -13,120 +14,107 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class TextBatchJob:
-    def __init__(self, job_name="agri-advisory-job"):
-        self.api_key = os.getenv('GOOGLE_API_KEY_SOKET')
+    def __init__(self, job_name="agri-advisory-job", api_key=None, generation_config=None):
+        # Pass api_key to run this job on a specific key (e.g. one from a CredentialPool)
+        self.api_key = api_key or os.getenv('GOOGLE_API_KEY_SOKET')
         self.model_name = "models/gemini-2.5-flash"
-        self.client = genai.Client(api_key=self.api_key)  
+        # Sampling settings sent with every request (see generation_config.py)
+        self.generation_config = generation_config or BATCH_GENERATION_CONFIG
+        self._client = None
         self.job_name = job_name
         self.job_id = f"{job_name}_{int(time.time())}"
+        # Created on first write, so status checks don't leave empty dirs behind
         self.output_dir = f"output/{self.job_id}"
-        os.makedirs(self.output_dir, exist_ok=True)
         self.jsonl_path = f"{self.output_dir}/batch_requests.jsonl"
 
+    @property
+    def client(self):
+        """genai client, constructed (and the SDK imported) on first use."""
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
 
-    def prepare_prompt(self, data_bundle):
-        """
-        Takes the entire dictionary, converts it to a formatted JSON string,
-        and wraps it in a strict instruction block with Feasibility Logic.
+
+    def prepare_prompt(self, data_bundle, record_id=None):
         """
-        # Convert the dictionary to a pretty-printed JSON string
-        data_json = json.dumps(data_bundle, indent=2, ensure_ascii=False)
-        
-        prompt = f"""
-            Role: Expert Agricultural Advisor (Kisan Mitra).
-            Language: Hindi (Strictly).
-            
-            Input Data (JSON):
-            ```json
-            {data_json}
-            ```
-            
-            Task:
-            You are provided with a data bundle describing a specific agricultural scenario.
-            
-            Step 1: Feasibility Analysis (Crucial)
-            Compare the 'Crop' requirements (Temperature, Rainfall, etc.) against the provided 'Weather' conditions and various other constraints.
-            
-            Step 2: Generate Advisory
-            Based on Step 1, generate the advisory in Hindi. 
-            
-            **Your advisory MUST cover the following Actionable Areas (where applicable):**
-            1. **Feasibility:** Can this crop actually be grown here?
-            2. **Disease Prevention:** Specific preventive measures for likely pests/diseases.
-            3. **Soil Management:** Advice on fertilizers, nutrients, or land preparation.
-            4. **Water Management:** Irrigation advice (saving water or critical stages).
-            5. **Risk Handling:** How to handle weather uncertainty or risks.
-            6. **Economic/Operational:** Practical tips on costs or operations.
-
-            **Condition Logic:**
-            - If the scenario is IMPOSSIBLE/FATAL (e.g., Wrong Crop Classification): 
-            * Focus ONLY on the "Feasibility" aspect.
-            * Clearly state that farming this crop is NOT recommended and explain *why*.
-            * Do NOT generate advice for soil/water/disease (it is irrelevant for a failed crop).
-            - If the scenario is STRESSFUL but SALVAGEABLE: 
-            * Acknowledge the stress (e.g., "Drought").
-            * Provide specific mitigation steps across the actionable areas above.
-            - If the scenario is IDEAL: 
-            * Focus on yield maximization across all actionable areas.
-
-            Constraints:
-            - Output strictly in hindi properly. Give proper hindi words instead of just converting english to hindi.
-            - The value should be a single coherent Hindi text (formatted with bullet points).
-            - Use simple, clear Hindi suitable for farmers. 
-            - Reference specific numbers from the input.
+        Renders the bundle with the shared PromptBuilder, so batch and
+        online generation send exactly the same prompt.
         """
-        return prompt
+        return PromptBuilder.render(data_bundle, record_id or data_bundle.get("bundle_id"))
 
 
-    def create_jsonl(self, input_file_path: str= "data/bundles/bundles.jsonl"):
+    def _build_request(self, bundle, index):
+        """
+        Builds one Batch API request entry for a bundle.
+        custom_id is the 1-based row number, the same id online generation
+        writes, so batch and online results share one output schema.
+        """
+        record_id = index + 1
+        # Generate Prompt
+        prompt_text = self.prepare_prompt(bundle)
+        # Construct Request Object 
+        return {
+            "custom_id": str(record_id), 
+            "request": { 
+                "contents": [{"parts": [{"text": prompt_text}]}],
+                "generationConfig": batch_generation_config(self.generation_config)
+            }
+        }
+
+
+    def create_jsonl(self, input_file_path: str= "data/bundles/bundles.jsonl",
+                     start: int = 0, stop: int = None, rows: set = None) -> int:
         """
         Reads input bundles from a JSONL file line-by-line and writes 
         formatted Batch API requests to the output JSONL file.
         This allows processing massive datasets without memory issues.
+
+        [start, stop) selects a record range (e.g. one shard) and `rows`
+        further restricts it to those 1-based row numbers.
+        Returns the number of requests written.
         """
 
         logger.info(f"Reading from {input_file_path}...")
         logger.info(f"Writing batch requests to {self.jsonl_path}...")
         request_count = 0
+        os.makedirs(self.output_dir, exist_ok=True)
         
-        with open(input_file_path, 'r', encoding='utf-8') as infile, \
-                    open(self.jsonl_path, 'w', encoding='utf-8') as outfile:
-            
-            for index, line in enumerate(infile):
-                try:
-                    bundle = json.loads(line.strip())
-                    custom_id = bundle.get('bundle_id', f"req_{index}")
-                    # Generate Prompt
-                    prompt_text = self.prepare_prompt(bundle)
-                    # Construct Request Object 
-                    request_entry = {
-                        "custom_id": custom_id, 
-                        "request": { 
-                            "contents": [{"parts": [{"text": prompt_text}]}],
-                            "generationConfig": {
-                                "responseMimeType": "application/json", 
-                                "temperature": 0.2,
-                                "thinkingConfig": { 
-                                    "includeThoughts": True,
-                                    "thinkingBudget": 1024
-                                }
-                            }
-                        }
-                    }
-
-                    #write to batch file
-                    outfile.write(json.dumps(request_entry) + "\n")
+        with open(self.jsonl_path, 'w', encoding='utf-8') as outfile:
+            if str(input_file_path).endswith(".npz"):
+                from agri_data_gen.core.knowledge.compact_bundles import CompactBundleSpace
+
+                # Compact bundle space: dereference one bundle at a time
+                space = CompactBundleSpace.load(input_file_path)
+                stop = len(space) if stop is None else min(stop, len(space))
+                for index in range(start, stop):
+                    if rows is not None and index + 1 not in rows:
+                        continue
+                    outfile.write(json_codec.dumps_line(self._build_request(space.bundle(index), index)))
                     request_count += 1
-                    
-                except json.JSONDecodeError:
-                    logger.error(f"Skipping invalid JSON at line {index}")
-                    continue
+            else:
+                # Plain or compressed (.zst) bundles
+                for index, line in enumerate(frame_store.iter_lines(input_file_path, start, stop), start=start):
+                    if rows is not None and index + 1 not in rows:
+                        continue
+                    try:
+                        bundle = json_codec.loads(line.strip())
+                        #write to batch file
+                        outfile.write(json_codec.dumps_line(self._build_request(bundle, index)))
+                        request_count += 1
+                        
+                    except json_codec.JSONDecodeError:
+                        logger.error(f"Skipping invalid JSON at line {index}")
+                        continue
         
         logger.info(f"Successfully created batch file with {request_count} requests.")
+        return request_count
 
 
     def submit_job(self):
         """Uploads the JSONL and starts the Batch Job"""
+        from google.genai import types
+
         logger.info("Uploading JSONL file to Gemini...")
         batch_input_file = self.client.files.upload(
             file=self.jsonl_path,
@@ -147,6 +135,17 @@ class TextBatchJob:
         return self.batch_job
 
 
+    def get_state(self) -> str:
+        """Current job state name, e.g. JOB_STATE_RUNNING."""
+        return self.client.batches.get(name=self.batch_job.name).state.name
+
+
+    def cancel(self):
+        """Cancels the job; results already produced are not returned."""
+        logger.info(f"Cancelling Batch Job: {self.batch_job.name}")
+        self.client.batches.cancel(name=self.batch_job.name)
+
+
     def wait_for_completion(self):
         """Polls the job status"""
         while True:
@@ -160,8 +159,13 @@ class TextBatchJob:
             time.sleep(60) 
 
 
-    def download_and_parse_results(self):
-        """Downloads the result file and parses the outputs"""
+    def download_and_parse_results(self, compress: bool = False, out_file: str = None, dedup=None):
+        """
+        Downloads the result file and parses the outputs.
+        With compress=True the raw results are stored as framed .jsonl.zst.
+        Parsed records are appended to `out_file` (default: <output_dir>/data.jsonl).
+        A DedupIndex passed as `dedup` indexes every parsed advisory.
+        """
         job = self.client.batches.get(name=self.batch_job.name)
         
         if job.state.name != "JOB_STATE_SUCCEEDED":
@@ -178,57 +182,60 @@ class TextBatchJob:
         content = self.client.files.download(file=output_file_name)
 
         # Save Raw Output
+        os.makedirs(self.output_dir, exist_ok=True)
         raw_path = f"{self.output_dir}/raw_results.jsonl"
-        with open(raw_path, 'wb') as f:
-            f.write(content)
+        if compress:
+            raw_path += frame_store.COMPRESSED_SUFFIX
+            with frame_store.FrameWriter(raw_path) as writer:
+                for line in content.decode("utf-8").splitlines():
+                    if line.strip():
+                        writer.write_line(line)
+        else:
+            with open(raw_path, 'wb') as f:
+                f.write(content)
             
-        # Parse and Separate Files
-        # self.parse_raw_results(raw_path)
+        # Parse into the generated-data schema
+        self.parse_raw_results(raw_path, out_file or f"{self.output_dir}/data.jsonl", dedup=dedup)
         return raw_path
 
 
-    # def parse_raw_results(self, raw_path):
-    #     logger.info("Parsing results...")
-    #     with open(raw_path, 'r', encoding='utf-8') as f:
-    #         for line in f:
-    #             try:
-    #                 response_item = json.loads(line)
-    #                 custom_id = response_item.get("custom_id", "unknown_id")
-                    
-    #                 if "response" in response_item:
-    #                     candidates = response_item["response"].get("candidates", [])
-    #                     if not candidates: continue
-
-    #                     parts = candidates[0]["content"]["parts"]
-    #                     thinking_text = ""
-    #                     advisory_text = ""
-
-    #                     # Extract Thought vs Answer
-    #                     for part in parts:
-    #                         if part.get("thought") is True:
-    #                             thinking_text += part.get("text", "")
-    #                         else:
-    #                             advisory_text += part.get("text", "")
-
-    #                     # Clean up Advisory JSON
-    #                     try:
-    #                         final_advisory = json.loads(advisory_text)
-    #                     except:
-    #                         final_advisory = {"raw_text": advisory_text}
-
-    #                     # Save Final Clean File
-    #                     final_output = {
-    #                         "id": custom_id,
-    #                         "thinking": thinking_text,
-    #                         "advisory": final_advisory
-    #                     }
-                        
-    #                     out_file = f"{self.output_dir}/{custom_id}.json"
-    #                     with open(out_file, "w", encoding="utf-8") as out:
-    #                         json.dump(final_output, out, indent=2, ensure_ascii=False)
-                            
-    #             except Exception as e:
-    #                 logger.error(f"Error parsing line: {e}")
+    def parse_raw_results(self, raw_path, out_file, dedup=None) -> int:
+        """
+        Converts raw Batch API results into the records online generation
+        writes ({"id": row, "output": response}) and appends them to out_file.
+        Failed requests are logged and left out, so they can be retried.
+        Returns the number of records written.
+        """
+        logger.info("Parsing results...")
+        if dedup is not None:
+            from agri_data_gen.core.generators.dedup import record_text
+        written = failed = 0
+        with frame_store.open_jsonl_writer(out_file, append=True) as writer:
+            for line in frame_store.iter_lines(raw_path):
+                if not line.strip():
+                    continue
+                try:
+                    response_item = json_codec.loads(line)
+                except json_codec.JSONDecodeError as e:
+                    logger.error(f"Error parsing line: {e}")
+                    failed += 1
+                    continue
+
+                custom_id = response_item.get("custom_id") or response_item.get("key")
+                if "response" not in response_item:
+                    logger.error(f"Request {custom_id} failed: {response_item.get('error')}")
+                    failed += 1
+                    continue
+
+                record_id = int(custom_id) if str(custom_id).isdigit() else custom_id
+                writer.write(json_codec.make_output_record(record_id, response_item["response"]))
+                written += 1
+
+                if dedup is not None:
+                    dedup.add(record_id, record_text(response_item["response"]))
+
+        logger.info(f"Parsed {written} results into {out_file} ({failed} failed).")
+        return written
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Cumulative import time of agri_data_gen.cli.main, in microseconds.
+# Today it is dominated by typer (~0.1 s); heavy SDKs would blow through this.
+IMPORT_BUDGET_US = 1_000_000
+
+HEAVY_MODULES = ("google.genai", "pandas", "pymongo")
+
+
+def _python(*args):
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def test_cli_import_within_budget():
+    result = _python("-X", "importtime", "-c", "import agri_data_gen.cli.main")
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| agri_data_gen\.cli\.main$", result.stderr, re.M)
+    assert match, result.stderr[-2000:]
+    assert int(match.group(1)) < IMPORT_BUDGET_US
+
+
+def test_cli_import_skips_heavy_modules():
+    result = _python("-c", "import sys, agri_data_gen.cli.main; "
+                           f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    assert result.stdout.strip() == ""
@@ -0,0 +1,109 @@
+import pytest
+
+from agri_data_gen.core.providers import credential_pool
+from agri_data_gen.core.providers.credential_pool import CredentialPool
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(credential_pool.time, "time", clock.time)
+    monkeypatch.setattr(credential_pool.time, "sleep", clock.sleep)
+    return clock
+
+
+def _pool(n: int = 3, **kwargs) -> CredentialPool:
+    return CredentialPool({f"KEY_{i}": f"secret-{i}" for i in range(n)}, **kwargs)
+
+
+def test_acquire_routes_to_least_loaded_key(clock):
+    pool = _pool(3)
+    held = [pool.acquire() for _ in range(3)]
+    assert sorted(s.name for s in held) == ["KEY_0", "KEY_1", "KEY_2"]
+
+    pool.release(held[1])
+    assert pool.acquire() is held[1]
+    assert [s["in_flight"] for s in pool.stats()] == [1, 1, 1]
+
+
+def test_rate_limited_key_cools_down_with_exponential_backoff(clock):
+    pool = _pool(2, base_cooldown=10, max_cooldown=25)
+    first = pool.acquire()
+    other = pool.acquire()
+    pool.release(other)
+
+    cooldowns = []
+    for _ in range(3):
+        pool.release(first, rate_limited=True)
+        cooldowns.append(first.cooldown_until - clock.now)
+        # While cooling down, every request goes to the other key
+        assert pool.acquire() is other
+        pool.release(other)
+        clock.now = first.cooldown_until
+        assert pool.acquire() is first
+    assert cooldowns == [10, 20, 25]
+
+    # A success resets the backoff
+    pool.release(first)
+    first = pool.acquire()
+    pool.release(first, rate_limited=True)
+    assert first.cooldown_until - clock.now == 10
+
+
+def test_acquire_waits_for_the_first_key_to_recover(clock):
+    pool = _pool(2, base_cooldown=10)
+    a, b = pool.acquire(), pool.acquire()
+    pool.release(a, rate_limited=True)
+    clock.now += 3
+    pool.release(b, rate_limited=True)
+
+    assert pool.acquire() is a
+    assert clock.sleeps == [7]
+
+
+def test_key_rests_after_max_failures(clock):
+    pool = _pool(1, base_cooldown=10, max_failures=3)
+    for attempt in range(3):
+        state = pool.acquire()
+        assert state.is_healthy(clock.now)
+        pool.release(state, failed=True)
+
+    assert not state.is_healthy(clock.now)
+    assert state.consecutive_failures == 0
+    assert pool.stats()[0]["failures"] == 3
+
+
+def test_from_env_collects_prefixed_keys_once(monkeypatch):
+    for name in list(credential_pool.os.environ):
+        if name.startswith("GOOGLE_API_KEY"):
+            monkeypatch.delenv(name)
+    monkeypatch.setenv("GOOGLE_API_KEY", "alpha")
+    monkeypatch.setenv("GOOGLE_API_KEY_2", "beta")
+    monkeypatch.setenv("GOOGLE_API_KEY_SOKET", "alpha")
+    monkeypatch.setenv("GOOGLE_API_KEY_3", "  ")
+    monkeypatch.setenv("GOOGLE_API_KEYRING", "gamma")
+
+    pool = CredentialPool.from_env()
+    assert sorted(s.api_key for s in pool.states) == ["alpha", "beta"]
+    assert len(pool) == 2
+
+
+def test_from_env_without_keys_fails(monkeypatch):
+    for name in list(credential_pool.os.environ):
+        if name.startswith("GOOGLE_API_KEY"):
+            monkeypatch.delenv(name)
+    with pytest.raises(RuntimeError):
+        CredentialPool.from_env()
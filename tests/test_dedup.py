@@ -0,0 +1,64 @@
+from agri_data_gen.core.generators.dedup import DedupIndex
+
+BASE = ("गेहूं की फसल में सिंचाई हर दस दिन पर करें और खेत में जल निकासी का ध्यान रखें। "
+        "नाइट्रोजन उर्वरक की दूसरी खुराक कल्ले निकलते समय दें।")
+OTHER = ("धान की रोपाई से पहले खेत को समतल करें, जिंक सल्फेट डालें और "
+         "तना छेदक कीट के लिए फेरोमोन ट्रैप लगाएं।")
+
+
+def test_near_duplicates_cluster_together():
+    index = DedupIndex(threshold=0.8)
+    assert index.add("a", BASE) is None
+    assert index.add("b", OTHER) is None
+    assert index.add("c", BASE + " ") == "a"
+    assert index.add("d", BASE.replace("दस", "दस")) == "a"
+
+    assert index.clusters() == [["a", "c", "d"]]
+
+
+def test_distinct_texts_stay_apart():
+    index = DedupIndex(threshold=0.8)
+    index.add("a", BASE)
+    assert index.add("b", OTHER) is None
+    assert index.add("empty", "   ") is None
+    assert index.clusters() == []
+
+
+def test_skip_after_marks_shared_neighbourhood():
+    index = DedupIndex(threshold=0.8, skip_after=2)
+    wheat_north = {"crop": {"id": "wheat"}, "region": {"id": "north"}}
+    wheat_south = {"crop": {"id": "wheat"}, "region": {"id": "south"}}
+    index.add(1, BASE, wheat_north)
+    index.add(2, BASE, wheat_south)
+
+    assert index.should_skip({"crop": {"id": "wheat"}, "region": {"id": "east"}})
+    assert not index.should_skip({"crop": {"id": "rice"}, "region": {"id": "north"}})
+
+
+def test_load_applies_current_threshold_and_skip_after(tmp_path):
+    index = DedupIndex(threshold=0.8, skip_after=0)
+    wheat_north = {"crop": {"id": "wheat"}, "region": {"id": "north"}}
+    wheat_south = {"crop": {"id": "wheat"}, "region": {"id": "south"}}
+    index.add(1, BASE, wheat_north)
+    index.add(2, BASE, wheat_south)
+    index.add(3, OTHER, {"crop": {"id": "rice"}, "region": {"id": "east"}})
+    path = str(tmp_path / "data_dedup.npz")
+    index.save(path)
+
+    # Saved values are kept when nothing is overridden
+    restored = DedupIndex.load(path)
+    assert (restored.threshold, restored.skip_after) == (0.8, 0)
+    assert restored.clusters() == [[1, 2]]
+    assert not restored.should_skip({"crop": {"id": "wheat"}, "region": {"id": "east"}})
+
+    # A later run's --dedup-skip-after takes effect on the reloaded index
+    restored = DedupIndex.load(path, skip_after=2)
+    assert restored.skip_after == 2
+    assert restored.should_skip({"crop": {"id": "wheat"}, "region": {"id": "east"}})
+
+    # and so does a new threshold: the stored signatures are re-banded
+    restored = DedupIndex.load(path, threshold=0.5)
+    assert restored.threshold == 0.5
+    assert (restored.bands, restored.rows) != (index.bands, index.rows)
+    assert restored.clusters() == [[1, 2]]
+    assert restored.add(4, BASE) == 1
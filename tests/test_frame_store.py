@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("zstandard")
+
+from agri_data_gen.core.storage import frame_store
+
+RECORDS = [{"id": i, "text": "बीज " * (i % 7), "values": list(range(i % 4))} for i in range(50)]
+
+
+def _write(path, records, append=False):
+    with frame_store.FrameWriter(path, records_per_frame=8, append=append) as writer:
+        for record in records:
+            writer.write(record)
+
+
+def test_frame_reader_slices_across_frames(tmp_path):
+    path = tmp_path / "records.jsonl.zst"
+    _write(path, RECORDS)
+
+    reader = frame_store.FrameReader(path)
+    assert len(reader) == len(RECORDS)
+    assert list(reader.iter_records()) == RECORDS
+    assert list(reader.iter_records(5, 21)) == RECORDS[5:21]
+    assert list(reader.iter_records(40, 100)) == RECORDS[40:]
+    assert list(frame_store.iter_records(path, 8, 16)) == RECORDS[8:16]
+
+
+def test_frame_writer_append_continues_numbering(tmp_path):
+    path = tmp_path / "records.jsonl.zst"
+    _write(path, RECORDS[:20])
+    _write(path, RECORDS[20:], append=True)
+
+    assert list(frame_store.FrameReader(path).iter_records(15, 25)) == RECORDS[15:25]
+
+
+def test_append_recovers_from_torn_write(tmp_path):
+    path = tmp_path / "records.jsonl.zst"
+    _write(path, RECORDS[:24])
+    # Crash mid-write: a partial frame on disk and a half-written index line
+    with open(path, "ab") as f:
+        f.write(b"\x28\xb5\x2f\xfd\x00")
+    with open(frame_store.index_path(path), "a", encoding="utf-8") as f:
+        f.write('{"offset": 9')
+
+    _write(path, RECORDS[24:], append=True)
+    assert list(frame_store.FrameReader(path).iter_records()) == RECORDS
+
+
+def test_append_rebuilds_missing_index(tmp_path):
+    path = tmp_path / "records.jsonl.zst"
+    _write(path, RECORDS[:20])
+    frame_store.index_path(path).unlink()
+
+    _write(path, RECORDS[20:], append=True)
+    assert list(frame_store.FrameReader(path).iter_records(10, 30)) == RECORDS[10:30]
@@ -0,0 +1,47 @@
+import pytest
+
+from agri_data_gen.core.storage import json_codec
+from agri_data_gen.core.storage.line_index import JsonlIndex, offsets_path
+
+RECORDS = [{"id": i, "text": "बीज " * (i % 7), "values": list(range(i % 4))} for i in range(50)]
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / "records.jsonl"
+    with open(path, "wb") as f:
+        for record in RECORDS:
+            f.write(json_codec.dumps_line(record).encode("utf-8"))
+    return path
+
+
+def test_jsonl_index_reads_and_slices(jsonl_file):
+    with JsonlIndex(jsonl_file) as index:
+        assert len(index) == len(RECORDS)
+        assert index.read(0) == RECORDS[0]
+        assert index.read(37) == RECORDS[37]
+        assert list(index.iter_records(10, 20)) == RECORDS[10:20]
+        assert list(index.iter_records(45, 100)) == RECORDS[45:]
+    assert offsets_path(jsonl_file).exists()
+
+
+def test_jsonl_index_split_covers_every_record(jsonl_file):
+    with JsonlIndex(jsonl_file) as index:
+        ranges = index.split(4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(RECORDS)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_jsonl_index_rebuilds_stale_sidecar(jsonl_file):
+    with JsonlIndex(jsonl_file) as index:
+        assert len(index) == len(RECORDS)
+    with open(jsonl_file, "ab") as f:
+        f.write(json_codec.dumps_line({"id": 50}).encode("utf-8"))
+    with JsonlIndex(jsonl_file) as index:
+        assert len(index) == len(RECORDS) + 1
+        assert index.read(50) == {"id": 50}
+
+
+def test_jsonl_index_without_rebuild_rejects_missing_sidecar(jsonl_file):
+    with pytest.raises(FileNotFoundError):
+        JsonlIndex(jsonl_file, build_if_missing=False)
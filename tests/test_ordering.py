@@ -0,0 +1,39 @@
+import itertools
+
+import pytest
+
+from agri_data_gen.core.knowledge.ordering import CoverageOrder, iter_combinations
+
+
+@pytest.mark.parametrize("sizes", [[3], [4, 2, 3], [1, 5, 5], [2, 7, 3, 4]])
+def test_coverage_order_is_bijection(sizes):
+    order = CoverageOrder(sizes)
+    seen = [order.indices(p) for p in range(len(order))]
+
+    assert len(order) == len(set(seen))
+    assert set(seen) == set(itertools.product(*(range(n) for n in sizes)))
+    assert all(order.position(indices) == p for p, indices in enumerate(seen))
+
+
+def test_coverage_order_matrix_matches_indices():
+    order = CoverageOrder([4, 2, 3])
+    matrix = order.matrix(5, 17)
+    assert [tuple(row) for row in matrix.tolist()] == list(order.iter(5, 17))
+
+
+def test_coverage_prefix_covers_every_value():
+    sizes = [5, 3, 2]
+    prefix = list(CoverageOrder(sizes).iter(0, max(sizes)))
+    for axis, n in enumerate(sizes):
+        assert {indices[axis] for indices in prefix} == set(range(n))
+
+
+def test_coverage_order_rejects_out_of_range():
+    order = CoverageOrder([2, 2])
+    with pytest.raises(IndexError):
+        order.indices(4)
+
+
+def test_iter_combinations_unknown_order():
+    with pytest.raises(ValueError):
+        list(iter_combinations([[1]], order="random"))
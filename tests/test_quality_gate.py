@@ -0,0 +1,62 @@
+from agri_data_gen.core.generators.quality_gate import StreamMonitor, check_record
+from agri_data_gen.core.storage import json_codec
+
+HINDI = "खेत में नमी बनाए रखें और समय पर सिंचाई करें। " * 20
+
+
+def feed(monitor, text, step=7):
+    """Feeds `text` to the monitor in growing prefixes, like a stream."""
+    for end in range(step, len(text) + step, step):
+        reason = monitor(text[:end])
+        if reason:
+            return reason
+    return None
+
+
+def test_valid_json_prefixes_pass():
+    answer = '```json\n{"advisory": "' + HINDI + '", "steps": ["एक", "दो"]}\n```'
+    assert feed(StreamMonitor(), answer) is None
+
+
+def test_invalid_json_start_is_rejected():
+    assert feed(StreamMonitor(), "Sure! Here is the advisory: {}") == "invalid_json"
+
+
+def test_text_after_top_level_value_is_rejected():
+    assert feed(StreamMonitor(), '{"advisory": "ठीक"} and more') == "invalid_json"
+
+
+def test_unbalanced_close_is_rejected():
+    assert feed(StreamMonitor(), '["a"]]') == "invalid_json"
+
+
+def test_low_devanagari_is_rejected():
+    answer = '{"advisory": "' + "Irrigate the field on time. " * 20 + '"}'
+    assert feed(StreamMonitor(min_script_letters=50), answer) == "low_devanagari"
+
+
+def test_too_long_is_rejected():
+    answer = '{"advisory": "' + HINDI * 10 + '"}'
+    assert feed(StreamMonitor(max_chars=500), answer, step=100) == "too_long"
+
+
+def _response(answer: str, reason: str = "STOP", thinking: str = "") -> dict:
+    parts = [{"text": thinking, "thought": True}] if thinking else []
+    parts.append({"text": answer})
+    return {"candidates": [{"content": {"parts": parts}, "finish_reason": reason}]}
+
+
+def test_check_record_accepts_single_and_packed_rows():
+    single = {"id": 1, "output": _response(json_codec.dumps({"advisory": HINDI}), thinking="सोच")}
+    packed = {"id": 2, "output": {**_response(json_codec.dumps({"bundle_id": "b2", "advisory": HINDI})),
+                                  "pack": [1, 2]}}
+    assert check_record(single) == []
+    assert check_record(packed) == []
+
+
+def test_check_record_reasons():
+    assert check_record({"id": 1, "output": {}}) == ["empty_output"]
+    assert check_record({"id": 1, "output": {"candidates": []}}) == ["empty_candidates"]
+    assert check_record({"id": 1, "output": _response("not json " + HINDI)}) == ["invalid_json"]
+    truncated = _response(json_codec.dumps({"advisory": HINDI[:50]}), reason="MAX_TOKENS")
+    assert check_record({"id": 1, "output": truncated}) == ["finish_max_tokens", "too_short"]
@@ -0,0 +1,77 @@
+import pytest
+
+from agri_data_gen.core.generators.run_planner import RunPlanner
+from agri_data_gen.core.prompt.prompt_builder import PromptBuilder
+from agri_data_gen.core.prompt.token_estimator import estimate_tokens
+from agri_data_gen.core.storage import json_codec
+
+CROPS = [{"id": "wheat", "label": "गेहूं", "temperature": [10, 25]},
+         {"id": "rice", "label": "धान", "rainfall": 1200}]
+REGIONS = [{"id": "punjab", "label": "पंजाब"}, {"id": "bihar", "label": "Bihar"}]
+
+
+def _bundles():
+    bundles = []
+    for i in range(9):
+        bundle = {
+            "id": i,
+            "region": REGIONS[i % 2],
+            "crop": CROPS[i % 2 == 0 and i % 3 != 0],
+            # Same weather id, different observation per bundle
+            "weather": {"id": "monsoon", "rainfall_mm": 100 + i * 37.5, "humidity_percent": i * 11},
+        }
+        if i % 4:
+            bundle["bundle_id"] = f"b{i}"
+        bundles.append(bundle)
+    return bundles
+
+
+@pytest.fixture
+def bundle_file(tmp_path):
+    path = tmp_path / "bundles.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for bundle in _bundles():
+            f.write(json_codec.dumps_line(bundle))
+    return path
+
+
+def test_single_prompt_tokens_match_render(bundle_file):
+    plan = RunPlanner(str(bundle_file)).plan()
+    rendered = sum(estimate_tokens(PromptBuilder.render(b, b.get("bundle_id"))) for b in _bundles())
+    assert plan["online"]["input_tokens"] == rendered
+    assert plan["batch"]["input_tokens"] == rendered
+    assert plan["rows"] == plan["online"]["requests"] == len(_bundles())
+
+
+def test_packed_prompt_tokens_match_render(bundle_file):
+    pack_size = 4
+    plan = RunPlanner(str(bundle_file), pack_size=pack_size).plan()
+
+    bundles = _bundles()
+    rendered = 0
+    for start in range(0, len(bundles), pack_size):
+        pack = bundles[start:start + pack_size]
+        if len(pack) == 1:
+            rendered += estimate_tokens(PromptBuilder.render(pack[0], pack[0].get("bundle_id")))
+            continue
+        contexts = {str(b.get("bundle_id", f"row_{start + k + 1}")): json_codec.dumps(b, indent=True)
+                    for k, b in enumerate(pack)}
+        rendered += estimate_tokens(PromptBuilder.build_packed(contexts))
+
+    assert plan["online"]["input_tokens"] == rendered
+    assert plan["online"]["requests"] == 3
+
+
+def test_axis_breakdown_counts_bundles(bundle_file):
+    plan = RunPlanner(str(bundle_file)).plan()
+    regions = {item["value"]: item["bundles"] for item in plan["axes"]["region"]}
+    assert regions == {"punjab": 5, "bihar": 4}
+
+
+def test_output_tokens_use_each_path_thinking_budget(bundle_file):
+    from agri_data_gen.core.providers.generation_config import ONLINE_GENERATION_CONFIG, BATCH_GENERATION_CONFIG
+
+    plan = RunPlanner(str(bundle_file), pack_size=4, output_tokens=500).plan()
+    rows = len(_bundles())
+    assert plan["online"]["output_tokens"] == rows * 500 + 3 * ONLINE_GENERATION_CONFIG["thinking_budget"]
+    assert plan["batch"]["output_tokens"] == rows * (500 + BATCH_GENERATION_CONFIG["thinking_budget"])
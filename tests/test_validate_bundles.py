@@ -0,0 +1,27 @@
+import pytest
+
+from agri_data_gen.core.knowledge.validate_bundles import DecisionArray
+
+
+def test_decision_array_round_trip():
+    decisions = DecisionArray(capacity=4)
+    expected = {0: True, 3: False, 10: True, 5000: False}
+    for bundle_id, is_valid in expected.items():
+        decisions.set(bundle_id, is_valid)
+
+    for bundle_id, is_valid in expected.items():
+        assert decisions.get(bundle_id) == (DecisionArray.VALID if is_valid else DecisionArray.REJECTED)
+    assert decisions.get(1) == DecisionArray.MISSED
+    assert decisions.get(10 ** 6) == DecisionArray.MISSED
+    assert decisions.count() == len(expected)
+
+
+def test_decision_array_overwrites_and_rejects_negative_ids():
+    decisions = DecisionArray()
+    decisions.set(7, True)
+    decisions.set(7, False)
+    assert decisions.get(7) == DecisionArray.REJECTED
+    assert decisions.count() == 1
+
+    with pytest.raises(IndexError):
+        decisions.set(-1, True)
@@ -0,0 +1,155 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from agri_data_gen.core.generators.work_queue import (
+    QueueWorker, SQLiteLeaseStore, DONE, FAILED, LEASED, PENDING
+)
+from agri_data_gen.core.storage import frame_store
+
+
+class FakeEngine:
+    """Stands in for GenerationEngine: writes one record per requested row, except `failing` rows."""
+
+    def __init__(self, out_file: Path, total: int = 20, failing=(), during=None):
+        self.out_file = out_file
+        self.total = total
+        self.failing = set(failing)
+        self.during = during
+        self.requested = []
+
+    def total_records(self) -> int:
+        return self.total
+
+    def generate_all(self, rows=None):
+        done = set()
+        if Path(self.out_file).exists():
+            done = {r["id"] for r in frame_store.iter_records(self.out_file)}
+        todo = sorted(set(rows) - done - self.failing)
+        self.requested.append(todo)
+        if self.during is not None:
+            self.during()
+        with frame_store.open_jsonl_writer(self.out_file, append=True) as writer:
+            for row in todo:
+                writer.write({"id": row, "output": {}})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteLeaseStore(str(tmp_path / "queue.sqlite"))
+
+
+def _worker(tmp_path, store, engine=None, **kwargs):
+    engine = engine or FakeEngine(tmp_path / "parts" / "data.jsonl")
+    return QueueWorker(engine, store, queue="q", out_dir=str(tmp_path / "parts"), **kwargs)
+
+
+def _ids(path: Path):
+    return [r["id"] for r in frame_store.iter_records(path)]
+
+
+def test_seed_is_idempotent_and_acquire_goes_in_order(store):
+    assert store.seed("q", [(0, 10), (10, 20)]) == 2
+    assert store.seed("q", [(0, 10), (10, 20), (20, 25)]) == 1
+
+    leases = [store.acquire("q", "w1", 60) for _ in range(3)]
+    assert [(l.start, l.stop) for l in leases] == [(0, 10), (10, 20), (20, 25)]
+    assert all(l.token == 1 and l.attempts == 1 for l in leases)
+    assert store.acquire("q", "w2", 60) is None
+    assert store.progress("q") == {LEASED: 3}
+
+
+def test_expired_lease_is_fenced_by_token(store):
+    store.seed("q", [(0, 10)])
+    stale = store.acquire("q", "w1", 0.01)
+    assert store.acquire("q", "w2", 60) is None
+    time.sleep(0.02)
+
+    fresh = store.acquire("q", "w2", 60)
+    assert (fresh.start, fresh.token, fresh.attempts) == (0, 2, 2)
+    assert not store.heartbeat(stale, 60)
+    assert not store.complete(stale)
+    store.release(stale)
+    assert store.progress("q") == {LEASED: 1}
+
+    assert store.heartbeat(fresh, 60)
+    assert store.complete(fresh)
+
+
+def test_complete_happens_exactly_once(store):
+    store.seed("q", [(0, 10)])
+    lease = store.acquire("q", "w1", 60)
+    assert store.complete(lease)
+    assert not store.complete(lease)
+    assert not store.complete(lease, missing=[3])
+    assert store.progress("q") == {DONE: 1}
+    assert store.acquire("q", "w2", 60) is None
+
+
+def test_release_returns_range_to_the_queue(store):
+    store.seed("q", [(0, 10)])
+    lease = store.acquire("q", "w1", 60)
+    store.release(lease)
+    assert store.progress("q") == {PENDING: 1}
+    assert store.acquire("q", "w2", 60).token == 2
+
+
+def test_worker_completes_ranges_into_part_files(tmp_path, store):
+    worker = _worker(tmp_path, store)
+    worker.seed(range_size=8)
+    assert worker.run() == 3
+
+    parts = sorted((tmp_path / "parts").glob("data_*.jsonl"))
+    assert [p.name for p in parts] == [
+        "data_000000000_000000008.jsonl", "data_000000008_000000016.jsonl", "data_000000016_000000020.jsonl"
+    ]
+    assert sum((_ids(p) for p in parts), []) == list(range(1, 21))
+    assert store.progress("q") == {DONE: 3}
+
+
+def test_heartbeat_loss_discards_output(tmp_path, store):
+    store.seed("q", [(0, 10)])
+
+    def lose_lease():
+        # Another worker re-leases the range (e.g. after a network stall)
+        store._write("UPDATE leases SET token = token + 1, owner = 'w2' WHERE queue = 'q'", ())
+        time.sleep(0.1)
+
+    engine = FakeEngine(tmp_path / "parts" / "data.jsonl", during=lose_lease)
+    worker = _worker(tmp_path, store, engine, lease_seconds=0.03)
+    lease = store.acquire("q", "w1", 0.03)
+
+    assert not worker.process(lease)
+    assert not worker.part_path(lease).exists()
+    assert store.progress("q") == {LEASED: 1}
+    assert not store.complete(lease)
+
+
+def test_takeover_carries_over_crashed_temp_file(tmp_path, store):
+    store.seed("q", [(0, 10)])
+    worker = _worker(tmp_path, store)
+
+    crashed = store.acquire("q", "w1", 0.01)
+    with frame_store.open_jsonl_writer(worker.part_path(crashed, token=crashed.token)) as writer:
+        for row in (1, 2, 3):
+            writer.write({"id": row, "output": {}})
+    time.sleep(0.02)
+
+    lease = store.acquire("q", "w2", 60)
+    assert worker.process(lease)
+    assert worker.engine.requested == [list(range(4, 11))]
+    assert sorted(_ids(worker.part_path(lease))) == list(range(1, 11))
+    assert list((tmp_path / "parts").glob("*.tmp*")) == []
+
+
+def test_range_with_missing_rows_fails_after_max_attempts(tmp_path, store):
+    engine = FakeEngine(tmp_path / "parts" / "data.jsonl", total=10, failing={5})
+    worker = _worker(tmp_path, store, engine, max_attempts=2)
+    worker.seed(range_size=10)
+
+    assert worker.run() == 1  # attempt 1 releases, attempt 2 records the failure
+    assert store.progress("q") == {FAILED: 1}
+    assert store.failed_rows("q") == [5]
+    part = tmp_path / "parts" / "data_000000000_000000010.jsonl"
+    assert sorted(_ids(part)) == [1, 2, 3, 4, 6, 7, 8, 9, 10]